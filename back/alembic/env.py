@@ -8,12 +8,13 @@ from sqlalchemy import pool
 from alembic import context
 
 # Добавляем путь к корневой директории проекта для импорта config
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+# (back/alembic -> корень репозитория; каталог back добавляет prepend_sys_path)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 try:
-    from config.database import config as app_config
-    # Используем централизованную конфигурацию
-    database_url = app_config.database_url
+    from config.database import get_config
+    # Явный DATABASE_URL важнее, как и в app.core.config; иначе - общий снимок конфигурации
+    database_url = os.getenv("DATABASE_URL") or get_config().database_url
 except ImportError:
     # Fallback для случаев, когда config недоступен
     database_url = os.getenv("DATABASE_URL")
@@ -32,11 +33,15 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
-# add your model's MetaData object here
-# for 'autogenerate' support
-# from myapp import mymodel
-# target_metadata = mymodel.Base.metadata
-target_metadata = None
+# Метаданные моделей: autogenerate и `alembic check` сравнивают с ними схему БД
+from app.migration_utils import include_object  # noqa: E402
+from app.models import Base  # noqa: E402
+
+target_metadata = Base.metadata
+
+# Миграция не ждет блокировку дольше этого и падает, а не выстраивает очередь
+# из запросов приложения за собой (можно переопределить MIGRATION_LOCK_TIMEOUT)
+lock_timeout = os.getenv("MIGRATION_LOCK_TIMEOUT", "10s")
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
@@ -61,6 +66,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        transaction_per_migration=True,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -87,8 +93,16 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
+        connection.exec_driver_sql(f"SET lock_timeout = '{lock_timeout}'")
+        connection.commit()
+        # Каждая миграция в своей транзакции: CONCURRENTLY-операции и пачки
+        # бэкфилла (autocommit_block) не смешиваются с DDL других миграций
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            transaction_per_migration=True,
+            compare_type=True,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
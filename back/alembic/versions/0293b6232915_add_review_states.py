@@ -0,0 +1,44 @@
+"""add review states
+
+Revision ID: 0293b6232915
+Revises: 61ce7cf21787
+Create Date: 2026-10-19 19:10:50.355696
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0293b6232915'
+down_revision: Union[str, Sequence[str], None] = '61ce7cf21787'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'review_states',
+        sa.Column('learner_id', sa.Text(), nullable=False),
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.Column('section_id', sa.Integer(), nullable=False),
+        sa.Column('repetitions', sa.Integer(), nullable=False),
+        sa.Column('interval_days', sa.Float(), nullable=False),
+        sa.Column('easiness', sa.Float(), nullable=False),
+        sa.Column('due_at', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['question_id'], ['questions.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['section_id'], ['sections.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('learner_id', 'question_id'),
+    )
+    # Очередь ученика в секции читается одним запросом по этому индексу
+    op.create_index('ix_review_states_learner_section', 'review_states', ['learner_id', 'section_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_review_states_learner_section', table_name='review_states')
+    op.drop_table('review_states')
@@ -0,0 +1,73 @@
+"""optional hash partitioning of answers
+
+Revision ID: 03d6601c761c
+Revises: 8805f94f4a3d
+Create Date: 2026-10-19 18:52:19.589662
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.migration_utils import copy_table_online, is_partitioned, swap_tables
+
+
+# revision identifiers, used by Alembic.
+revision: str = '03d6601c761c'
+down_revision: Union[str, Sequence[str], None] = '8805f94f4a3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Число hash-секций answers по question_id; 0 - таблица остается обычной.
+# Чтобы включить позже: alembic downgrade 8805f94f4a3d && ANSWERS_HASH_PARTITIONS=16 alembic upgrade head
+PARTITIONS = int(os.getenv("ANSWERS_HASH_PARTITIONS", "0") or 0)
+BATCH_SIZE = int(os.getenv("ANSWERS_COPY_BATCH_SIZE", "50000"))
+
+INDEXED_COLUMNS = ("id", "text", "question_id")
+
+
+def rebuild_answers(partitions: int) -> None:
+    """Пересоздать answers (секционированной или обычной) онлайн-копированием"""
+    if partitions:
+        op.execute("CREATE TABLE answers_new (LIKE answers INCLUDING DEFAULTS) PARTITION BY HASH (question_id)")
+        for remainder in range(partitions):
+            op.execute(
+                f"CREATE TABLE answers_p{remainder} PARTITION OF answers_new "
+                f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+            )
+        # Уникальный ключ секционированной таблицы обязан включать question_id
+        op.execute("ALTER TABLE answers_new ADD CONSTRAINT answers_new_id_question_id_key UNIQUE (id, question_id)")
+        match_columns = ("id", "question_id")
+    else:
+        op.execute("CREATE TABLE answers_new (LIKE answers INCLUDING DEFAULTS)")
+        op.execute("ALTER TABLE answers_new ADD CONSTRAINT answers_new_pkey PRIMARY KEY (id)")
+        match_columns = ("id",)
+    op.execute("ALTER TABLE answers_new ADD CONSTRAINT answers_new_question_id_fkey "
+               "FOREIGN KEY (question_id) REFERENCES questions (id)")
+    for column in INDEXED_COLUMNS:
+        op.execute(f"CREATE INDEX ix_answers_new_{column} ON answers_new ({column})")
+
+    copy_table_online("answers", "answers_new", match_columns, batch_size=BATCH_SIZE)
+    swap_tables("answers", "answers_new", sequence="answers_id_seq")
+
+    # Вернуть привычные имена ограничений и индексов
+    key = "answers_new_id_question_id_key" if partitions else "answers_new_pkey"
+    op.execute(f"ALTER TABLE answers RENAME CONSTRAINT {key} TO {key.replace('answers_new', 'answers')}")
+    op.execute("ALTER TABLE answers RENAME CONSTRAINT answers_new_question_id_fkey TO answers_question_id_fkey")
+    for column in INDEXED_COLUMNS:
+        op.execute(f"ALTER INDEX ix_answers_new_{column} RENAME TO ix_answers_{column}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if PARTITIONS > 0 and not is_partitioned("answers"):
+        rebuild_answers(PARTITIONS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if is_partitioned("answers"):
+        rebuild_answers(0)
@@ -0,0 +1,38 @@
+"""cascade deletes of questions and answers
+
+Revision ID: 4b1aee3d4c84
+Revises: a3de6a040a57
+Create Date: 2026-10-19 19:28:41.522778
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.migration_utils import create_index_concurrently, drop_index_concurrently, replace_foreign_key
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b1aee3d4c84'
+down_revision: Union[str, Sequence[str], None] = 'a3de6a040a57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Удаление секции или вопроса одним DELETE: зависимые строки удаляет сама БД
+    replace_foreign_key('questions', 'questions_section_id_fkey', 'section_id', 'sections', ondelete='CASCADE')
+    replace_foreign_key('answers', 'answers_question_id_fkey', 'question_id', 'questions', ondelete='CASCADE')
+    # Каскад в review_states ищет строки по вопросу и по секции - без индексов это seq scan
+    create_index_concurrently('ix_review_states_question_id', 'review_states', ['question_id'])
+    create_index_concurrently('ix_review_states_section_id', 'review_states', ['section_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('ix_review_states_section_id', 'review_states')
+    drop_index_concurrently('ix_review_states_question_id', 'review_states')
+    replace_foreign_key('answers', 'answers_question_id_fkey', 'question_id', 'questions')
+    replace_foreign_key('questions', 'questions_section_id_fkey', 'section_id', 'sections')
@@ -0,0 +1,37 @@
+"""add rate limit buckets
+
+Revision ID: 61ce7cf21787
+Revises: 03d6601c761c
+Create Date: 2026-10-19 18:58:09.806933
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '61ce7cf21787'
+down_revision: Union[str, Sequence[str], None] = '03d6601c761c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # UNLOGGED: состояние лимитов не пишется в WAL и не уходит на реплики
+    op.create_table(
+        'rate_limit_buckets',
+        sa.Column('key', sa.Text(), nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.Float(), nullable=False),
+        sa.Column('allowed', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+        prefixes=['UNLOGGED'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rate_limit_buckets')
@@ -0,0 +1,34 @@
+"""index foreign keys concurrently
+
+Revision ID: 8805f94f4a3d
+Revises: e23b7c929e28
+Create Date: 2026-10-19 18:50:23.740406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.migration_utils import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8805f94f4a3d'
+down_revision: Union[str, Sequence[str], None] = 'e23b7c929e28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Индексы по внешним ключам: выборка вопросов секции и ответов вопросов.
+    # CONCURRENTLY не блокирует запись в большие questions/answers
+    create_index_concurrently('ix_questions_section_id', 'questions', ['section_id'])
+    create_index_concurrently('ix_answers_question_id', 'answers', ['question_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently('ix_answers_question_id', 'answers')
+    drop_index_concurrently('ix_questions_section_id', 'questions')
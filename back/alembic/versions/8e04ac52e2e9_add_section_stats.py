@@ -0,0 +1,80 @@
+"""add section stats
+
+Revision ID: 8e04ac52e2e9
+Revises: 46cc0c8ee04f
+Create Date: 2026-10-19 18:41:51.720593
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e04ac52e2e9'
+down_revision: Union[str, Sequence[str], None] = '46cc0c8ee04f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SECTION_STATS_FUNCTION = """
+CREATE OR REPLACE FUNCTION sections_apply_question_delta() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE sections s
+        SET question_count = s.question_count + d.n, updated_at = now()
+        FROM (SELECT section_id, count(*) AS n FROM new_questions
+              WHERE section_id IS NOT NULL GROUP BY section_id) d
+        WHERE s.id = d.section_id;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE sections s
+        SET question_count = s.question_count - d.n, updated_at = now()
+        FROM (SELECT section_id, count(*) AS n FROM old_questions
+              WHERE section_id IS NOT NULL GROUP BY section_id) d
+        WHERE s.id = d.section_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+SECTION_STATS_TRIGGERS = """
+CREATE TRIGGER questions_section_stats_insert AFTER INSERT ON questions
+    REFERENCING NEW TABLE AS new_questions
+    FOR EACH STATEMENT EXECUTE FUNCTION sections_apply_question_delta();
+CREATE TRIGGER questions_section_stats_update AFTER UPDATE ON questions
+    REFERENCING OLD TABLE AS old_questions NEW TABLE AS new_questions
+    FOR EACH STATEMENT EXECUTE FUNCTION sections_apply_question_delta();
+CREATE TRIGGER questions_section_stats_delete AFTER DELETE ON questions
+    REFERENCING OLD TABLE AS old_questions
+    FOR EACH STATEMENT EXECUTE FUNCTION sections_apply_question_delta();
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('sections', sa.Column('question_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('sections', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+
+    # Начальное заполнение одним проходом по questions
+    op.execute("""
+        UPDATE sections s
+        SET question_count = c.n
+        FROM (SELECT section_id, count(*) AS n FROM questions GROUP BY section_id) c
+        WHERE s.id = c.section_id
+    """)
+
+    op.execute(SECTION_STATS_FUNCTION)
+    op.execute(SECTION_STATS_TRIGGERS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS questions_section_stats_delete ON questions")
+    op.execute("DROP TRIGGER IF EXISTS questions_section_stats_update ON questions")
+    op.execute("DROP TRIGGER IF EXISTS questions_section_stats_insert ON questions")
+    op.execute("DROP FUNCTION IF EXISTS sections_apply_question_delta()")
+    op.drop_column('sections', 'updated_at')
+    op.drop_column('sections', 'question_count')
@@ -0,0 +1,76 @@
+"""interned answer texts
+
+Revision ID: a30f878834a6
+Revises: 4b1aee3d4c84
+Create Date: 2026-10-19 19:40:33.959232
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.migration_utils import (
+    add_foreign_key, batched_update, create_index_concurrently, drop_index_concurrently, is_partitioned,
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a30f878834a6'
+down_revision: Union[str, Sequence[str], None] = '4b1aee3d4c84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def create_text_index(name: str, where: str = None) -> None:
+    kw = {"postgresql_where": sa.text(where)} if where else {}
+    if is_partitioned('answers'):
+        # CONCURRENTLY для секционированной таблицы не поддерживается
+        op.create_index(name, 'answers', ['text'], **kw)
+    else:
+        create_index_concurrently(name, 'answers', ['text'], **kw)
+
+
+def drop_text_index(name: str) -> None:
+    if is_partitioned('answers'):
+        # DROP INDEX CONCURRENTLY для секционированного индекса не поддерживается
+        op.drop_index(name, table_name='answers')
+    else:
+        drop_index_concurrently(name, 'answers')
+
+
+def swap_text_index(where: str = None) -> None:
+    """Пересоздать ix_answers_text (частичным или полным) без окна, когда индекса нет"""
+    create_text_index('ix_answers_text_new', where)
+    drop_text_index('ix_answers_text')
+    op.execute("ALTER INDEX ix_answers_text_new RENAME TO ix_answers_text")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'answer_texts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('text', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('text'),
+    )
+    # Столбец без значения по умолчанию добавляется без перезаписи таблицы
+    op.add_column('answers', sa.Column('text_id', sa.Integer(), nullable=True))
+    add_foreign_key('answers', 'answers_text_id_fkey', 'text_id', 'answer_texts')
+    # Интернированные ответы (text IS NULL) не раздувают индекс по тексту
+    swap_text_index('text IS NOT NULL')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Вернуть тексты в строки answers пачками, затем убрать ссылки на answer_texts
+    batched_update(
+        'answers',
+        "text = (SELECT t.text FROM answer_texts t WHERE t.id = answers.text_id), text_id = NULL",
+        "text_id IS NOT NULL",
+    )
+    swap_text_index()
+    op.drop_constraint('answers_text_id_fkey', 'answers', type_='foreignkey')
+    op.drop_column('answers', 'text_id')
+    op.drop_table('answer_texts')
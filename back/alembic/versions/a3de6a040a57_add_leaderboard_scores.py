@@ -0,0 +1,36 @@
+"""add leaderboard scores
+
+Revision ID: a3de6a040a57
+Revises: 0293b6232915
+Create Date: 2026-10-19 19:17:18.342556
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3de6a040a57'
+down_revision: Union[str, Sequence[str], None] = '0293b6232915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'leaderboard_scores',
+        sa.Column('section_id', sa.Integer(), nullable=False),
+        sa.Column('learner_id', sa.Text(), nullable=False),
+        sa.Column('score', sa.Integer(), nullable=False),
+        sa.Column('reached_at', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['section_id'], ['sections.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('section_id', 'learner_id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('leaderboard_scores')
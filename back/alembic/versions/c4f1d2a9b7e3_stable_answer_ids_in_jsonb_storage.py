@@ -0,0 +1,39 @@
+"""stable answer ids in jsonb storage
+
+Revision ID: c4f1d2a9b7e3
+Revises: a30f878834a6
+Create Date: 2026-10-19 21:05:12.418337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.migration_utils import batched_update
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f1d2a9b7e3'
+down_revision: Union[str, Sequence[str], None] = 'a30f878834a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # id ответов JSONB-вопросов берутся из последовательности answers: не пересекаются
+    # с answers.id и не меняются при перестановке ответов
+    op.add_column('questions', sa.Column('answer_ids', postgresql.ARRAY(sa.Integer()), nullable=True))
+    batched_update(
+        'questions',
+        "answer_ids = ARRAY(SELECT nextval(pg_get_serial_sequence('answers', 'id')) "
+        "FROM jsonb_array_elements(answers_data))",
+        'answers_data IS NOT NULL AND answer_ids IS NULL',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('questions', 'answer_ids')
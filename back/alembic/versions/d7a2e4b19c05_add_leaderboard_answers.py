@@ -0,0 +1,39 @@
+"""add leaderboard answers
+
+Revision ID: d7a2e4b19c05
+Revises: c4f1d2a9b7e3
+Create Date: 2026-10-19 21:40:27.903114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a2e4b19c05'
+down_revision: Union[str, Sequence[str], None] = 'c4f1d2a9b7e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Очко в рейтинге - один раз за вопрос: уже засчитанные вопросы ученика
+    op.create_table(
+        'leaderboard_answers',
+        sa.Column('section_id', sa.Integer(), nullable=False),
+        sa.Column('learner_id', sa.Text(), nullable=False),
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['section_id'], ['sections.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['question_id'], ['questions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('section_id', 'learner_id', 'question_id'),
+    )
+    op.create_index('ix_leaderboard_answers_question_id', 'leaderboard_answers', ['question_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_leaderboard_answers_question_id', table_name='leaderboard_answers')
+    op.drop_table('leaderboard_answers')
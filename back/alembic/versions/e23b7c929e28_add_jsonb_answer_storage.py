@@ -0,0 +1,41 @@
+"""add jsonb answer storage
+
+Revision ID: e23b7c929e28
+Revises: 8e04ac52e2e9
+Create Date: 2026-10-19 18:44:34.561718
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e23b7c929e28'
+down_revision: Union[str, Sequence[str], None] = '8e04ac52e2e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Оба столбца nullable: существующие вопросы остаются в answers (dual-read)
+    op.add_column('questions', sa.Column('answers_data', postgresql.JSONB(), nullable=True))
+    op.add_column('questions', sa.Column('correct_index', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Вернуть денормализованные ответы в таблицу answers, чтобы не потерять данные
+    op.execute("""
+        INSERT INTO answers (text, is_correct, question_id)
+        SELECT e.text, e.ord - 1 = q.correct_index, q.id
+        FROM questions q,
+             jsonb_array_elements_text(q.answers_data) WITH ORDINALITY AS e(text, ord)
+        WHERE q.answers_data IS NOT NULL
+        ORDER BY q.id, e.ord
+    """)
+    op.drop_column('questions', 'correct_index')
+    op.drop_column('questions', 'answers_data')
@@ -0,0 +1,88 @@
+"""section stats only on section change
+
+Revision ID: e9c3a7f5d1b2
+Revises: d7a2e4b19c05
+Create Date: 2026-10-19 22:02:48.317560
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9c3a7f5d1b2'
+down_revision: Union[str, Sequence[str], None] = 'd7a2e4b19c05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Триггеры остаются прежними, меняется только функция: UPDATE вопросов учитывается,
+# только если у строки сменилась секция (бэкфиллы не сдвигают updated_at)
+SECTION_STATS_FUNCTION = """
+CREATE OR REPLACE FUNCTION sections_apply_question_delta() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE sections s
+        SET question_count = s.question_count + d.n, updated_at = now()
+        FROM (SELECT section_id, count(*) AS n FROM new_questions
+              WHERE section_id IS NOT NULL GROUP BY section_id) d
+        WHERE s.id = d.section_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE sections s
+        SET question_count = s.question_count - d.n, updated_at = now()
+        FROM (SELECT section_id, count(*) AS n FROM old_questions
+              WHERE section_id IS NOT NULL GROUP BY section_id) d
+        WHERE s.id = d.section_id;
+    ELSE
+        UPDATE sections s
+        SET question_count = s.question_count + d.n, updated_at = now()
+        FROM (SELECT section_id, sum(delta) AS n
+              FROM (SELECT n.section_id, 1 AS delta
+                    FROM old_questions o JOIN new_questions n ON n.id = o.id
+                    WHERE o.section_id IS DISTINCT FROM n.section_id
+                    UNION ALL
+                    SELECT o.section_id, -1
+                    FROM old_questions o JOIN new_questions n ON n.id = o.id
+                    WHERE o.section_id IS DISTINCT FROM n.section_id) moved
+              WHERE section_id IS NOT NULL GROUP BY section_id) d
+        WHERE s.id = d.section_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Функция из 8e04ac52e2e9
+PREVIOUS_SECTION_STATS_FUNCTION = """
+CREATE OR REPLACE FUNCTION sections_apply_question_delta() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE sections s
+        SET question_count = s.question_count + d.n, updated_at = now()
+        FROM (SELECT section_id, count(*) AS n FROM new_questions
+              WHERE section_id IS NOT NULL GROUP BY section_id) d
+        WHERE s.id = d.section_id;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE sections s
+        SET question_count = s.question_count - d.n, updated_at = now()
+        FROM (SELECT section_id, count(*) AS n FROM old_questions
+              WHERE section_id IS NOT NULL GROUP BY section_id) d
+        WHERE s.id = d.section_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(SECTION_STATS_FUNCTION)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(PREVIOUS_SECTION_STATS_FUNCTION)
@@ -0,0 +1,156 @@
+"""
+Контроль допуска запросов: отдельные лимиты параллельности и очереди для чтения и записи
+
+Тяжелые POST не должны занимать все соединения пула и потоки: записи идут
+не больше WRITE_CONCURRENCY одновременно, остальные ждут в ограниченной
+очереди. Переполненная очередь - 429, истекшее ожидание - 503, оба с Retry-After.
+Лимиты действуют в пределах одного процесса (воркера gunicorn).
+"""
+import asyncio
+import json
+import math
+from collections import deque
+from typing import Dict, Optional
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Служебные пути не ограничиваются: балансировщик должен видеть живость при перегрузке
+EXEMPT_PATHS = {"/health", "/ready", "/metrics", "/api/health", "/api/ready", "/api/metrics"}
+
+# Долгоживущие потоки (SSE) держали бы слот чтения все время подключения.
+# Их число ограничивает сам EventBroadcaster, частоту подключений - RateLimitMiddleware
+STREAMING_PATHS = {"/events/", "/api/events/"}
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionLimit:
+    """concurrency слотов плюс FIFO-очередь ожидания не длиннее queue_size
+
+    Очередь - это futures текущего event loop, поэтому объект не привязан к
+    конкретному циклу и может создаваться при импорте.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._waiters = deque()
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_waiting = 0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.queue_timeout))
+
+    async def acquire(self):
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            raise Rejected(429, f"Too many {self.name} requests in queue", self.retry_after)
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.max_waiting = max(self.max_waiting, len(self._waiters))
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if future.done() and not future.cancelled():
+                # Слот уже передан этому запросу - вернуть его следующему
+                self.release()
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            raise Rejected(503, f"Timed out waiting for a {self.name} slot", self.retry_after)
+        finally:
+            if future in self._waiters:
+                self._waiters.remove(future)
+        self.admitted += 1
+
+    def release(self):
+        # Слот передается первому ожидающему, active при этом не меняется
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+def route_path(scope) -> str:
+    """Путь без root_path: приложение смонтировано под /api, правила и списки путей - без префикса"""
+    path = scope["path"]
+    root_path = scope.get("root_path", "")
+    if root_path and path.startswith(root_path + "/"):
+        return path[len(root_path):]
+    return path
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """read / write или None для служебных и потоковых путей"""
+    if path in EXEMPT_PATHS or path in STREAMING_PATHS:
+        return None
+    return "write" if method in WRITE_METHODS else "read"
+
+
+class AdmissionMiddleware:
+    """ASGI-middleware: слот занят до конца отправки ответа (включая потоковые)"""
+
+    def __init__(self, app, limits: Dict[str, AdmissionLimit]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = None
+        if scope["type"] == "http":
+            limit = self.limits.get(route_class(scope["method"], route_path(scope)))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await limit.acquire()
+        except Rejected as exc:
+            body = json.dumps({"detail": exc.detail}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": exc.status_code,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(exc.retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
@@ -0,0 +1,109 @@
+"""
+Массовая замена и удаление содержимого: несколько set-based запросов в одной транзакции
+
+Зависимые строки (ответы, состояние повторений, рейтинги) удаляет сама БД по
+ON DELETE CASCADE. Замена секций целиком - это импорт (app/ingest.py, replace=True).
+Коммит, уведомления и сброс кэшей - за вызывающим (см. app/main.py).
+"""
+import json
+from typing import Dict, List, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from . import schemas
+
+# question_count в RETURNING - значение до удаления вопросов каскадом
+DELETE_SECTIONS_SQL = "DELETE FROM sections WHERE id = ANY(:ids) RETURNING id, question_count"
+
+DELETE_QUESTIONS_SQL = "DELETE FROM questions WHERE id = ANY(:ids) RETURNING id, section_id"
+
+# Новые тексты и ответы одним UPDATE из JSON-массива; в режиме jsonb ответы - в строке вопроса
+# и получают новые id, как замененные строки answers
+UPDATE_QUESTIONS_SQL = """
+UPDATE questions q
+SET text = x.question,
+    answers_data = CASE WHEN :jsonb THEN x.answers END,
+    correct_index = CASE WHEN :jsonb THEN x.correct END,
+    answer_ids = CASE WHEN :jsonb THEN
+        ARRAY(SELECT nextval(pg_get_serial_sequence('answers', 'id')) FROM jsonb_array_elements(x.answers))
+    END
+FROM jsonb_to_recordset(CAST(:items AS jsonb)) AS x(id integer, question text, answers jsonb, correct integer)
+WHERE q.id = x.id
+RETURNING q.id, q.section_id
+"""
+
+DELETE_ANSWERS_SQL = "DELETE FROM answers WHERE question_id = ANY(:ids)"
+
+# Триггер статистики секций не трогает updated_at при UPDATE без смены секции,
+# а замена вопросов - изменение содержимого
+TOUCH_SECTIONS_SQL = "UPDATE sections SET updated_at = now() WHERE id = ANY(:ids)"
+
+INSERT_ANSWERS_SQL = {
+    "normalized": """
+        INSERT INTO answers (text, is_correct, question_id)
+        SELECT e.text, e.ord - 1 = x.correct, x.id
+        FROM jsonb_to_recordset(CAST(:items AS jsonb)) AS x(id integer, answers jsonb, correct integer),
+             jsonb_array_elements_text(x.answers) WITH ORDINALITY AS e(text, ord)
+        ORDER BY x.id, e.ord
+    """,
+    "interned": """
+        INSERT INTO answers (text_id, is_correct, question_id)
+        SELECT t.id, e.ord - 1 = x.correct, x.id
+        FROM jsonb_to_recordset(CAST(:items AS jsonb)) AS x(id integer, answers jsonb, correct integer)
+        CROSS JOIN LATERAL jsonb_array_elements_text(x.answers) WITH ORDINALITY AS e(text, ord)
+        JOIN answer_texts t ON t.text = e.text
+        ORDER BY x.id, e.ord
+    """,
+}
+
+INTERN_TEXTS_SQL = """
+INSERT INTO answer_texts (text)
+SELECT DISTINCT e.text
+FROM jsonb_to_recordset(CAST(:items AS jsonb)) AS x(answers jsonb), jsonb_array_elements_text(x.answers) AS e(text)
+ORDER BY 1
+ON CONFLICT (text) DO NOTHING
+"""
+
+
+def delete_sections(db: Session, section_ids: List[int]) -> Tuple[Dict[str, int], Set[int]]:
+    """Удалить секции со всем содержимым; (счетчики, id удаленных секций)"""
+    rows = db.execute(text(DELETE_SECTIONS_SQL), {"ids": section_ids}).all()
+    deleted = {section_id for section_id, _ in rows}
+    return {"sections": len(deleted), "questions": sum(count for _, count in rows)}, deleted
+
+
+def delete_questions(db: Session, question_ids: List[int]) -> Tuple[Dict[str, int], Set[int], Set[int]]:
+    """Удалить вопросы с ответами; (счетчики, id удаленных вопросов, id затронутых секций)"""
+    rows = db.execute(text(DELETE_QUESTIONS_SQL), {"ids": question_ids}).all()
+    return (
+        {"sections": 0, "questions": len(rows)},
+        {question_id for question_id, _ in rows},
+        {section_id for _, section_id in rows if section_id is not None},
+    )
+
+
+def replace_questions(db: Session, questions: List[schemas.QuestionReplace],
+                      storage: str) -> Tuple[Dict[str, int], Set[int], Set[int]]:
+    """Заменить текст и ответы вопросов; (счетчики, id обновленных вопросов, id затронутых секций)
+
+    Старые ответы удаляются для всех вопросов сразу: вопрос может сменить способ
+    хранения ответов (таблица answers, JSONB, общие тексты) по ANSWER_STORAGE.
+    """
+    items = [{"id": q.id, "question": q.question, "answers": q.answers, "correct": q.correct} for q in questions]
+    rows = db.execute(
+        text(UPDATE_QUESTIONS_SQL), {"items": json.dumps(items, ensure_ascii=False), "jsonb": storage == "jsonb"}
+    ).all()
+    updated = {question_id for question_id, _ in rows}
+    db.execute(text(DELETE_ANSWERS_SQL), {"ids": list(updated)})
+    answers = 0
+    if storage in INSERT_ANSWERS_SQL:
+        # Ответы только для найденных вопросов; откатывать ли остальное - решает вызывающий
+        found = json.dumps([item for item in items if item["id"] in updated], ensure_ascii=False)
+        if storage == "interned":
+            db.execute(text(INTERN_TEXTS_SQL), {"items": found})
+        answers = db.execute(text(INSERT_ANSWERS_SQL[storage]), {"items": found}).rowcount
+    section_ids = {section_id for _, section_id in rows if section_id is not None}
+    db.execute(text(TOUCH_SECTIONS_SQL), {"ids": list(section_ids)})
+    counts = {"questions": len(updated), "answers": answers, "sections": len({s for _, s in rows})}
+    return counts, updated, section_ids
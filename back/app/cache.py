@@ -0,0 +1,395 @@
+"""
+Кэш готовых (сериализованных) ответов по секциям, кэш id секций по имени
+и кэш интернированных текстов ответов
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .compression import compress
+from .core.config import settings
+from .formats import render_questions
+from .tracing import tracer
+
+
+# Сколько помнить сброс секции после окончания replica_hold: чтения из БД,
+# начатые до более старого сброса, в кэш не попадают
+INVALIDATION_MEMORY_SECONDS = 1.0
+
+
+class SectionCache:
+    """LRU-кэш ответов по секциям с TTL
+
+    Для каждой секции хранится несколько вариантов одного ответа
+    (например, разные форматы или кодировки), они инвалидируются вместе.
+
+    После сброса секция не заполняется ответом, прочитанным из БД до сброса
+    (token из fill_token), и в течение replica_hold - ответом с реплики:
+    реплика могла еще не получить запись, из-за которой секцию сбросили.
+    """
+
+    def __init__(self, max_sections: int, ttl: float, replica_hold: float = 0.0):
+        self.max_sections = max_sections
+        self.ttl = ttl
+        self.replica_hold = replica_hold
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        # Номер сброса; для секций - (номер последнего сброса, до какого момента не брать реплики)
+        self._sequence = 0
+        self._invalidated: "OrderedDict[int, Tuple[int, float]]" = OrderedDict()
+        self._cleared = (0, 0.0)
+        # Сбросы не новее этого номера забыты: более ранние чтения не кэшируются
+        self._forgotten = 0
+        self._lock = threading.Lock()
+
+    def fill_token(self) -> int:
+        """Номер последнего сброса до чтения из БД: передается в set"""
+        with self._lock:
+            return self._sequence
+
+    def get(self, section_id: int, variant: str = "json") -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(section_id)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[section_id]
+                entry = None
+            payload = entry[1].get(variant) if entry is not None else None
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(section_id)
+            self.hits += 1
+            return payload
+
+    def set(self, section_id: int, payload: bytes, variant: str = "json",
+            token: Optional[int] = None, from_replica: bool = False):
+        if self.max_sections <= 0:
+            return
+        with self._lock:
+            if not self._accepts(section_id, token, from_replica):
+                self.rejected += 1
+                return
+            entry = self._entries.get(section_id)
+            if entry is None or entry[0] < time.monotonic():
+                entry = (time.monotonic() + self.ttl, {})
+                self._entries[section_id] = entry
+            entry[1][variant] = payload
+            self._entries.move_to_end(section_id)
+            while len(self._entries) > self.max_sections:
+                self._entries.popitem(last=False)
+
+    def _accepts(self, section_id: int, token: Optional[int], from_replica: bool) -> bool:
+        now = time.monotonic()
+        if token is not None and token < self._forgotten:
+            return False
+        for sequence, hold_until in (self._cleared, self._invalidated.get(section_id, (0, 0.0))):
+            # Секцию сбросили, пока ответ читался из БД
+            if token is not None and sequence > token:
+                return False
+            if from_replica and hold_until > now:
+                return False
+        return True
+
+    def invalidate(self, section_ids: Iterable[int]):
+        with self._lock:
+            self._sequence += 1
+            now = time.monotonic()
+            for section_id in section_ids:
+                self._entries.pop(section_id, None)
+                self._invalidated[section_id] = (self._sequence, now + self.replica_hold)
+                self._invalidated.move_to_end(section_id)
+            # Записи упорядочены по времени сброса: старые забываются с начала
+            while self._invalidated:
+                section_id, (sequence, hold_until) = next(iter(self._invalidated.items()))
+                if hold_until + INVALIDATION_MEMORY_SECONDS > now:
+                    break
+                del self._invalidated[section_id]
+                self._forgotten = sequence
+
+    def clear(self):
+        with self._lock:
+            self._sequence += 1
+            self._entries.clear()
+            self._invalidated.clear()
+            self._cleared = (self._sequence, time.monotonic() + self.replica_hold)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "sections": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+            }
+
+
+# Реплика отстает не дольше, чем клиент после записи читает с primary
+section_cache = SectionCache(
+    settings.SECTION_CACHE_SIZE, settings.SECTION_CACHE_TTL_SECONDS, replica_hold=settings.DB_REPLICA_STICKY_SECONDS
+)
+
+
+SELECT_SECTION_IDS_SQL = "SELECT name, id FROM sections WHERE name = ANY(:names)"
+
+# Гонка двух воркеров за новое имя решается уникальным индексом ix_sections_name:
+# проигравший INSERT ждет коммита победителя и ничего не вставляет, id дочитывается SELECT
+CREATE_SECTIONS_SQL = """
+INSERT INTO sections (name)
+SELECT name FROM unnest(CAST(:names AS text[])) AS name ORDER BY name
+ON CONFLICT (name) DO NOTHING
+RETURNING name, id
+"""
+
+
+class SectionResolver:
+    """Имя секции -> id: LRU-кэш на процесс, промахи - одним запросом на пакет
+
+    В кэш попадают только id, прочитанные из БД (уже закоммиченные секции):
+    секция, созданная в транзакции, которая потом откатится, в кэш не попадет.
+    """
+
+    def __init__(self, max_names: int):
+        self.max_names = max_names
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self._ids: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, db: Session, names: Iterable[str]) -> Dict[str, int]:
+        """id для всех имен; недостающие секции создаются в текущей транзакции db"""
+        names = list(dict.fromkeys(names))
+        resolved = {}
+        with self._lock:
+            for name in names:
+                section_id = self._ids.get(name)
+                if section_id is not None:
+                    self._ids.move_to_end(name)
+                    resolved[name] = section_id
+            self.hits += len(resolved)
+            self.misses += len(names) - len(resolved)
+        missing = [name for name in names if name not in resolved]
+        if not missing:
+            return resolved
+
+        found = dict(db.execute(text(SELECT_SECTION_IDS_SQL), {"names": missing}).all())
+        self._remember(found)
+        resolved.update(found)
+        missing = [name for name in missing if name not in found]
+        if missing:
+            created = dict(db.execute(text(CREATE_SECTIONS_SQL), {"names": missing}).all())
+            self.created += len(created)
+            resolved.update(created)
+            # Имена, созданные параллельно другой транзакцией, уже закоммичены
+            raced = [name for name in missing if name not in created]
+            if raced:
+                found = dict(db.execute(text(SELECT_SECTION_IDS_SQL), {"names": raced}).all())
+                self._remember(found)
+                resolved.update(found)
+        return resolved
+
+    def _remember(self, ids: Dict[str, int]):
+        if self.max_names <= 0:
+            return
+        with self._lock:
+            self._ids.update(ids)
+            for name in ids:
+                self._ids.move_to_end(name)
+            while len(self._ids) > self.max_names:
+                self._ids.popitem(last=False)
+
+    def invalidate_ids(self, section_ids: Iterable[int]):
+        """Секции удалены: их имена больше не должны давать старые id"""
+        section_ids = set(section_ids)
+        with self._lock:
+            for name in [name for name, section_id in self._ids.items() if section_id in section_ids]:
+                del self._ids[name]
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "names": len(self._ids),
+                "hits": self.hits,
+                "misses": self.misses,
+                "created": self.created,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+section_resolver = SectionResolver(settings.SECTION_RESOLVER_SIZE)
+
+
+SELECT_TEXT_IDS_SQL = "SELECT text, id FROM answer_texts WHERE text = ANY(:texts)"
+
+# Как у секций: параллельная вставка того же текста ждет коммита и пропускается
+CREATE_TEXTS_SQL = """
+INSERT INTO answer_texts (text)
+SELECT text FROM unnest(CAST(:texts AS text[])) AS text ORDER BY text
+ON CONFLICT (text) DO NOTHING
+RETURNING text, id
+"""
+
+SELECT_TEXTS_SQL = "SELECT id, text FROM answer_texts WHERE id = ANY(:ids)"
+
+
+class AnswerTexts:
+    """Интернированные тексты ответов (ANSWER_STORAGE=interned)
+
+    id -> текст хранится в LRU-кэше на процесс. Строка answer_texts не меняется
+    и не удаляется, а id не переиспользуются, поэтому кэш не нужно сбрасывать -
+    даже id из откатившейся транзакции просто никто больше не запросит.
+    """
+
+    def __init__(self, max_texts: int):
+        self.max_texts = max_texts
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self._texts: "OrderedDict[int, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def intern(self, db: Session, texts: Iterable[str]) -> Dict[str, int]:
+        """id для всех текстов; недостающие создаются в текущей транзакции db"""
+        texts = list(dict.fromkeys(texts))
+        if not texts:
+            return {}
+        ids = dict(db.execute(text(SELECT_TEXT_IDS_SQL), {"texts": texts}).all())
+        missing = [value for value in texts if value not in ids]
+        if missing:
+            created = dict(db.execute(text(CREATE_TEXTS_SQL), {"texts": missing}).all())
+            self.created += len(created)
+            ids.update(created)
+            raced = [value for value in missing if value not in created]
+            if raced:
+                ids.update(db.execute(text(SELECT_TEXT_IDS_SQL), {"texts": raced}).all())
+        self._remember({text_id: value for value, text_id in ids.items()})
+        return ids
+
+    def texts(self, db: Session, ids: Iterable[int]) -> Dict[int, str]:
+        """Тексты по id: из кэша, промахи - одним запросом"""
+        ids = list(dict.fromkeys(ids))
+        found = {}
+        with self._lock:
+            for text_id in ids:
+                value = self._texts.get(text_id)
+                if value is not None:
+                    self._texts.move_to_end(text_id)
+                    found[text_id] = value
+            self.hits += len(found)
+            self.misses += len(ids) - len(found)
+        missing = [text_id for text_id in ids if text_id not in found]
+        if missing:
+            loaded = dict(db.execute(text(SELECT_TEXTS_SQL), {"ids": missing}).all())
+            self._remember(loaded)
+            found.update(loaded)
+        return found
+
+    def _remember(self, texts: Dict[int, str]):
+        if self.max_texts <= 0:
+            return
+        with self._lock:
+            self._texts.update(texts)
+            for text_id in texts:
+                self._texts.move_to_end(text_id)
+            while len(self._texts) > self.max_texts:
+                self._texts.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._texts.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "texts": len(self._texts),
+                "hits": self.hits,
+                "misses": self.misses,
+                "created": self.created,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+answer_texts = AnswerTexts(settings.ANSWER_TEXT_CACHE_SIZE)
+
+
+def get_section_payload(
+    section_id: int, fmt: str, encoding: Optional[str], load_questions: Callable[[], List],
+    use_cache: bool = True, from_replica: bool = False,
+) -> Optional[Tuple[bytes, Optional[str]]]:
+    """Ответ секции в формате fmt: (тело, Content-Encoding) или None, если вопросов нет
+
+    Варианты кэшируются по ключам "<формат>" и "<формат>:<кодировка>",
+    поэтому горячая секция сериализуется и сжимается один раз.
+    use_cache=False (клиент читает свои записи с primary) - кэш не читается и
+    не заполняется; from_replica - вопросы читаются с реплики.
+    """
+    if not use_cache:
+        questions = load_questions()
+        if not questions:
+            return None
+        payload = render_questions(questions, fmt)
+        if encoding is not None and len(payload) >= settings.COMPRESSION_MINIMUM_SIZE:
+            with tracer.span("compress", encoding=encoding, size=len(payload)):
+                return compress(payload, encoding), encoding
+        return payload, None
+
+    # Сброс секции после этой точки не даст записать в кэш ответ, прочитанный до него
+    token = section_cache.fill_token()
+    if encoding is not None:
+        compressed = section_cache.get(section_id, f"{fmt}:{encoding}")
+        if compressed is not None:
+            return compressed, encoding
+
+    payload = section_cache.get(section_id, fmt)
+    loaded = payload is None
+    if loaded:
+        questions = load_questions()
+        if not questions:
+            return None
+        payload = render_questions(questions, fmt)
+        section_cache.set(section_id, payload, fmt, token=token, from_replica=from_replica)
+
+    if encoding is not None and len(payload) >= settings.COMPRESSION_MINIMUM_SIZE:
+        with tracer.span("compress", encoding=encoding, size=len(payload)):
+            compressed = compress(payload, encoding, cached=True)
+        section_cache.set(
+            section_id, compressed, f"{fmt}:{encoding}", token=token, from_replica=loaded and from_replica
+        )
+        return compressed, encoding
+    return payload, None
+
+
+def get_sections_json(
+    section_ids: List[int], load_sections: Callable[[List[int]], Dict[int, List]],
+    use_cache: bool = True, from_replica: bool = False,
+) -> Dict[int, bytes]:
+    """JSON-ответы нескольких секций: из кэша, недостающие - одним вызовом load_sections"""
+    payloads = {}
+    misses = []
+    for section_id in section_ids:
+        payload = section_cache.get(section_id, "json") if use_cache else None
+        if payload is None:
+            misses.append(section_id)
+        else:
+            payloads[section_id] = payload
+    if misses:
+        token = section_cache.fill_token()
+        for section_id, questions in load_sections(misses).items():
+            if questions:
+                payload = render_questions(questions, "json")
+                if use_cache:
+                    section_cache.set(section_id, payload, "json", token=token, from_replica=from_replica)
+                payloads[section_id] = payload
+    return payloads
@@ -0,0 +1,126 @@
+"""
+Сжатие ответов: согласование gzip/brotli/zstd и ASGI-middleware
+"""
+import gzip
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    # Зависимости проекта, но окружение без них все равно работает: остаются zstd (если есть) и gzip
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Кодировки в порядке предпочтения сервера
+ENCODINGS = [
+    encoding
+    for encoding, available in (("zstd", zstandard), ("br", brotli), ("gzip", True))
+    if available
+]
+
+# Уровни сжатия: для кэшируемых ответов сжимаем сильнее, т.к. это делается один раз
+LEVELS = {
+    "zstd": {"dynamic": 3, "cached": 10},
+    "br": {"dynamic": 4, "cached": 9},
+    "gzip": {"dynamic": 6, "cached": 9},
+}
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript")
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Выбрать кодировку по заголовку Accept-Encoding (с учетом q-значений)"""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+    for encoding in ENCODINGS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str, cached: bool = False) -> bytes:
+    level = LEVELS[encoding]["cached" if cached else "dynamic"]
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";")[0].strip()
+    return media_type.startswith(COMPRESSIBLE_TYPES) or media_type.endswith("+json")
+
+
+class CompressionMiddleware:
+    """Сжимает готовые (не потоковые) ответы не меньше minimum_size байт
+
+    Ответы, у которых уже есть Content-Encoding (например, заранее сжатые
+    варианты из кэша секций), и потоковые ответы передаются как есть.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                # Заголовки отправим, когда станет известно тело ответа
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or "content-encoding" in headers
+                or len(body) < self.minimum_size
+                or not is_compressible(headers.get("content-type", ""))
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,45 +1,179 @@
+from functools import lru_cache
+from typing import Literal, Optional, Tuple
+
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import sys
 import os
 
 # Добавляем путь к корневой директории проекта для импорта config
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
 
 try:
-    from config.database import config as app_config
+    from config.database import get_config
 except ImportError:
     # Fallback для случаев, когда config недоступен
-    app_config = None
+    get_config = None
+
+
+def _default_database_url() -> Optional[str]:
+    # Централизованная конфигурация собирается только если DATABASE_URL не задан явно
+    return get_config().database_url if get_config else None
+
+
+def _default_replica_urls() -> Tuple[str, ...]:
+    return tuple(get_config().database.replica_urls) if get_config else ()
+
 
 class Settings(BaseSettings):
     # Используем централизованную конфигурацию, если доступна
-    DATABASE_URL: str = app_config.database_url if app_config else None
-    
+    DATABASE_URL: Optional[str] = Field(default_factory=_default_database_url)
+
+    # Реплики только для чтения: GET-эндпоинты распределяются по ним round-robin
+    DATABASE_REPLICA_URLS: Tuple[str, ...] = Field(default_factory=_default_replica_urls)
+    # Сколько секунд после записи клиент читает с primary (read-your-writes)
+    DB_REPLICA_STICKY_SECONDS: int = 5
+    # Через сколько секунд повторно пробовать недоступную реплику
+    DB_REPLICA_RETRY_SECONDS: float = 30.0
+    # Период фоновой проверки реплик, с; 0 - исключение только по ошибкам запросов
+    DB_REPLICA_CHECK_INTERVAL: float = 5.0
+    # Реплика, отставшая сильнее, исключается до следующей проверки
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0
+
+    # Кэш готовых ответов по секциям
+    SECTION_CACHE_SIZE: int = 256
+    SECTION_CACHE_TTL_SECONDS: float = 60.0
+    # Сколько самых больших секций прогревать при старте (0 - только пул соединений)
+    WARMUP_SECTIONS: int = 20
+    # Кэш id секций по имени для POST /tests/ (имен на процесс)
+    SECTION_RESOLVER_SIZE: int = 10_000
+    # Максимум секций в одном запросе /sections/tests/?ids=...
+    MAX_BATCH_SECTIONS: int = 500
+    # Максимум id в одном массовом удалении/замене (DELETE/PUT /admin/sections|questions/)
+    MAX_BULK_IDS: int = 100_000
+
+    # HTTP-кэширование GET-ответов (микрокэш nginx и браузер), секунды
+    HTTP_CACHE_MAX_AGE: int = 5
+    HTTP_CACHE_STALE_IF_ERROR: int = 300
+
+    # Хранение ответов: normalized - таблица answers, jsonb - массив в строке вопроса,
+    # interned - строки answers ссылаются на общий текст в answer_texts.
+    # Влияет только на запись, чтение понимает все варианты
+    ANSWER_STORAGE: Literal["normalized", "jsonb", "interned"] = "normalized"
+    # Кэш текстов ответов по id (interned) на процесс, число текстов
+    ANSWER_TEXT_CACHE_SIZE: int = 100_000
+
+    # Контроль допуска (на воркер): параллельность, длина очереди и ожидание в ней, с.
+    # Записи ограничены сильнее, чтобы импорты не забирали пул соединений у чтения
+    READ_CONCURRENCY: int = 10
+    READ_QUEUE_SIZE: int = 100
+    READ_QUEUE_TIMEOUT: float = 2.0
+    WRITE_CONCURRENCY: int = 2
+    WRITE_QUEUE_SIZE: int = 16
+    WRITE_QUEUE_TIMEOUT: float = 30.0
+
+    # Ограничение частоты: "METHOD /path=RATE/s:BURST; ...", пусто - отключено
+    RATE_LIMITS: str = "/admin/*=1/s:5; POST /tests/=5/s:20; GET /sections/*=20/s:60; *=50/s:100"
+    # memory - корзины в процессе (лимит на воркер), postgres - общая UNLOGGED-таблица
+    RATE_LIMIT_BACKEND: Literal["memory", "postgres"] = "memory"
+    RATE_LIMIT_MAX_CLIENTS: int = 100_000
+    # Заголовок с IP клиента от nginx; пусто - адрес TCP-соединения
+    RATE_LIMIT_CLIENT_HEADER: str = "x-real-ip"
+    # Адреса/сети прокси через запятую, от которых заголовку верят; пусто - не верить никому
+    RATE_LIMIT_TRUSTED_PROXIES: str = ""
+    # Известные API-ключи (заголовок X-API-Key) через запятую: у каждого своя корзина
+    RATE_LIMIT_API_KEYS: str = ""
+
+    # Уведомления об изменении секций (SSE /events/ через LISTEN/NOTIFY):
+    # по одному соединению LISTEN на воркер, подписчиков на воркер не больше EVENTS_MAX_SUBSCRIBERS
+    EVENTS_ENABLED: bool = True
+    EVENTS_MAX_SUBSCRIBERS: int = 1000
+    # Интервал комментариев-пингов в потоке, с: держит соединение через прокси
+    EVENTS_KEEPALIVE_SECONDS: float = 15.0
+
+    # Интервальные повторения (SM-2): очередей (ученик, секция) в памяти воркера,
+    # период и размер пакетной записи в review_states, новых вопросов в одной пачке
+    SCHEDULER_MAX_QUEUES: int = 200_000
+    SCHEDULER_FLUSH_INTERVAL: float = 1.0
+    SCHEDULER_FLUSH_BATCH: int = 5000
+    SCHEDULER_NEW_PER_BATCH: int = 10
+
+    # Таблицы лидеров секций: период снимка приростов очков в leaderboard_scores, с
+    LEADERBOARD_SNAPSHOT_INTERVAL: float = 5.0
+    # Максимум строк в одном запросе топа
+    LEADERBOARD_MAX_LIMIT: int = 100
+
+    # Каталог статической публикации секций (общий с nginx); не задан - публикация отключена
+    PUBLISH_DIR: Optional[str] = None
+    # Сколько версий файлов с хэшем хранить на секцию
+    PUBLISH_KEEP_VERSIONS: int = 2
+
+    # Трассировка (W3C trace context, экспорт OTLP/JSON): none - выключена,
+    # file - строки JSON в TRACING_FILE, otlp - POST в коллектор OTLP/HTTP
+    TRACING_EXPORTER: Literal["none", "file", "otlp"] = "none"
+    TRACING_FILE: str = "traces.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    # Доля новых трасс; с traceparent от nginx/клиента решение берется из его флага sampled
+    TRACING_SAMPLE_RATIO: float = Field(0.01, ge=0.0, le=1.0)
+    TRACING_SERVICE_NAME: str = "easy-test-backend"
+    # Законченных span в очереди экспорта на процесс; сверх этого span отбрасываются
+    TRACING_QUEUE_SIZE: int = 10_000
+
+    # Логи: JSON в stdout через очередь (вывод в отдельном потоке), записей в очереди на процесс
+    LOG_LEVEL: Literal["DEBUG", "INFO", "WARNING", "ERROR"] = "INFO"
+    LOG_QUEUE_SIZE: int = 10_000
+    # Доля записей INFO и ниже по логгерам: "app.access=0.1; uvicorn=0.5"; пусто - пишется все
+    LOG_SAMPLING: str = ""
+    # Запрос дольше этого (мс) или с ошибкой 5xx попадает в access log как WARNING, мимо сэмплирования
+    LOG_SLOW_REQUEST_MS: float = 1000.0
+
+    # Токен для /admin/* (заголовок X-Admin-Token); не задан - админ-эндпоинты отключены
+    ADMIN_API_TOKEN: Optional[str] = None
+    # Размер пачки (одна транзакция) при массовом импорте
+    IMPORT_BATCH_SIZE: int = 100_000
+
+    # Сжатие ответов меньше этого размера (байт) не окупается
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+
     # Дополнительные настройки
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
     BACKEND_HOST: str = os.getenv("BACKEND_HOST", "0.0.0.0")
     BACKEND_PORT: int = int(os.getenv("BACKEND_PORT", "8000"))
     API_BASE_URL: str = os.getenv("API_BASE_URL")
-    
+
     model_config = SettingsConfigDict(
         env_file=".env",
-        extra="ignore"  # Игнорируем дополнительные переменные
+        extra="ignore",  # Игнорируем дополнительные переменные
+        frozen=True,  # Настройки - неизменяемый снимок
     )
-    
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        
+
         # Валидация обязательных переменных
         if not self.DATABASE_URL:
             raise ValueError(
                 "Отсутствует обязательная переменная: DATABASE_URL\n"
                 "Скопируйте config/env.example в .env и заполните значения"
             )
-        
+
         if not self.API_BASE_URL:
             raise ValueError(
                 "Отсутствует обязательная переменная: API_BASE_URL\n"
                 "Скопируйте config/env.example в .env и заполните значения"
             )
 
-settings = Settings()
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Получить общий экземпляр настроек (создается лениво при первом обращении)"""
+    return Settings()
+
+
+def __getattr__(name):
+    # `from app.core.config import settings` создает настройки только по требованию
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,200 @@
+"""
+Запросы к БД, общие для нескольких эндпоинтов
+"""
+import json
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session, attributes
+
+from . import models
+from .cache import answer_texts
+from .tracing import tracer
+
+
+def load_answers(db: Session, questions: List[models.Question]):
+    """Подгрузить ответы одним запросом, только для вопросов без answers_data"""
+    normalized = {q.id: q for q in questions if q.answers_data is None}
+    if not normalized:
+        return
+    answers = defaultdict(list)
+    for answer in (
+        db.query(models.Answer)
+        .filter(models.Answer.question_id.in_(list(normalized)))
+        .order_by(models.Answer.id)
+    ):
+        answers[answer.question_id].append(answer)
+    fill_answer_texts(db, [answer for question_answers in answers.values() for answer in question_answers])
+    for question_id, question in normalized.items():
+        attributes.set_committed_value(question, "answers", answers[question_id])
+
+
+def fill_answer_texts(db: Session, answers: Iterable[models.Answer]):
+    """Подставить тексты интернированных ответов (text_id) из кэша answer_texts
+
+    Текст ставится как загруженное значение, без изменения строки: схемы и
+    форматы ответа читают answer.text как при хранении normalized.
+    """
+    interned = [answer for answer in answers if answer.text is None and answer.text_id is not None]
+    if not interned:
+        return
+    texts = answer_texts.texts(db, (answer.text_id for answer in interned))
+    for answer in interned:
+        attributes.set_committed_value(answer, "text", texts[answer.text_id])
+
+
+def get_questions_by_sections(db: Session, section_ids: Iterable[int]) -> Dict[int, List[models.Question]]:
+    """Вопросы нескольких секций одним запросом (+ не больше одного запроса на ответы)"""
+    section_ids = list(section_ids)
+    if not section_ids:
+        return {}
+    # Время span без дочерних SQL-запросов - построение ORM-объектов
+    with tracer.span("crud.get_questions_by_sections", sections=len(section_ids)) as span:
+        questions = (
+            db.query(models.Question)
+            .filter(models.Question.section_id.in_(section_ids))
+            .order_by(models.Question.section_id, models.Question.id)
+            .all()
+        )
+        load_answers(db, questions)
+        if span is not None:
+            span.attributes["questions"] = len(questions)
+    grouped = defaultdict(list)
+    for question in questions:
+        grouped[question.section_id].append(question)
+    return grouped
+
+
+# Новые id ответов JSONB-вопроса: из последовательности answers.id, чтобы не пересекаться с ее строками
+ALLOCATE_ANSWER_IDS_SQL = "ARRAY(SELECT nextval(pg_get_serial_sequence('answers', 'id')) FROM generate_series(1, {count}))"
+
+
+def build_question(question_text: str, section_id: int, answers: List[str], correct: int, storage: str,
+                   text_ids: Optional[Dict[str, int]] = None) -> models.Question:
+    """Вопрос с ответами в выбранном режиме хранения (ANSWER_STORAGE)
+
+    Для interned нужны text_ids - id текстов ответов из answer_texts.intern.
+    """
+    if storage == "jsonb":
+        return models.Question(
+            text=question_text, section_id=section_id, answers_data=list(answers), correct_index=correct,
+            answer_ids=text(ALLOCATE_ANSWER_IDS_SQL.format(count=len(answers))),
+        )
+    question = models.Question(text=question_text, section_id=section_id)
+    if storage == "interned":
+        question.answers = [
+            models.Answer(text_id=text_ids[answer], is_correct=(i == correct)) for i, answer in enumerate(answers)
+        ]
+        return question
+    question.answers = [
+        models.Answer(text=answer, is_correct=(i == correct)) for i, answer in enumerate(answers)
+    ]
+    return question
+
+
+# Перенос ответов в JSONB одним UPDATE; порядок и правильный ответ берутся по answers.id,
+# id ответов сохраняются в answer_ids
+DENORMALIZE_ANSWERS_SQL = """
+WITH moved AS (
+    SELECT a.question_id,
+           jsonb_agg(coalesce(a.text, t.text) ORDER BY a.id) AS texts,
+           array_agg(a.id ORDER BY a.id) AS ids,
+           array_position(array_agg(a.is_correct ORDER BY a.id), true) - 1 AS correct_index
+    FROM answers a
+    JOIN questions q ON q.id = a.question_id
+    LEFT JOIN answer_texts t ON t.id = a.text_id
+    WHERE q.answers_data IS NULL AND q.section_id = ANY(:section_ids)
+    GROUP BY a.question_id
+)
+UPDATE questions q
+SET answers_data = moved.texts, correct_index = moved.correct_index, answer_ids = moved.ids
+FROM moved
+WHERE q.id = moved.question_id
+RETURNING q.id
+"""
+
+
+def denormalize_answers(db: Session, section_ids: Iterable[int]) -> int:
+    """Перевести вопросы секций на JSONB-хранение ответов; вернуть число вопросов
+
+    Если правильных ответов несколько, сохраняется первый. Коммит - за вызывающим.
+    """
+    section_ids = list(section_ids)
+    if not section_ids:
+        return 0
+    question_ids = [
+        row[0] for row in db.execute(text(DENORMALIZE_ANSWERS_SQL), {"section_ids": section_ids})
+    ]
+    if question_ids:
+        db.execute(text("DELETE FROM answers WHERE question_id = ANY(:ids)"), {"ids": question_ids})
+    return len(question_ids)
+
+
+# Перевод строк answers на общие тексты: недостающие тексты создаются одним INSERT
+INTERN_SECTION_TEXTS_SQL = """
+INSERT INTO answer_texts (text)
+SELECT DISTINCT a.text
+FROM answers a
+JOIN questions q ON q.id = a.question_id
+WHERE a.text IS NOT NULL AND q.section_id = ANY(:section_ids)
+ORDER BY 1
+ON CONFLICT (text) DO NOTHING
+"""
+
+LINK_SECTION_TEXTS_SQL = """
+UPDATE answers a
+SET text_id = t.id, text = NULL
+FROM questions q, answer_texts t
+WHERE q.id = a.question_id AND q.section_id = ANY(:section_ids)
+  AND a.text IS NOT NULL AND t.text = a.text
+"""
+
+
+def intern_answers(db: Session, section_ids: Iterable[int]) -> int:
+    """Перевести ответы секций из answers.text на answer_texts; вернуть число ответов
+
+    JSONB-вопросы не затрагиваются. Коммит - за вызывающим.
+    """
+    section_ids = list(section_ids)
+    if not section_ids:
+        return 0
+    db.execute(text(INTERN_SECTION_TEXTS_SQL), {"section_ids": section_ids})
+    return db.execute(text(LINK_SECTION_TEXTS_SQL), {"section_ids": section_ids}).rowcount
+
+
+# Правильность выбранных ответов по БД: строка answers или позиция в answer_ids JSONB-вопроса.
+# Вопросы, впервые отвеченные верно, отмечаются в leaderboard_answers; points - число новых отметок
+GRADE_ANSWERS_SQL = """
+WITH chosen AS (
+    SELECT x.question_id, x.answer_id,
+           coalesce(a.is_correct, q.answer_ids[q.correct_index + 1] = x.answer_id) AS correct
+    FROM jsonb_to_recordset(CAST(:items AS jsonb)) AS x(question_id integer, answer_id integer)
+    JOIN questions q ON q.id = x.question_id AND q.section_id = :section_id
+    LEFT JOIN answers a ON a.id = x.answer_id AND a.question_id = x.question_id
+    WHERE a.id IS NOT NULL OR x.answer_id = ANY(q.answer_ids)
+), scored AS (
+    INSERT INTO leaderboard_answers (section_id, learner_id, question_id)
+    SELECT DISTINCT :section_id, :learner_id, question_id FROM chosen WHERE correct
+    ON CONFLICT DO NOTHING
+    RETURNING question_id
+)
+SELECT question_id, answer_id, correct, (SELECT count(*) FROM scored) AS points FROM chosen
+"""
+
+
+def grade_answers(db: Session, learner_id: str, section_id: int,
+                  answers: List[Tuple[int, int]]) -> Tuple[Dict[Tuple[int, int], bool], int]:
+    """Проверить ответы ученика [(question_id, answer_id)]; вернуть их правильность и новые очки
+
+    Ответа, которого нет у вопроса секции, в результате нет. Очко дается за вопрос
+    один раз на ученика. Коммит - за вызывающим.
+    """
+    if not answers:
+        return {}, 0
+    items = json.dumps([{"question_id": question_id, "answer_id": answer_id} for question_id, answer_id in answers])
+    rows = db.execute(
+        text(GRADE_ANSWERS_SQL), {"items": items, "section_id": section_id, "learner_id": learner_id}
+    ).all()
+    graded = {(row.question_id, row.answer_id): row.correct for row in rows}
+    return graded, rows[0].points if rows else 0
@@ -1,14 +1,175 @@
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, Optional, Sequence
+
+from fastapi import Request
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
 from sqlalchemy.orm import sessionmaker, declarative_base
 from .core.config import settings
+from .tracing import TracedQueuePool
 
-engine = create_engine(settings.DATABASE_URL)
+# Пул со span на выдачу соединения; span SQL-запросов вешаются на все Engine в app/tracing.py
+engine = create_engine(settings.DATABASE_URL, poolclass=TracedQueuePool)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Cookie, по которой клиент после записи читает с primary
+PRIMARY_STICKY_COOKIE = "db_read_primary"
+
+logger = logging.getLogger(__name__)
+
+# Отставание реплики, с: 0 у сервера не в recovery и у реплики, применившей все полученное WAL
+# (при простое primary время последней транзакции стареет, но реплика не отстает)
+REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+class ReplicaRouter:
+    """Round-robin по репликам с временным исключением недоступных и отстающих
+
+    Фоновый поток (start) раз в check_interval проверяет реплики: недоступная
+    или отставшая больше max_lag секунд исключается до следующей удачной проверки.
+    """
+
+    def __init__(self, engines: Sequence[Engine], retry_after: float,
+                 max_lag: Optional[float] = None, check_interval: float = 0.0):
+        self.engines = list(engines)
+        self.retry_after = retry_after
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag: Dict[Engine, float] = {}
+        self.checks = 0
+        self._counter = itertools.count()
+        self._down_until = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def choose(self) -> Optional[Engine]:
+        """Следующая доступная реплика или None, если читать нужно с primary"""
+        if not self.engines:
+            return None
+        now = time.monotonic()
+        for _ in range(len(self.engines)):
+            replica = self.engines[next(self._counter) % len(self.engines)]
+            # После retry_after реплика снова получает запросы (повторная проверка)
+            if self._down_until.get(replica, 0.0) <= now:
+                return replica
+        return None
+
+    def mark_down(self, replica: Engine):
+        with self._lock:
+            self._down_until[replica] = time.monotonic() + self.retry_after
+
+    def mark_up(self, replica: Engine):
+        with self._lock:
+            self._down_until.pop(replica, None)
+
+    def check_health(self):
+        """Активная проверка всех реплик: доступность и отставание от primary"""
+        for replica in self.engines:
+            try:
+                with replica.connect() as connection:
+                    lag = float(connection.exec_driver_sql(REPLICA_LAG_SQL).scalar() or 0.0)
+            except SQLAlchemyError as exc:
+                self.lag.pop(replica, None)
+                if not self.is_down(replica):
+                    logger.warning("Реплика %s недоступна: %s", replica.url.host, exc)
+                self.mark_down(replica)
+                continue
+            self.lag[replica] = lag
+            if self.max_lag is not None and lag > self.max_lag:
+                if not self.is_down(replica):
+                    logger.warning("Реплика %s отстает на %.1f с, чтение идет с других серверов", replica.url.host, lag)
+                self.mark_down(replica)
+            else:
+                self.mark_up(replica)
+        self.checks += 1
+
+    def is_down(self, replica: Engine) -> bool:
+        return self._down_until.get(replica, 0.0) > time.monotonic()
+
+    def start(self):
+        """Запустить периодическую проверку реплик (если они есть)"""
+        if not self.engines or self.check_interval <= 0:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-health", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.check_health()
+            except Exception:
+                logger.exception("Проверка реплик не удалась, повтор через %.1f с", self.check_interval)
+
+    def stats(self):
+        return {
+            "replicas": len(self.engines),
+            "down": sum(1 for replica in self.engines if self.is_down(replica)),
+            "max_lag_seconds": round(max(self.lag.values()), 3) if self.lag else None,
+            "checks": self.checks,
+        }
+
+
+replica_router = ReplicaRouter(
+    [create_engine(url, pool_pre_ping=True, poolclass=TracedQueuePool) for url in settings.DATABASE_REPLICA_URLS],
+    retry_after=settings.DB_REPLICA_RETRY_SECONDS,
+    max_lag=settings.DB_REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.DB_REPLICA_CHECK_INTERVAL,
+)
+
+
+def dispose_engines(close: bool = True):
+    """Сбросить пулы соединений primary и реплик (например, после fork)"""
+    for db_engine in [engine, *replica_router.engines]:
+        db_engine.dispose(close=close)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_read_db(request: Request):
+    """Сессия для чтения: реплика, если клиент недавно не писал и реплика доступна"""
+    db = None
+    if PRIMARY_STICKY_COOKIE not in request.cookies:
+        replica = replica_router.choose()
+        if replica is not None:
+            db = SessionLocal(bind=replica)
+            # Ответы, прочитанные с реплики, кэш секций принимает не сразу после записи
+            db.info["replica"] = True
+            try:
+                db.connection()
+            except OperationalError:
+                db.close()
+                db = None
+                replica_router.mark_down(replica)
+    if db is None:
+        db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,283 @@
+"""
+Уведомления об изменении секций: Postgres NOTIFY -> поток LISTEN в каждом воркере -> SSE
+
+Запись (create_tests, импорт) вызывает notify_sections_changed() в своей
+транзакции: уведомление уходит только после COMMIT и только если он удался.
+Каждый воркер держит одно соединение LISTEN; полученное событие сбрасывает
+локальный кэш секций и рассылается подписчикам /events/ этого воркера.
+Событие компактное - только измененные секции, удаленные помечены "deleted":
+    event: sections
+    data: {"sections": [{"id": 1, "name": "Math", "question_count": 12}, {"id": 2, "deleted": true}]}
+Если события могли потеряться (переподключение к БД, переполненная очередь
+подписчика), приходит event: reset - клиент перечитывает список целиком.
+"""
+import asyncio
+import json
+import logging
+import select
+import socket
+import threading
+from typing import AsyncIterator, Callable, Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "section_changed"
+
+# Полезная нагрузка NOTIFY ограничена 8000 байт, большие изменения делятся на несколько
+MAX_PAYLOAD_BYTES = 7900
+
+RESET_FRAME = b"event: reset\ndata: {}\n\n"
+KEEPALIVE_FRAME = b": keepalive\n\n"
+
+
+def section_event_payloads(sections: Iterable[dict]) -> List[str]:
+    """JSON-нагрузки {"sections": [...]} не длиннее MAX_PAYLOAD_BYTES"""
+    payloads, chunk, size = [], [], 0
+    for section in sections:
+        item = json.dumps(section, ensure_ascii=False, separators=(",", ":"))
+        if len(item.encode()) > MAX_PAYLOAD_BYTES - 32:
+            # Очень длинное имя: отправляем только id, клиент перечитает секцию сам
+            item = json.dumps({"id": section["id"]})
+        if chunk and size + len(item.encode()) + 1 > MAX_PAYLOAD_BYTES - 16:
+            payloads.append('{"sections":[%s]}' % ",".join(chunk))
+            chunk, size = [], 0
+        chunk.append(item)
+        size += len(item.encode()) + 1
+    if chunk:
+        payloads.append('{"sections":[%s]}' % ",".join(chunk))
+    return payloads
+
+
+def notify_sections_changed(db: Session, section_ids: Iterable[int]):
+    """Поставить уведомление в текущую транзакцию db (отправится при commit)
+
+    Счетчики читаются в той же транзакции, поэтому уже учитывают запись;
+    секции, которых в ней уже нет, уходят как удаленные.
+    """
+    section_ids = sorted(set(section_ids))
+    if not section_ids:
+        return
+    rows = db.query(models.Section.id, models.Section.name, models.Section.question_count).filter(
+        models.Section.id.in_(section_ids)
+    )
+    existing = {id_: {"id": id_, "name": name, "question_count": count} for id_, name, count in rows}
+    sections = [existing.get(section_id, {"id": section_id, "deleted": True}) for section_id in section_ids]
+    for payload in section_event_payloads(sections):
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+
+
+def sse_frame(event: str, data: str) -> bytes:
+    return f"event: {event}\ndata: {data}\n\n".encode()
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    """Очередь готовых SSE-кадров одного клиента в event loop его запроса"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue_size: int):
+        self.loop = loop
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(queue_size)
+        self.resets = 0
+
+    def deliver(self, frame: bytes):
+        # Вызывается в event loop подписчика (call_soon_threadsafe)
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Клиент не успевает читать: вместо потерянных событий - один reset
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET_FRAME)
+            self.resets += 1
+
+
+class EventBroadcaster:
+    """Поток LISTEN и рассылка событий подписчикам текущего процесса"""
+
+    def __init__(self, engine, channel: str = CHANNEL, max_subscribers: int = 1000,
+                 queue_size: int = 64, on_change: Optional[Callable[[List[int]], None]] = None,
+                 on_reset: Optional[Callable[[], None]] = None, health_interval: float = 60.0,
+                 on_delete: Optional[Callable[[List[int]], None]] = None):
+        self.engine = engine
+        self.channel = channel
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.on_change = on_change
+        self.on_reset = on_reset
+        self.on_delete = on_delete
+        self.health_interval = health_interval
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._listening = threading.Event()
+        self._wake_r = self._wake_w = None
+        # Дополнительные каналы того же соединения LISTEN: канал -> обработчик нагрузки
+        self._handlers = {}
+        self.received = 0
+        self.reconnects = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscription:
+        """Вызывается из event loop запроса"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers(f"Too many event subscribers, max {self.max_subscribers}")
+            subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, frame: bytes):
+        """Разослать кадр всем подписчикам; безопасно вызывать из любого потока"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, frame)
+            except RuntimeError:
+                # Цикл уже закрыт (остановка процесса)
+                self.unsubscribe(subscription)
+
+    def dispatch(self, payload: str):
+        """Обработать полезную нагрузку NOTIFY: кэш и подписчики"""
+        self.received += 1
+        try:
+            sections = json.loads(payload).get("sections", [])
+            section_ids = [section["id"] for section in sections]
+            deleted = [section["id"] for section in sections if section.get("deleted")]
+        except (ValueError, AttributeError, KeyError, TypeError):
+            logger.warning("Некорректное уведомление %s: %r", self.channel, payload[:200])
+            return
+        if self.on_change is not None:
+            self.on_change(section_ids)
+        if deleted and self.on_delete is not None:
+            self.on_delete(deleted)
+        self.publish(sse_frame("sections", payload))
+
+    def listen(self, channel: str, handler: Callable[[str], None]):
+        """Подписать обработчик на еще один канал NOTIFY (до start())"""
+        self._handlers[channel] = handler
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._thread = threading.Thread(target=self._run, name="events-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake_w.send(b"\0")
+        self._thread.join(timeout)
+        self._thread = None
+        self._listening.clear()
+        self._wake_r.close()
+        self._wake_w.close()
+
+    def wait_listening(self, timeout: float) -> bool:
+        return self._listening.wait(timeout)
+
+    def _connect(self):
+        # Отдельное соединение вне пула: LISTEN держит его все время жизни воркера
+        connection = self.engine.raw_connection()
+        driver_connection = connection.driver_connection
+        connection.detach()
+        driver_connection.autocommit = True
+        with driver_connection.cursor() as cursor:
+            for channel in (self.channel, *self._handlers):
+                cursor.execute(f"LISTEN {channel}")
+        return driver_connection
+
+    def _run(self):
+        delay = 1.0
+        connected_before = False
+        while not self._stop.is_set():
+            try:
+                driver_connection = self._connect()
+            except Exception as exc:
+                logger.warning("LISTEN %s: нет соединения с БД (%s), повтор через %.0f с", self.channel, exc, delay)
+                self._stop.wait(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            if connected_before:
+                # Пока соединения не было, уведомления могли потеряться
+                self.reconnects += 1
+                if self.on_reset is not None:
+                    self.on_reset()
+                self.publish(RESET_FRAME)
+            connected_before = True
+            delay = 1.0
+            self._listening.set()
+            try:
+                self._pump(driver_connection)
+            except Exception as exc:
+                logger.warning("LISTEN %s: соединение потеряно (%s)", self.channel, exc)
+            finally:
+                self._listening.clear()
+                try:
+                    driver_connection.close()
+                except Exception:
+                    pass
+
+    def _pump(self, driver_connection):
+        while not self._stop.is_set():
+            ready, _, _ = select.select([driver_connection, self._wake_r], [], [], self.health_interval)
+            if self._wake_r in ready:
+                return
+            if not ready:
+                # Тишина: проверяем, что соединение живо
+                with driver_connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            driver_connection.poll()
+            while driver_connection.notifies:
+                notify = driver_connection.notifies.pop(0)
+                handler = self._handlers.get(notify.channel, self.dispatch)
+                try:
+                    handler(notify.payload)
+                except Exception:
+                    logger.exception("Ошибка обработки уведомления %s", notify.channel)
+
+    def stats(self):
+        return {
+            "listening": self._listening.is_set(),
+            "subscribers": self.subscribers,
+            "received": self.received,
+            "reconnects": self.reconnects,
+        }
+
+
+async def event_stream(broadcaster: EventBroadcaster, subscription: Subscription,
+                       keepalive: float) -> AsyncIterator[bytes]:
+    """Тело ответа text/event-stream; отписка при отключении клиента"""
+    try:
+        # Через сколько мс EventSource переподключается после обрыва
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                yield await asyncio.wait_for(subscription.queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield KEEPALIVE_FRAME
+    finally:
+        broadcaster.unsubscribe(subscription)
@@ -0,0 +1,81 @@
+"""
+Представления списка вопросов: обычный JSON, колоночный JSON и MessagePack
+"""
+from typing import List, Optional
+
+from pydantic import TypeAdapter
+
+from . import schemas
+from .tracing import tracer
+
+try:
+    import msgpack
+except ImportError:
+    # Зависимость проекта; окружение без нее отдает json и columnar
+    msgpack = None
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "columnar": "application/vnd.easytest.columnar+json",
+    "msgpack": "application/x-msgpack",
+}
+
+# Дополнительные media type из Accept, которые соответствуют форматам
+ACCEPT_ALIASES = {
+    "application/msgpack": "msgpack",
+    "application/vnd.msgpack": "msgpack",
+}
+
+questions_adapter = TypeAdapter(List[schemas.Question])
+
+
+def available_formats() -> List[str]:
+    return [fmt for fmt in MEDIA_TYPES if fmt != "msgpack" or msgpack is not None]
+
+
+def negotiate_format(format_param: Optional[str], accept: str) -> str:
+    """Выбрать формат: параметр format= важнее заголовка Accept"""
+    if format_param:
+        if format_param not in available_formats():
+            raise ValueError(
+                f"Unsupported format: {format_param}. Available: {', '.join(available_formats())}"
+            )
+        return format_param
+    for item in accept.split(","):
+        media_type = item.split(";")[0].strip().lower()
+        fmt = ACCEPT_ALIASES.get(media_type) or next(
+            (name for name, value in MEDIA_TYPES.items() if value == media_type), None
+        )
+        if fmt in available_formats():
+            return fmt
+    return "json"
+
+
+def to_columnar(questions: List[schemas.Question]) -> schemas.QuestionColumns:
+    """Параллельные массивы вместо списка объектов: ключи не повторяются на каждый ответ"""
+    columns = schemas.QuestionColumns(
+        question_ids=[], question_texts=[], answer_offsets=[0],
+        answer_ids=[], answer_texts=[], correct=[],
+    )
+    for question in questions:
+        columns.question_ids.append(question.id)
+        columns.question_texts.append(question.text)
+        for answer in question.answers:
+            if answer.is_correct:
+                columns.correct.append(len(columns.answer_ids))
+            columns.answer_ids.append(answer.id)
+            columns.answer_texts.append(answer.text)
+        columns.answer_offsets.append(len(columns.answer_ids))
+    return columns
+
+
+def render_questions(questions, fmt: str = "json") -> bytes:
+    """Сериализовать ORM-объекты вопросов в выбранный формат"""
+    with tracer.span("serialize", format=fmt, questions=len(questions)):
+        validated = questions_adapter.validate_python(questions, from_attributes=True)
+        if fmt == "json":
+            return questions_adapter.dump_json(validated)
+        columns = to_columnar(validated)
+        if fmt == "msgpack":
+            return msgpack.packb(columns.model_dump(), use_bin_type=True)
+        return columns.model_dump_json().encode()
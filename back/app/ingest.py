@@ -0,0 +1,301 @@
+"""
+Массовый импорт тестов: COPY FROM STDIN во временную таблицу и слияние set-based SQL
+
+Запуск из каталога back:
+    python -m app.ingest tests.ndjson
+    cat tests.json | python -m app.ingest - --format json
+"""
+import argparse
+import gc
+import itertools
+import json
+import sys
+import time
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from . import schemas
+from .cache import section_cache
+from .core.config import settings
+from .database import SessionLocal
+from .events import notify_sections_changed
+from .publish import publish_after_write
+
+FORMATS = ("json", "ndjson")
+
+STAGING_DDL = """
+CREATE TEMP TABLE import_staging (
+    ord bigint NOT NULL,
+    section text NOT NULL,
+    question text NOT NULL,
+    answers jsonb NOT NULL,
+    correct integer NOT NULL
+) ON COMMIT DROP
+"""
+
+COPY_SQL = "COPY import_staging (ord, section, question, answers, correct) FROM STDIN"
+
+MERGE_SECTIONS_SQL = """
+INSERT INTO sections (name)
+SELECT DISTINCT section FROM import_staging
+ON CONFLICT (name) DO NOTHING
+"""
+
+# id вопросов выдаются заранее из последовательности, чтобы привязать ответы без RETURNING
+ALLOCATE_QUESTIONS_SQL = """
+CREATE TEMP TABLE import_questions ON COMMIT DROP AS
+SELECT nextval(pg_get_serial_sequence('questions', 'id')) AS id, staged.*
+FROM (
+    SELECT st.ord, st.question, st.answers, st.correct, s.id AS section_id
+    FROM import_staging st
+    JOIN sections s ON s.name = st.section
+    ORDER BY st.ord
+) staged
+"""
+
+INSERT_QUESTIONS_SQL = {
+    "normalized": """
+        INSERT INTO questions (id, text, section_id)
+        SELECT id, question, section_id FROM import_questions ORDER BY id
+    """,
+    "jsonb": """
+        INSERT INTO questions (id, text, section_id, answers_data, correct_index, answer_ids)
+        SELECT id, question, section_id, answers, correct,
+               ARRAY(SELECT nextval(pg_get_serial_sequence('answers', 'id')) FROM jsonb_array_elements(answers))
+        FROM import_questions ORDER BY id
+    """,
+}
+INSERT_QUESTIONS_SQL["interned"] = INSERT_QUESTIONS_SQL["normalized"]
+
+# Режим замены: прежние вопросы секций пакета, еще не замененных этим импортом
+# (ответы, состояние повторений - каскадом)
+DELETE_REPLACED_SQL = """
+DELETE FROM questions
+WHERE section_id IN (SELECT DISTINCT section_id FROM import_questions)
+  AND section_id <> ALL(:replaced)
+"""
+
+INSERT_ANSWERS_SQL = {
+    "normalized": """
+        INSERT INTO answers (text, is_correct, question_id)
+        SELECT e.text, e.ord - 1 = q.correct, q.id
+        FROM import_questions q,
+             jsonb_array_elements_text(q.answers) WITH ORDINALITY AS e(text, ord)
+        ORDER BY q.id, e.ord
+    """,
+    "interned": """
+        INSERT INTO answers (text_id, is_correct, question_id)
+        SELECT t.id, e.ord - 1 = q.correct, q.id
+        FROM import_questions q
+        CROSS JOIN LATERAL jsonb_array_elements_text(q.answers) WITH ORDINALITY AS e(text, ord)
+        JOIN answer_texts t ON t.text = e.text
+        ORDER BY q.id, e.ord
+    """,
+}
+
+# Интернирование всей пачки: каждый новый текст ответа - одна строка answer_texts
+INTERN_TEXTS_SQL = """
+INSERT INTO answer_texts (text)
+SELECT DISTINCT e.text
+FROM import_questions q, jsonb_array_elements_text(q.answers) AS e(text)
+ORDER BY 1
+ON CONFLICT (text) DO NOTHING
+"""
+
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+class InvalidPayloads(ValueError):
+    """Тесты не прошли проверку; errors - все ошибки с номером теста (index)"""
+
+    def __init__(self, errors: List[dict]):
+        self.errors = errors
+        first = errors[0]
+        where = f" at position {first['index']}" if first["index"] is not None else ""
+        field = ".".join(str(part) for part in first["loc"])
+        super().__init__(
+            f"Invalid test{where}: {field + ': ' if field else ''}{first['msg']}"
+            + (f" (and {len(errors) - 1} more errors)" if len(errors) > 1 else "")
+        )
+
+
+def _check_format(fmt: str):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported import format: {fmt}. Available: {', '.join(FORMATS)}")
+
+
+def _ndjson_lines(stream: IO) -> Iterator[Tuple[int, str]]:
+    return ((i, line) for i, line in enumerate(stream) if line.strip())
+
+
+def read_payloads(stream: IO, fmt: str) -> Iterator[schemas.TestPayload]:
+    """Разобрать JSON-массив или NDJSON (по объекту на строку) в TestPayload
+
+    JSON-массив проверяется целиком до первого теста; NDJSON - построчно, по мере чтения.
+    """
+    _check_format(fmt)
+    if fmt == "json":
+        body = stream.read()
+        # Сотни тысяч новых объектов запускают сборщик мусора снова и снова (в 2 раза медленнее)
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            tests = schemas.TEST_PAYLOADS.validate_json(body)
+        except ValidationError as exc:
+            raise InvalidPayloads(schemas.payload_errors(exc)) from exc
+        finally:
+            if gc_enabled:
+                gc.enable()
+        yield from tests
+        return
+    for i, line in _ndjson_lines(stream):
+        try:
+            yield schemas.TEST_PAYLOAD.validate_json(line)
+        except ValidationError as exc:
+            raise InvalidPayloads(schemas.payload_errors(exc, i)) from exc
+
+
+def validate_payloads(stream: IO, fmt: str) -> Iterable[schemas.TestPayload]:
+    """Проверить все тесты до начала записи в БД; InvalidPayloads содержит все ошибки
+
+    JSON-массив разбирается и проверяется одним вызовом TypeAdapter. NDJSON не держится
+    в памяти: первый проход только проверяет строки, тесты для импорта читаются вторым
+    проходом с начала потока (поток должен поддерживать seek).
+    """
+    _check_format(fmt)
+    if fmt == "json":
+        return list(read_payloads(stream, fmt))
+    errors = []
+    for i, line in _ndjson_lines(stream):
+        try:
+            schemas.TEST_PAYLOAD.validate_json(line)
+        except ValidationError as exc:
+            errors.extend(schemas.payload_errors(exc, i))
+    if errors:
+        raise InvalidPayloads(errors)
+    stream.seek(0)
+    return read_payloads(stream, fmt)
+
+
+class CopySource:
+    """Файлоподобный поток строк COPY (текстовый формат), без сборки всего буфера в памяти"""
+
+    def __init__(self, rows: Iterable[bytes]):
+        self._rows = iter(rows)
+        self._buffer = b""
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._buffer += row
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def copy_row(ord_: int, test: schemas.TestPayload) -> bytes:
+    answers = json.dumps(test.answers, ensure_ascii=False)
+    fields = (str(ord_), test.section, test.question, answers, str(test.correct))
+    return ("\t".join(field.translate(COPY_ESCAPES) for field in fields) + "\n").encode()
+
+
+def ingest_batch(db: Session, tests: List[schemas.TestPayload], storage: str,
+                 replaced: Optional[Set[int]] = None,
+                 on_change: Optional[Callable[[Set[int]], None]] = None) -> Tuple[Dict[str, int], Set[int]]:
+    """Одна пачка - одна транзакция: COPY в staging, затем слияние в основные таблицы
+
+    replaced - режим замены: id секций, уже замененных предыдущими пачками импорта;
+    у остальных секций пачки прежние вопросы удаляются, множество пополняется.
+    on_change - сброс кэшей процесса после commit (в API - main.sections_changed);
+    по умолчанию только кэш секций. Возвращает счетчики строк и id затронутых секций.
+    """
+    db.execute(text(STAGING_DDL))
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(COPY_SQL, CopySource(copy_row(i, test) for i, test in enumerate(tests)))
+    finally:
+        cursor.close()
+    db.execute(text(MERGE_SECTIONS_SQL))
+    db.execute(text(ALLOCATE_QUESTIONS_SQL))
+    deleted = 0
+    if replaced is not None:
+        deleted = db.execute(text(DELETE_REPLACED_SQL), {"replaced": list(replaced)}).rowcount
+    questions = db.execute(text(INSERT_QUESTIONS_SQL[storage])).rowcount
+    if storage == "interned":
+        db.execute(text(INTERN_TEXTS_SQL))
+    answers = db.execute(text(INSERT_ANSWERS_SQL[storage])).rowcount if storage in INSERT_ANSWERS_SQL else 0
+    section_ids = {row[0] for row in db.execute(text("SELECT DISTINCT section_id FROM import_questions"))}
+    notify_sections_changed(db, section_ids)
+    db.commit()
+    if on_change is None:
+        on_change = section_cache.invalidate
+    on_change(section_ids)
+    if replaced is not None:
+        replaced |= section_ids
+    counts = {"questions": questions, "answers": answers, "sections": len(section_ids), "deleted": deleted}
+    return counts, section_ids
+
+
+def ingest(db: Session, tests: Iterable[schemas.TestPayload], storage: str = None,
+           batch_size: int = 100_000, replace: bool = False,
+           on_change: Optional[Callable[[Set[int]], None]] = None) -> schemas.ImportResult:
+    """Импортировать тесты пачками по batch_size; уже завершенные пачки остаются в БД при ошибке
+
+    replace=True заменяет содержимое секций из импорта: их прежние вопросы удаляются
+    в той же транзакции, что и первая пачка с этой секцией. on_change - как в ingest_batch.
+    """
+    storage = storage or settings.ANSWER_STORAGE
+    started = time.perf_counter()
+    totals = {"questions": 0, "answers": 0, "sections": 0, "deleted": 0}
+    section_ids = set()
+    replaced = set() if replace else None
+    tests = iter(tests)
+    while True:
+        batch = list(itertools.islice(tests, batch_size))
+        if not batch:
+            break
+        counts, batch_sections = ingest_batch(db, batch, storage, replaced, on_change)
+        for key, value in counts.items():
+            totals[key] += value
+        section_ids |= batch_sections
+    publish_after_write(section_ids)
+    return schemas.ImportResult(**totals, seconds=round(time.perf_counter() - started, 3))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Массовый импорт тестов (TestPayload) через COPY")
+    parser.add_argument("path", help="файл с тестами или - для stdin")
+    parser.add_argument("--format", choices=FORMATS,
+                        help="по умолчанию ndjson для .ndjson/.jsonl, иначе json")
+    parser.add_argument("--batch-size", type=int, default=settings.IMPORT_BATCH_SIZE)
+    parser.add_argument("--storage", choices=("normalized", "jsonb", "interned"), help="по умолчанию ANSWER_STORAGE")
+    parser.add_argument("--replace", action="store_true",
+                        help="заменить содержимое секций из импорта, а не дописать к нему")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "json")
+    stream = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8")
+    db = SessionLocal()
+    try:
+        # Файл проверяется целиком до записи; stdin перечитать нельзя - проверка по ходу импорта
+        tests = read_payloads(stream, fmt) if stream is sys.stdin else validate_payloads(stream, fmt)
+        result = ingest(db, tests, args.storage, args.batch_size, args.replace)
+    finally:
+        db.close()
+        if stream is not sys.stdin:
+            stream.close()
+    rate = result.questions / result.seconds if result.seconds else 0
+    print(f"Импортировано вопросов: {result.questions}, ответов: {result.answers}, "
+          f"секций: {result.sections} за {result.seconds} с ({rate:.0f} вопросов/с)")
+    if args.replace:
+        print(f"Удалено прежних вопросов: {result.deleted}")
+
+
+if __name__ == "__main__":
+    main()
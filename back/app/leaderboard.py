@@ -0,0 +1,428 @@
+"""
+Таблицы лидеров секций: ранг и топ без ORDER BY по БД на каждый запрос
+
+Очки ученика в секции - число вопросов, на которые он верно ответил в
+/sections/{id}/review/ (проверка по БД и учет в leaderboard_answers - crud.grade_answers).
+Для каждой секции в памяти воркера живет индексируемый skip list по ключу
+(-очки, время достижения, ученик): обновление, ранг и срез топа - O(log n).
+При старте списки строятся из снимка leaderboard_scores за O(n) (строки уже
+отсортированы) в фоновом потоке; пока БД недоступна, загрузка повторяется, рейтинги
+пусты, а /ready отвечает 503. Приросты очков копятся и раз в LEADERBOARD_SNAPSHOT_INTERVAL
+прибавляются к снимку одним upsert; итоговые очки уходят другим воркерам
+через NOTIFY leaderboard_changed.
+"""
+import gc
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "leaderboard_changed"
+# Очков в одном NOTIFY: id ученика не длиннее 64 символов, нагрузка < 8000 байт
+NOTIFY_SCORES = 80
+SNAPSHOT_CHUNK = 1000
+
+MAX_LEVEL = 32
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, level: int):
+        self.key = key
+        self.next: List["_Node"] = [None] * level
+        # width[i] - на сколько позиций вперед ведет ссылка next[i]
+        self.width: List[int] = [1] * level
+
+
+class SkipList:
+    """Упорядоченное множество уникальных ключей с доступом по индексу"""
+
+    __slots__ = ("head", "nil", "size", "level", "_random")
+
+    def __init__(self, seed: Optional[int] = None):
+        self.nil = _Node(None, 0)
+        self.head = _Node(None, MAX_LEVEL)
+        self.head.next = [self.nil] * MAX_LEVEL
+        self.size = 0
+        # Уровни выше занятого не обходятся; ширины головы на них задаются при подъеме
+        self.level = 1
+        self._random = random.Random(seed)
+
+    @classmethod
+    def from_sorted(cls, keys: Iterable, seed: Optional[int] = None) -> "SkipList":
+        """Построение за O(n) из строго возрастающих ключей"""
+        skiplist = cls(seed)
+        last = [skiplist.head] * MAX_LEVEL
+        last_position = [0] * MAX_LEVEL
+        position = 0
+        # Миллионы новых узлов запускали бы сборщик мусора снова и снова (в 3 раза медленнее)
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for position, key in enumerate(keys, 1):
+                node = _Node(key, skiplist._level())
+                for level in range(len(node.next)):
+                    previous = last[level]
+                    previous.next[level] = node
+                    previous.width[level] = position - last_position[level]
+                    node.next[level] = skiplist.nil
+                    last[level] = node
+                    last_position[level] = position
+        finally:
+            if gc_enabled:
+                gc.enable()
+        for level in range(MAX_LEVEL):
+            last[level].width[level] = position + 1 - last_position[level]
+        skiplist.size = position
+        skiplist.level = max((len(node.next) for node in last if node is not skiplist.head), default=1)
+        return skiplist
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _level(self) -> int:
+        # Уровень k с вероятностью 2^-k
+        bits = self._random.getrandbits(MAX_LEVEL)
+        return min(MAX_LEVEL, (bits & -bits).bit_length()) if bits else MAX_LEVEL
+
+    def _predecessors(self, key) -> Tuple[List[_Node], List[int]]:
+        chain = [None] * MAX_LEVEL
+        steps = [0] * MAX_LEVEL
+        node, nil = self.head, self.nil
+        for level in reversed(range(self.level)):
+            while node.next[level] is not nil and node.next[level].key < key:
+                steps[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+        return chain, steps
+
+    def insert(self, key):
+        chain, steps_at_level = self._predecessors(key)
+        node = _Node(key, self._level())
+        for level in range(self.level, len(node.next)):
+            self.head.width[level] = self.size + 1
+            chain[level] = self.head
+        self.level = max(self.level, len(node.next))
+        steps = 0
+        for level in range(len(node.next)):
+            previous = chain[level]
+            node.next[level] = previous.next[level]
+            previous.next[level] = node
+            node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(len(node.next), self.level):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain, _ = self._predecessors(key)
+        node = chain[0].next[0]
+        if node is self.nil or node.key != key:
+            raise KeyError(key)
+        for level in range(len(node.next)):
+            previous = chain[level]
+            previous.width[level] += node.width[level] - 1
+            previous.next[level] = node.next[level]
+        for level in range(len(node.next), self.level):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def index(self, key) -> int:
+        """Позиция ключа (0 - наименьший); ключ должен быть в списке"""
+        node, nil = self.head, self.nil
+        position = 0
+        for level in reversed(range(self.level)):
+            while node.next[level] is not nil and node.next[level].key <= key:
+                position += node.width[level]
+                node = node.next[level]
+        if node is self.head or node.key != key:
+            raise KeyError(key)
+        return position - 1
+
+    def slice(self, start: int, count: int) -> list:
+        """До count ключей начиная с позиции start"""
+        if start < 0 or start >= self.size or count <= 0:
+            return []
+        node = self.head
+        remaining = start + 1
+        for level in reversed(range(self.level)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        keys = []
+        while node is not self.nil and len(keys) < count:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+def public_id(learner_id: str) -> str:
+    """Публичное имя ученика: X-Learner-Id - секрет клиента и наружу не отдается"""
+    return hashlib.blake2b(learner_id.encode(), digest_size=6).hexdigest()
+
+
+class Leaderboard:
+    """Рейтинг одной секции: больше очков - выше, при равенстве выше тот, кто набрал раньше"""
+
+    __slots__ = ("ranking", "entries")
+
+    def __init__(self, entries: Iterable[Tuple[str, int, float]] = ()):
+        # Строки должны идти в порядке рейтинга (как их отдает запрос load)
+        self.entries: Dict[str, Tuple[int, float]] = {}
+        keys = []
+        for learner_id, score, reached_at in entries:
+            self.entries[learner_id] = (score, reached_at)
+            keys.append((-score, reached_at, learner_id))
+        self.ranking = SkipList.from_sorted(keys)
+
+    def __len__(self) -> int:
+        return len(self.ranking)
+
+    def set(self, learner_id: str, score: int, reached_at: float):
+        current = self.entries.get(learner_id)
+        if current == (score, reached_at):
+            return
+        if current is not None:
+            self.ranking.remove((-current[0], current[1], learner_id))
+        self.entries[learner_id] = (score, reached_at)
+        self.ranking.insert((-score, reached_at, learner_id))
+
+    def rank(self, learner_id: str) -> Optional[Tuple[int, int]]:
+        """(место с 1, очки) или None, если ученик еще не набирал очков"""
+        current = self.entries.get(learner_id)
+        if current is None:
+            return None
+        return self.ranking.index((-current[0], current[1], learner_id)) + 1, current[0]
+
+    def top(self, offset: int, limit: int) -> List[Tuple[int, str, int]]:
+        """[(место, ученик, очки)] с позиции offset"""
+        return [
+            (offset + position + 1, learner_id, -score)
+            for position, (score, _, learner_id) in enumerate(self.ranking.slice(offset, limit))
+        ]
+
+
+class Leaderboards:
+    """Рейтинги секций воркера, буфер приростов и периодический снимок в БД"""
+
+    def __init__(self, session_factory, snapshot_interval: float = 5.0,
+                 load_backoff: float = 1.0, max_load_backoff: float = 30.0):
+        self.session_factory = session_factory
+        self.snapshot_interval = snapshot_interval
+        self.load_backoff = load_backoff
+        self.max_load_backoff = max_load_backoff
+        self._boards: Dict[int, Leaderboard] = {}
+        # (секция, ученик) -> [прирост очков, время последнего прироста]
+        self._pending: Dict[Tuple[int, str], List] = {}
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reload = threading.Event()
+        self._thread = None
+        # Установлен после первой загрузки снимка
+        self.loaded = threading.Event()
+        self.loaded_at = None
+        self.error = None
+        self.snapshots = 0
+
+    def _board(self, section_id: int) -> Leaderboard:
+        board = self._boards.get(section_id)
+        if board is None:
+            board = self._boards[section_id] = Leaderboard()
+        return board
+
+    def add(self, learner_id: str, section_id: int, points: int, now: Optional[float] = None):
+        if points <= 0:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            board = self._board(section_id)
+            score = board.entries.get(learner_id, (0, now))[0] + points
+            board.set(learner_id, score, now)
+            pending = self._pending.setdefault((section_id, learner_id), [0, now])
+            pending[0] += points
+            pending[1] = now
+
+    def top(self, section_id: int, offset: int, limit: int) -> Tuple[int, List[Tuple[int, str, int]]]:
+        """(всего учеников в рейтинге, [(место, ученик, очки)])"""
+        with self._lock:
+            board = self._boards.get(section_id)
+            if board is None:
+                return 0, []
+            return len(board), board.top(offset, limit)
+
+    def rank(self, section_id: int, learner_id: str) -> Optional[Tuple[int, int]]:
+        with self._lock:
+            board = self._boards.get(section_id)
+            return board.rank(learner_id) if board is not None else None
+
+    def drop_sections(self, section_ids: Iterable[int]):
+        """Секции удалены: их рейтинги и несохраненные приросты больше не нужны"""
+        section_ids = set(section_ids)
+        with self._lock:
+            for section_id in section_ids:
+                self._boards.pop(section_id, None)
+            self._pending = {key: value for key, value in self._pending.items() if key[0] not in section_ids}
+
+    # Снимок в БД
+
+    def load(self):
+        """Перестроить рейтинги из leaderboard_scores (плюс еще не записанные приросты)"""
+        table = models.leaderboard_scores
+        db = self.session_factory()
+        try:
+            rows = db.execute(
+                select(table.c.section_id, table.c.learner_id, table.c.score, table.c.reached_at)
+                .order_by(table.c.section_id, table.c.score.desc(), table.c.reached_at, table.c.learner_id)
+            )
+            by_section = defaultdict(list)
+            for section_id, learner_id, score, reached_at in rows:
+                by_section[section_id].append((learner_id, score, reached_at))
+        finally:
+            db.close()
+        boards = {section_id: Leaderboard(entries) for section_id, entries in by_section.items()}
+        with self._lock:
+            for (section_id, learner_id), (points, reached_at) in self._pending.items():
+                board = boards.setdefault(section_id, Leaderboard())
+                board.set(learner_id, board.entries.get(learner_id, (0, reached_at))[0] + points, reached_at)
+            self._boards = boards
+        self.loaded_at = time.time()
+        self.error = None
+        self.loaded.set()
+
+    def _load_until_ready(self) -> bool:
+        """Первая загрузка: пока БД недоступна - повторы с экспоненциальной паузой
+        не длиннее max_load_backoff, пока загрузка не удастся или не будет вызван stop"""
+        attempt = 0
+        while not self._stop.is_set():
+            try:
+                self.load()
+                return True
+            except SQLAlchemyError as exc:
+                self.error = str(exc)
+                delay = min(self.max_load_backoff, self.load_backoff * 2 ** attempt)
+                attempt += 1
+                logger.warning("Не удалось загрузить рейтинги (попытка %s), повтор через %.1f с: %s",
+                               attempt, delay, exc)
+                self._stop.wait(delay)
+        return False
+
+    def request_reload(self):
+        """Уведомления могли потеряться (переподключение LISTEN): перечитать снимок в фоне"""
+        self._reload.set()
+
+    def snapshot(self) -> int:
+        """Прибавить накопленные приросты к leaderboard_scores и разослать итоговые очки"""
+        with self._snapshot_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            table = models.leaderboard_scores
+            rows = [
+                {"section_id": section_id, "learner_id": learner_id, "score": points, "reached_at": reached_at}
+                for (section_id, learner_id), (points, reached_at) in pending.items()
+            ]
+            statement = insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=["section_id", "learner_id"],
+                set_={"score": table.c.score + statement.excluded.score, "reached_at": statement.excluded.reached_at},
+            ).returning(table.c.section_id, table.c.learner_id, table.c.score, table.c.reached_at)
+            db = self.session_factory()
+            try:
+                # Очки удаленных секций отбрасываются
+                existing = {section_id for (section_id,) in db.execute(
+                    text("SELECT id FROM sections WHERE id = ANY(:ids)"),
+                    {"ids": list({row["section_id"] for row in rows})},
+                )}
+                rows = [row for row in rows if row["section_id"] in existing]
+                totals = []
+                for start in range(0, len(rows), SNAPSHOT_CHUNK):
+                    chunk = rows[start:start + SNAPSHOT_CHUNK]
+                    totals.extend(db.execute(statement.values(chunk)).all())
+                for start in range(0, len(totals), NOTIFY_SCORES):
+                    payload = json.dumps({"pid": os.getpid(), "scores": [list(row) for row in totals[start:start + NOTIFY_SCORES]]})
+                    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+                db.commit()
+            except Exception:
+                db.rollback()
+                with self._lock:
+                    # Вернуть приросты в буфер, сложив с накопленными за время записи
+                    for key, (points, reached_at) in pending.items():
+                        current = self._pending.setdefault(key, [0, reached_at])
+                        current[0] += points
+                raise
+            finally:
+                db.close()
+            # Очки от других воркеров, попавшие в БД раньше, теперь видны и здесь
+            self._apply(totals)
+            self.snapshots += 1
+            return len(rows)
+
+    def _apply(self, totals: Iterable):
+        with self._lock:
+            for section_id, learner_id, score, reached_at in totals:
+                pending = self._pending.get((section_id, learner_id))
+                if pending is not None:
+                    score, reached_at = score + pending[0], pending[1]
+                self._board(section_id).set(learner_id, score, reached_at)
+
+    def handle_notify(self, payload: str):
+        """Обработчик канала leaderboard_changed: итоговые очки от других воркеров"""
+        message = json.loads(payload)
+        if message.get("pid") != os.getpid():
+            self._apply(message.get("scores", []))
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="leaderboard-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Остановить поток снимков и записать остаток приростов"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
+        self.snapshot()
+
+    def _run(self):
+        if not self._load_until_ready():
+            return
+        while not self._stop.wait(self.snapshot_interval):
+            try:
+                self.snapshot()
+                if self._reload.is_set():
+                    self._reload.clear()
+                    self.load()
+            except Exception:
+                logger.exception("Не удалось сохранить снимок рейтингов, повтор через %.1f с", self.snapshot_interval)
+
+    def stats(self):
+        with self._lock:
+            entries = sum(len(board) for board in self._boards.values())
+        return {
+            "sections": len(self._boards),
+            "entries": entries,
+            "pending": len(self._pending),
+            "snapshots": self.snapshots,
+            "loaded_at": self.loaded_at,
+            "error": self.error,
+        }
@@ -0,0 +1,287 @@
+"""
+Структурированные логи: одна JSON-строка на запись, вывод в отдельном потоке
+
+Корневой логгер получает только ContextQueueHandler: он дописывает к записи
+контекст запроса (request_id, маршрут, trace_id) и кладет ее в ограниченную
+очередь. Форматирование и запись в stdout делает поток QueueListener, поэтому
+медленный stdout/диск не задерживает запросы. Переполненная очередь - запись
+отбрасывается и считается, запрос не ждет.
+
+Объем ограничивает сэмплирование по логгерам (LOG_SAMPLING): доля записей
+INFO и ниже, которые попадают в очередь. WARNING и выше пишутся всегда.
+Access log (логгер app.access) пишет AccessLogMiddleware: метод, путь, маршрут,
+статус, время ответа, число и время SQL-запросов.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from uuid import uuid4
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .core.config import settings
+from .tracing import current_span
+
+access_logger = logging.getLogger("app.access")
+
+REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+# Поля стандартной LogRecord; все остальное в __dict__ - extra=... вызывающего кода
+STANDARD_ATTRIBUTES = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+CONTEXT_ATTRIBUTES = ("request_id", "method", "path", "route", "trace_id")
+
+
+class RequestLog:
+    """Контекст запроса для записей лога и счетчики SQL (общие для потоков запроса)"""
+
+    __slots__ = ("request_id", "method", "path", "route", "db_queries", "db_ms")
+
+    def __init__(self, request_id: str, method: str, path: str):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.route = None
+        self.db_queries = 0
+        self.db_ms = 0.0
+
+
+_request: ContextVar[Optional[RequestLog]] = ContextVar("request_log", default=None)
+
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """ "app.access=0.1; uvicorn=0.5" -> {логгер: доля}; пустая строка - без сэмплирования"""
+    rates = {}
+    for part in spec.split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        name, sep, value = part.partition("=")
+        try:
+            rate = float(value)
+        except ValueError:
+            rate = -1.0
+        if not sep or not name.strip() or not 0.0 <= rate <= 1.0:
+            raise ValueError(f"Invalid log sampling rule: {part!r}, expected LOGGER=RATIO with RATIO in 0..1")
+        rates[name.strip()] = rate
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Доля записей INFO и ниже по логгерам; правило для "app" действует и на "app.access" """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+        self._by_logger: Dict[str, float] = {}
+
+    def rate(self, name: str) -> float:
+        rate = self._by_logger.get(name)
+        if rate is None:
+            rate = 1.0
+            # Самое длинное совпадающее правило
+            prefix = name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._by_logger[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class ContextQueueHandler(QueueHandler):
+    """QueueHandler, который не блокирует: контекст запроса - сейчас, форматирование - в потоке вывода"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # contextvars видны только в потоке запроса, поэтому контекст снимается здесь
+        request = _request.get()
+        if request is not None:
+            record.request_id = request.request_id
+            record.method = request.method
+            record.path = request.path
+            record.route = request.route
+        span = current_span()
+        if span is not None:
+            record.trace_id = span.trace_id
+        # Аргументы подставляются сразу: изменяемые объекты могут поменяться до вывода
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self) -> Dict[str, int]:
+        sampled_out = sum(f.sampled_out for f in self.filters if isinstance(f, SamplingFilter))
+        return {"queued": self.queue.qsize(), "dropped": self.dropped, "sampled_out": sampled_out}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in CONTEXT_ATTRIBUTES:
+            value = record.__dict__.get(key)
+            if value is not None:
+                entry[key] = value
+        for key, value in record.__dict__.items():
+            if key not in STANDARD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+queue_handler: Optional[ContextQueueHandler] = None
+_listener: Optional[QueueListener] = None
+# Процесс, в котором запущен поток вывода (после fork поток остается в мастере)
+_listener_pid = None
+
+
+def configure_logging():
+    """Корневой логгер -> очередь -> поток вывода JSON в stdout
+
+    Повторный вызов (gunicorn post_fork) создает новую очередь и поток: потоки
+    мастера не переживают fork, а блокировки его очереди могли остаться занятыми.
+    """
+    global queue_handler, _listener, _listener_pid
+    stop_logging()
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    if queue_handler is None:
+        queue_handler = ContextQueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter(parse_sampling(settings.LOG_SAMPLING)))
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(settings.LOG_LEVEL)
+    else:
+        queue_handler.queue = log_queue
+    # Логи uvicorn идут через ту же очередь; его access log заменяет app.access
+    for name in ("uvicorn", "uvicorn.error"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+    logging.getLogger("uvicorn.access").disabled = True
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+
+
+def stop_logging():
+    """Дописать очередь и остановить поток вывода (завершение воркера)"""
+    global _listener
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+    _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def log_stats() -> Dict[str, int]:
+    return queue_handler.stats() if queue_handler is not None else {}
+
+
+class AccessLogMiddleware:
+    """ASGI-middleware: строка access log на запрос и контекст запроса для всех записей внутри"""
+
+    def __init__(self, app, slow_ms: float):
+        self.app = app
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if request_id is None or not REQUEST_ID_RE.match(request_id):
+            request_id = uuid4().hex
+        request = RequestLog(request_id, scope["method"], scope["path"])
+        status = 500
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode())]
+            await send(message)
+
+        token = _request.set(request)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            latency_ms = (time.perf_counter() - started) * 1000
+            route = scope.get("route")
+            request.route = route.path if route is not None else None
+            # Ошибки и медленные запросы - WARNING: они проходят мимо сэмплирования
+            level = logging.WARNING if status >= 500 or latency_ms >= self.slow_ms else logging.INFO
+            access_logger.log(
+                level, "%s %s %d %.1f ms", request.method, request.path, status, latency_ms,
+                extra={
+                    "request_id": request.request_id,
+                    "route": request.route,
+                    "status": status,
+                    "latency_ms": round(latency_ms, 2),
+                    "db_queries": request.db_queries,
+                    "db_ms": round(request.db_ms, 2),
+                },
+            )
+            _request.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _request.get() is not None:
+        conn.info["log_query_started"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("log_query_started", None)
+    request = _request.get()
+    if started is not None and request is not None:
+        request.db_queries += 1
+        request.db_ms += (time.perf_counter() - started) * 1000
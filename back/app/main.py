@@ -1,14 +1,118 @@
-from fastapi import FastAPI, Depends, HTTPException
+import io
+import secrets
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from . import models, schemas
-from .database import SessionLocal, engine, get_db
+from . import bulk, crud, models, schemas
+from .admission import AdmissionLimit, AdmissionMiddleware
+from .cache import answer_texts, get_section_payload, get_sections_json, section_cache, section_resolver
+from .compression import CompressionMiddleware, negotiate
+from .core.config import settings
+from .database import PRIMARY_STICKY_COOKIE, SessionLocal, engine, get_db, get_read_db, replica_router
+from .events import EventBroadcaster, TooManySubscribers, event_stream, notify_sections_changed
+from .formats import MEDIA_TYPES, negotiate_format
+from .ingest import InvalidPayloads, ingest, validate_payloads
+from .leaderboard import CHANNEL as LEADERBOARD_CHANNEL, Leaderboards, public_id
+from .logs import AccessLogMiddleware, configure_logging, log_stats
+from .publish import publish_after_write, publisher
+from .ratelimit import MemoryBuckets, PostgresBuckets, RateLimiter, RateLimitMiddleware, parse_rules
+from .scheduler import CHANNEL as REVIEW_CHANNEL, Scheduler, quality_from_answer
+from .tracing import TracingMiddleware, tracer
+from .warmup import readiness, start_warmup, stop_warmup
 
 from fastapi.middleware.cors import CORSMiddleware
 
+configure_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Прогрев идет в фоне: /health отвечает сразу, /ready - после прогрева
+    start_warmup()
+    tracer.start()
+    replica_router.start()
+    scheduler.start()
+    # Рейтинги строятся из снимка в БД в фоне, /ready - после загрузки
+    leaderboards.start()
+    publisher.start()
+    if settings.EVENTS_ENABLED:
+        broadcaster.start()
+    yield
+    stop_warmup()
+    broadcaster.stop()
+    publisher.stop()
+    leaderboards.stop()
+    scheduler.stop()
+    replica_router.stop()
+    tracer.stop()
+
+
+app = FastAPI(openapi_prefix="/api", lifespan=lifespan)
+
+scheduler = Scheduler(
+    SessionLocal,
+    max_queues=settings.SCHEDULER_MAX_QUEUES,
+    flush_interval=settings.SCHEDULER_FLUSH_INTERVAL,
+    flush_batch=settings.SCHEDULER_FLUSH_BATCH,
+    new_per_batch=settings.SCHEDULER_NEW_PER_BATCH,
+)
+
+def sections_changed(section_ids):
+    section_cache.invalidate(section_ids)
+    scheduler.invalidate_sections(section_ids)
+
+leaderboards = Leaderboards(SessionLocal, snapshot_interval=settings.LEADERBOARD_SNAPSHOT_INTERVAL)
+
+def sections_deleted(section_ids):
+    section_resolver.invalidate_ids(section_ids)
+    leaderboards.drop_sections(section_ids)
+
+def events_reset():
+    section_cache.clear()
+    scheduler.clear()
+    leaderboards.request_reload()
+
+# Уведомления других воркеров сбрасывают и их кэши секций и очереди повторений,
+# а очки, набранные на других воркерах, попадают в рейтинги
+broadcaster = EventBroadcaster(
+    engine,
+    max_subscribers=settings.EVENTS_MAX_SUBSCRIBERS,
+    on_change=sections_changed,
+    on_reset=events_reset,
+    on_delete=sections_deleted,
+)
+broadcaster.listen(REVIEW_CHANNEL, scheduler.handle_notify)
+broadcaster.listen(LEADERBOARD_CHANNEL, leaderboards.handle_notify)
 
-app = FastAPI(openapi_prefix="/api")
+admission_limits = {
+    "read": AdmissionLimit(
+        "read", settings.READ_CONCURRENCY, settings.READ_QUEUE_SIZE, settings.READ_QUEUE_TIMEOUT
+    ),
+    "write": AdmissionLimit(
+        "write", settings.WRITE_CONCURRENCY, settings.WRITE_QUEUE_SIZE, settings.WRITE_QUEUE_TIMEOUT
+    ),
+}
+
+rate_limiter = RateLimiter(
+    parse_rules(settings.RATE_LIMITS),
+    PostgresBuckets(engine) if settings.RATE_LIMIT_BACKEND == "postgres"
+    else MemoryBuckets(settings.RATE_LIMIT_MAX_CLIENTS),
+    client_header=settings.RATE_LIMIT_CLIENT_HEADER,
+    api_keys=[key.strip() for key in settings.RATE_LIMIT_API_KEYS.split(",") if key.strip()],
+    trusted_proxies=[proxy.strip() for proxy in settings.RATE_LIMIT_TRUSTED_PROXIES.split(",") if proxy.strip()],
+)
+
+# Внутри CORS: отказы 429/503 тоже получают CORS-заголовки.
+# Лимит частоты проверяется раньше очереди допуска
+app.add_middleware(AdmissionMiddleware, limits=admission_limits)
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,46 +122,249 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+
+# Access log видит отказы 429/503 и пишется внутри span запроса (с trace_id)
+app.add_middleware(AccessLogMiddleware, slow_ms=settings.LOG_SLOW_REQUEST_MS)
+
+# Снаружи всех: span запроса включает сжатие, очередь допуска и отказы 429/503
+app.add_middleware(TracingMiddleware, tracer=tracer)
+
+def reads_own_writes(request: Request) -> bool:
+    """Клиент недавно писал: чтение с primary мимо кэшей (см. get_read_db)"""
+    return PRIMARY_STICKY_COOKIE in request.cookies
+
+def cache_headers(request: Request):
+    """Заголовки для кэширования GET-ответов на границе (nginx) и в браузере"""
+    if reads_own_writes(request):
+        # Браузер автора записи не должен показывать свою старую копию
+        return {"Cache-Control": "private, no-cache"}
+    return {
+        "Cache-Control": (
+            f"public, max-age={settings.HTTP_CACHE_MAX_AGE}, "
+            f"stale-while-revalidate={settings.HTTP_CACHE_MAX_AGE}, "
+            f"stale-if-error={settings.HTTP_CACHE_STALE_IF_ERROR}"
+        )
+    }
+
 @app.post("/tests/", response_model=List[schemas.Question])
-def create_tests(tests: List[schemas.TestPayload], db: Session = Depends(get_db)):
-    created_questions = []
-    for test in tests:
-        # Find or create section
-        db_section = db.query(models.Section).filter(models.Section.name == test.section).first()
-        if not db_section:
-            db_section = models.Section(name=test.section)
-            db.add(db_section)
-            db.commit()
-            db.refresh(db_section)
-
-        # Create question
-        db_question = models.Question(text=test.question, section_id=db_section.id)
-        db.add(db_question)
-        db.commit()
-        db.refresh(db_question)
-
-        # Create answers
-        for i, answer_text in enumerate(test.answers):
-            is_correct = (i == test.correct)
-            db_answer = models.Answer(text=answer_text, is_correct=is_correct, question_id=db_question.id)
-            db.add(db_answer)
-        
-        db.commit()
-        db.refresh(db_question)
-        created_questions.append(db_question)
-    return created_questions
+def create_tests(tests: List[schemas.TestPayload], response: Response, db: Session = Depends(get_db)):
+    # Все имена секций пакета - одним обращением к кэшу (промахи - одним запросом)
+    section_ids_by_name = section_resolver.resolve(db, (test.section for test in tests))
+    # Тексты ответов пакета интернируются вместе (ANSWER_STORAGE=interned)
+    text_ids = None
+    if settings.ANSWER_STORAGE == "interned":
+        text_ids = answer_texts.intern(db, (answer for test in tests for answer in test.answers))
+    # Create questions with answers (rows in answers or JSONB, see ANSWER_STORAGE)
+    created_questions = [
+        crud.build_question(
+            test.question, section_ids_by_name[test.section], test.answers, test.correct,
+            settings.ANSWER_STORAGE, text_ids,
+        )
+        for test in tests
+    ]
+    db.add_all(created_questions)
+    db.flush()
+    if text_ids is not None:
+        crud.fill_answer_texts(db, (answer for question in created_questions for answer in question.answers))
+    # Ответ собирается до commit: после него атрибуты истекают и читались бы по вопросу
+    result = [schemas.Question.model_validate(question) for question in created_questions]
+
+    section_ids = set(section_ids_by_name.values())
+    # Событие для /events/ уходит всем воркерам после commit
+    notify_sections_changed(db, section_ids)
+    db.commit()
+    sections_changed(section_ids)
+    # Статические файлы для nginx (PUBLISH_DIR), только измененные секции - в фоне
+    publish_after_write(section_ids)
+
+    # Read-your-writes: пока реплики догоняют primary, клиент читает с primary
+    response.set_cookie(PRIMARY_STICKY_COOKIE, "1", max_age=settings.DB_REPLICA_STICKY_SECONDS, httponly=True)
+    return result
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_API_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+async def run_import(request: Request, response: Response, db: Session, replace: bool) -> schemas.ImportResult:
+    content_type = request.headers.get("content-type", "")
+    fmt = "ndjson" if "ndjson" in content_type or "jsonl" in content_type else "json"
+    # Тело копится во временном файле (на диске после 8 МБ), импорт идет в пуле потоков
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as body:
+        async for chunk in request.stream():
+            body.write(chunk)
+        body.seek(0)
+        stream = io.TextIOWrapper(body, encoding="utf-8")
+        try:
+            # Все тесты проверяются до первой пачки: ошибка не оставляет импорт наполовину записанным
+            tests = await run_in_threadpool(validate_payloads, stream, fmt)
+            result = await run_in_threadpool(
+                ingest, db, tests, None, settings.IMPORT_BATCH_SIZE, replace, sections_changed
+            )
+        except InvalidPayloads as exc:
+            db.rollback()
+            raise HTTPException(status_code=422, detail=exc.errors)
+        except ValueError as exc:
+            db.rollback()
+            raise HTTPException(status_code=422, detail=str(exc))
+        finally:
+            stream.detach()
+    response.set_cookie(PRIMARY_STICKY_COOKIE, "1", max_age=settings.DB_REPLICA_STICKY_SECONDS, httponly=True)
+    return result
+
+@app.post("/admin/import/", response_model=schemas.ImportResult, dependencies=[Depends(require_admin)])
+async def import_tests(request: Request, response: Response, db: Session = Depends(get_db)):
+    """Массовый импорт: JSON-массив TestPayload или NDJSON (Content-Type: application/x-ndjson)"""
+    return await run_import(request, response, db, replace=False)
+
+@app.put("/admin/import/", response_model=schemas.ImportResult, dependencies=[Depends(require_admin)])
+async def replace_tests(request: Request, response: Response, db: Session = Depends(get_db)):
+    """Импорт с заменой: прежние вопросы секций из тела удаляются, остальные секции не трогаются"""
+    result = await run_import(request, response, db, replace=True)
+    # Очереди повторений ссылаются на удаленные вопросы
+    scheduler.clear()
+    return result
+
+def parse_ids(ids: str, limit: int) -> List[int]:
+    """Список id из строки запроса: ?ids=1,2,3 (без повторов, в исходном порядке)"""
+    try:
+        values = list(dict.fromkeys(int(value) for value in ids.split(",") if value.strip()))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids must be a comma-separated list of integers")
+    if len(values) > limit:
+        raise HTTPException(status_code=422, detail=f"Too many ids, max {limit}")
+    return values
+
+def bulk_committed(db: Session, response: Response, section_ids, deleted_sections=()):
+    """После массовой записи: уведомление, commit, сброс кэшей и статических файлов"""
+    notify_sections_changed(db, section_ids)
+    db.commit()
+    sections_changed(section_ids)
+    if deleted_sections:
+        sections_deleted(deleted_sections)
+    publish_after_write(section_ids)
+    response.set_cookie(PRIMARY_STICKY_COOKIE, "1", max_age=settings.DB_REPLICA_STICKY_SECONDS, httponly=True)
+
+@app.delete("/admin/sections/", response_model=schemas.BulkResult, dependencies=[Depends(require_admin)])
+def delete_sections(ids: str, response: Response, db: Session = Depends(get_db)):
+    """Удалить секции со всеми вопросами, ответами и прогрессом учеников: ?ids=1,2,3"""
+    started = time.perf_counter()
+    section_ids = parse_ids(ids, settings.MAX_BULK_IDS)
+    counts, deleted = bulk.delete_sections(db, section_ids)
+    bulk_committed(db, response, deleted, deleted)
+    missing = [section_id for section_id in section_ids if section_id not in deleted]
+    return schemas.BulkResult(**counts, missing=missing, seconds=round(time.perf_counter() - started, 3))
+
+@app.delete("/admin/questions/", response_model=schemas.BulkResult, dependencies=[Depends(require_admin)])
+def delete_questions(ids: str, response: Response, db: Session = Depends(get_db)):
+    """Удалить вопросы с ответами: ?ids=1,2,3"""
+    started = time.perf_counter()
+    question_ids = parse_ids(ids, settings.MAX_BULK_IDS)
+    counts, deleted, section_ids = bulk.delete_questions(db, question_ids)
+    bulk_committed(db, response, section_ids)
+    missing = [question_id for question_id in question_ids if question_id not in deleted]
+    return schemas.BulkResult(**counts, missing=missing, seconds=round(time.perf_counter() - started, 3))
+
+@app.put("/admin/questions/", response_model=schemas.BulkResult, dependencies=[Depends(require_admin)])
+def replace_questions(questions: List[schemas.QuestionReplace], response: Response, db: Session = Depends(get_db)):
+    """Заменить текст и ответы существующих вопросов; все или ничего (404, если какого-то нет)"""
+    started = time.perf_counter()
+    question_ids = [question.id for question in questions]
+    if len(question_ids) > settings.MAX_BULK_IDS:
+        raise HTTPException(status_code=422, detail=f"Too many questions, max {settings.MAX_BULK_IDS}")
+    if len(set(question_ids)) != len(question_ids):
+        raise HTTPException(status_code=422, detail="Question ids must be unique")
+    counts, updated, section_ids = bulk.replace_questions(db, questions, settings.ANSWER_STORAGE)
+    missing = [question_id for question_id in question_ids if question_id not in updated]
+    if missing:
+        db.rollback()
+        raise HTTPException(status_code=404, detail={"message": "Questions not found", "missing": missing})
+    bulk_committed(db, response, section_ids)
+    return schemas.BulkResult(**counts, seconds=round(time.perf_counter() - started, 3))
 
 @app.get("/sections/", response_model=List[schemas.SectionInfo])
-def read_sections(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    sections = db.query(models.Section).offset(skip).limit(limit).all()
+def read_sections(
+    request: Request, response: Response, skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)
+):
+    # question_count/updated_at хранятся в самой строке секции: без COUNT(*) по вопросам
+    sections = db.query(models.Section).order_by(models.Section.id).offset(skip).limit(limit).all()
+    response.headers.update(cache_headers(request))
     return sections
 
+# Ученик - непрозрачный id клиента (фронтенд хранит его в localStorage)
+LEARNER_ID_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+LearnerId = Header(..., alias="X-Learner-Id", pattern=LEARNER_ID_PATTERN)
+OptionalLearnerId = Header(None, alias="X-Learner-Id", pattern=LEARNER_ID_PATTERN)
+
+def leaderboard_entry(rank: int, learner_id: str, score: int) -> schemas.LeaderboardEntry:
+    return schemas.LeaderboardEntry(rank=rank, learner=public_id(learner_id), score=score)
+
+@app.get("/sections/{section_id}/leaderboard/", response_model=schemas.Leaderboard)
+def read_leaderboard(
+    section_id: int,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1),
+    learner_id: Optional[str] = OptionalLearnerId,
+):
+    """Топ секции по очкам из памяти воркера (см. app/leaderboard.py); место ученика - по X-Learner-Id"""
+    limit = min(limit, settings.LEADERBOARD_MAX_LIMIT)
+    total, top = leaderboards.top(section_id, offset, limit)
+    me = leaderboards.rank(section_id, learner_id) if learner_id else None
+    return schemas.Leaderboard(
+        section_id=section_id,
+        total=total,
+        entries=[leaderboard_entry(*entry) for entry in top],
+        me=leaderboard_entry(me[0], learner_id, me[1]) if me else None,
+    )
+
+@app.get("/sections/tests/", response_model=schemas.SectionTestsBatch)
+def read_sections_tests_batch(ids: str, request: Request, db: Session = Depends(get_read_db)):
+    """Вопросы нескольких секций за один запрос: ?ids=1,2,3"""
+    section_ids = parse_ids(ids, settings.MAX_BATCH_SECTIONS)
+
+    payloads = get_sections_json(
+        section_ids, lambda misses: crud.get_questions_by_sections(db, misses),
+        use_cache=not reads_own_writes(request), from_replica=db.info.get("replica", False),
+    )
+    # Собираем ответ из готовых JSON-фрагментов секций, не сериализуя их повторно
+    sections = b",".join(
+        b'{"section_id":%d,"questions":%s}' % (section_id, payloads[section_id])
+        for section_id in section_ids if section_id in payloads
+    )
+    missing = [section_id for section_id in section_ids if section_id not in payloads]
+    body = b'{"sections":[%s],"missing":%s}' % (sections, str(missing).replace(" ", "").encode())
+    return Response(content=body, media_type="application/json", headers=cache_headers(request))
+
 @app.get("/sections/{section_id}/tests/", response_model=List[schemas.Question])
-def read_section_tests(section_id: int, db: Session = Depends(get_db)):
-    questions = db.query(models.Question).filter(models.Question.section_id == section_id).all()
-    if not questions:
+def read_section_tests(
+    section_id: int,
+    request: Request,
+    format: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    # Формат: ?format=json|columnar|msgpack или Accept
+    try:
+        fmt = negotiate_format(format, request.headers.get("accept", ""))
+    except ValueError as exc:
+        raise HTTPException(status_code=406, detail=str(exc))
+    encoding = negotiate(request.headers.get("accept-encoding", ""))
+
+    result = get_section_payload(
+        section_id, fmt, encoding,
+        lambda: crud.get_questions_by_sections(db, [section_id]).get(section_id, []),
+        use_cache=not reads_own_writes(request), from_replica=db.info.get("replica", False),
+    )
+    if result is None:
         raise HTTPException(status_code=404, detail="Section not found or no tests in section")
-    return questions
+
+    payload, content_encoding = result
+    headers = cache_headers(request)
+    headers["Vary"] = "Accept, Accept-Encoding"
+    if content_encoding is not None:
+        headers["Content-Encoding"] = content_encoding
+    return Response(content=payload, media_type=MEDIA_TYPES[fmt], headers=headers)
 
 @app.get("/")
 def read_root():
@@ -70,3 +377,97 @@ def health_check():
 @app.get("/api/health")
 def api_health_check():
     return {"status": "healthy"}
+
+def readiness_response():
+    if readiness.is_ready and leaderboards.loaded.is_set():
+        return {"status": "ready"}
+    error = readiness.error or leaderboards.error
+    return JSONResponse(status_code=503, content={"status": "not ready", "error": error})
+
+@app.get("/ready")
+def ready_check():
+    return readiness_response()
+
+@app.get("/api/ready")
+def api_ready_check():
+    return readiness_response()
+
+@app.get("/sections/{section_id}/review/", response_model=schemas.ReviewBatch)
+def read_review_batch(section_id: int, limit: int = Query(10, ge=1, le=100), learner_id: str = LearnerId):
+    """Следующие вопросы секции для ученика по расписанию SM-2"""
+    question_ids, due = scheduler.next_batch(learner_id, section_id, limit)
+    if not question_ids and not scheduler.has_questions(section_id):
+        raise HTTPException(status_code=404, detail="Section not found or no tests in section")
+    return schemas.ReviewBatch(question_ids=question_ids, due=due)
+
+@app.post("/sections/{section_id}/review/", response_model=List[schemas.ReviewState])
+def record_review(section_id: int, answers: List[schemas.ReviewAnswer], learner_id: str = LearnerId,
+                  db: Session = Depends(get_db)):
+    """Учесть ответы ученика; правильность - по ответам в БД, новое расписание пишется в БД пакетами в фоне"""
+    graded, points = crud.grade_answers(
+        db, learner_id, section_id, [(answer.question_id, answer.answer_id) for answer in answers]
+    )
+    unknown = [answer.question_id for answer in answers if (answer.question_id, answer.answer_id) not in graded]
+    if unknown:
+        db.rollback()
+        raise HTTPException(status_code=422, detail=f"Answers of questions {unknown} are not in section {section_id}")
+    qualities = [
+        (answer.question_id, quality_from_answer(graded[(answer.question_id, answer.answer_id)], answer.quality))
+        for answer in answers
+    ]
+    try:
+        states = scheduler.record(learner_id, section_id, qualities)
+    except ValueError as exc:
+        db.rollback()
+        raise HTTPException(status_code=422, detail=str(exc))
+    db.commit()
+    # Очко в рейтинг секции - за вопрос, впервые отвеченный верно
+    leaderboards.add(learner_id, section_id, points)
+    return states
+
+@app.get("/events/")
+async def events():
+    """Поток server-sent events об изменении секций (см. app/events.py)"""
+    if not broadcaster.is_running:
+        raise HTTPException(status_code=503, detail="Event stream is disabled")
+    try:
+        subscription = broadcaster.subscribe()
+    except TooManySubscribers as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "30"})
+    return StreamingResponse(
+        event_stream(broadcaster, subscription, settings.EVENTS_KEEPALIVE_SECONDS),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: nginx отдает кадры сразу, без буферизации
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def metrics_response():
+    """Метрики процесса: очереди допуска, пул соединений, кэш секций, подписчики событий"""
+    pool = engine.pool
+    return {
+        "admission": {name: limit.stats() for name, limit in admission_limits.items()},
+        "rate_limit": rate_limiter.stats(),
+        "db_pool": {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        },
+        "replicas": replica_router.stats(),
+        "publish": publisher.stats(),
+        "section_cache": section_cache.stats(),
+        "section_resolver": section_resolver.stats(),
+        "answer_texts": answer_texts.stats(),
+        "events": broadcaster.stats(),
+        "scheduler": scheduler.stats(),
+        "leaderboards": leaderboards.stats(),
+        "tracing": tracer.stats(),
+        "logging": log_stats(),
+    }
+
+@app.get("/metrics")
+def metrics():
+    return metrics_response()
+
+@app.get("/api/metrics")
+def api_metrics():
+    return metrics_response()
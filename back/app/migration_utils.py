@@ -0,0 +1,197 @@
+"""
+Помощники для онлайн-миграций больших таблиц
+
+Индексы строятся через CREATE INDEX CONCURRENTLY, данные переносятся
+короткими пачками с паузами, чтобы не держать долгие блокировки и не
+забивать WAL/реплики. Вызываются из upgrade()/downgrade() миграций Alembic.
+"""
+import logging
+import re
+import time
+from typing import Optional, Sequence
+
+from alembic import op
+from sqlalchemy import text
+
+logger = logging.getLogger("alembic.online")
+
+
+def _index_is_invalid(connection, name: str) -> bool:
+    # Прерванный CREATE INDEX CONCURRENTLY оставляет невалидный индекс
+    return bool(connection.execute(
+        text("""
+            SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = :name AND NOT i.indisvalid
+        """),
+        {"name": name},
+    ).scalar())
+
+
+def create_index_concurrently(name: str, table: str, columns: Sequence[str], unique: bool = False, **kw):
+    """Создать индекс без блокировки записи в таблицу (вне транзакции миграции)"""
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        if _index_is_invalid(connection, name):
+            logger.info("Удаляем невалидный индекс %s от прерванной попытки", name)
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        op.create_index(
+            name, table, list(columns), unique=unique,
+            postgresql_concurrently=True, if_not_exists=True, **kw
+        )
+
+
+def drop_index_concurrently(name: str, table: str):
+    with op.get_context().autocommit_block():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def _run_in_key_ranges(statement, table: str, key: str, batch_size: int, pause: float,
+                       params: Optional[dict], action: str) -> int:
+    """Выполнить statement для диапазонов [_lo, _hi) ключа, каждый в своей транзакции"""
+    total = 0
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        low, high = connection.execute(text(f"SELECT min({key}), max({key}) FROM {table}")).one()
+        if low is None:
+            return 0
+        started = time.monotonic()
+        for start in range(low, high + 1, batch_size):
+            total += connection.execute(
+                statement, dict(params or {}, _lo=start, _hi=start + batch_size)
+            ).rowcount
+            done = min(start + batch_size, high + 1) - low
+            elapsed = time.monotonic() - started
+            logger.info(
+                "%s: %.1f%% диапазона %s, %s строк %s (%.0f строк/с)",
+                table, 100 * done / (high + 1 - low), key, action, total, total / elapsed if elapsed else 0,
+            )
+            if pause:
+                time.sleep(pause)
+    return total
+
+
+def batched_update(
+    table: str,
+    set_sql: str,
+    where_sql: Optional[str] = None,
+    key: str = "id",
+    batch_size: int = 10_000,
+    pause: float = 0.1,
+    params: Optional[dict] = None,
+) -> int:
+    """Обновить таблицу диапазонами ключа; каждая пачка коммитится отдельно
+
+    set_sql и where_sql - фрагменты SQL (без SET/WHERE). Пачки идут по
+    диапазонам key, поэтому каждая берет индекс первичного ключа и держит
+    блокировки строк недолго. pause - пауза между пачками (троттлинг).
+    Повторный запуск безопасен, если where_sql отсекает уже обработанные строки.
+    """
+    condition = f" AND ({where_sql})" if where_sql else ""
+    statement = text(
+        f"UPDATE {table} SET {set_sql} WHERE {key} >= :_lo AND {key} < :_hi{condition}"
+    )
+    return _run_in_key_ranges(statement, table, key, batch_size, pause, params, "обновлено")
+
+
+def copy_table_online(
+    source: str,
+    target: str,
+    match_columns: Sequence[str] = ("id",),
+    key: str = "id",
+    batch_size: int = 50_000,
+    pause: float = 0.1,
+) -> int:
+    """Скопировать строки source в target (те же столбцы), не останавливая запись
+
+    Сначала ставится триггер, который повторяет в target все изменения source,
+    затем существующие строки копируются пачками (ON CONFLICT DO NOTHING, у
+    target должен быть уникальный ключ по match_columns). После копирования
+    таблицы совпадают, пока триггер жив; его снимает swap_tables().
+    """
+    function = f"{source}_mirror_to_{target}"
+    match = " AND ".join(f"{column} = OLD.{column}" for column in match_columns)
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {target} WHERE {match};
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {target} SELECT NEW.* ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute(f"""
+        CREATE TRIGGER {function} AFTER INSERT OR UPDATE OR DELETE ON {source}
+            FOR EACH ROW EXECUTE FUNCTION {function}()
+    """)
+    statement = text(
+        f"INSERT INTO {target} SELECT * FROM {source} "
+        f"WHERE {key} >= :_lo AND {key} < :_hi ON CONFLICT DO NOTHING"
+    )
+    return _run_in_key_ranges(statement, source, key, batch_size, pause, None, "скопировано")
+
+
+def swap_tables(source: str, target: str, sequence: Optional[str] = None):
+    """Заменить source на target (после copy_table_online) в текущей транзакции миграции
+
+    Блокировка source берется только на время DROP/RENAME. Последовательность
+    первичного ключа переезжает к target, иначе DROP TABLE удалит ее вместе с source.
+    """
+    function = f"{source}_mirror_to_{target}"
+    op.execute(f"LOCK TABLE {source} IN ACCESS EXCLUSIVE MODE")
+    op.execute(f"DROP TRIGGER {function} ON {source}")
+    op.execute(f"DROP FUNCTION {function}()")
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {target}.id")
+    op.execute(f"DROP TABLE {source}")
+    op.execute(f"ALTER TABLE {target} RENAME TO {source}")
+
+
+def is_partitioned(table: str) -> bool:
+    return bool(op.get_bind().execute(
+        text("""
+            SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid
+            WHERE c.relname = :table
+        """),
+        {"table": table},
+    ).scalar())
+
+
+def add_foreign_key(table: str, name: str, column: str, referred: str, ondelete: Optional[str] = None):
+    """Добавить внешний ключ, не блокируя таблицу на проверку существующих строк
+
+    Ключ добавляется в транзакции миграции как NOT VALID, существующие строки
+    проверяются после ее commit (VALIDATE берет блокировку, совместимую с записью).
+    У секционированной таблицы NOT VALID ключей нет (PostgreSQL < 18), там ключ
+    проверяется сразу.
+    """
+    partitioned = is_partitioned(table)
+    action = f" ON DELETE {ondelete}" if ondelete else ""
+    op.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) "
+        f"REFERENCES {referred} (id){action}{'' if partitioned else ' NOT VALID'}"
+    )
+    if not partitioned:
+        with op.get_context().autocommit_block():
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+
+
+def replace_foreign_key(table: str, name: str, column: str, referred: str, ondelete: Optional[str] = None):
+    """Пересоздать внешний ключ (например, с другим ON DELETE), см. add_foreign_key"""
+    op.execute(f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+    add_foreign_key(table, name, column, referred, ondelete)
+
+
+# Объекты секционирования, которых нет в моделях: autogenerate их не сравнивает
+PARTITION_TABLE_PATTERN = re.compile(r"^answers_p\d+$")
+PARTITION_OBJECT_NAMES = {"answers_id_question_id_key"}
+
+
+def include_object(obj, name, type_, reflected, compare_to) -> bool:
+    """Фильтр для context.configure(include_object=...) в alembic/env.py"""
+    if type_ == "table" and reflected and compare_to is None and PARTITION_TABLE_PATTERN.match(name or ""):
+        return False
+    return name not in PARTITION_OBJECT_NAMES
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, DateTime, DDL, Index, Table, Text, event, func
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -7,6 +8,9 @@ class Section(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True, unique=True)
+    # Денормализованная статистика, поддерживается триггерами на questions
+    question_count = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
 
     questions = relationship("Question", back_populates="section")
 
@@ -15,17 +19,147 @@ class Question(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     text = Column(String, index=True)
-    section_id = Column(Integer, ForeignKey("sections.id"))
+    # Удаление секции удаляет ее вопросы (а с ними ответы и состояние повторений)
+    section_id = Column(Integer, ForeignKey("sections.id", ondelete="CASCADE"), index=True)
+    # Денормализованное хранение (ANSWER_STORAGE=jsonb): тексты ответов массивом
+    # и индекс правильного ответа; строки в answers для такого вопроса не создаются.
+    # answer_ids - id ответов по позициям, выдаются из последовательности answers.id
+    answers_data = Column(JSONB, nullable=True)
+    correct_index = Column(Integer, nullable=True)
+    answer_ids = Column(ARRAY(Integer), nullable=True)
 
     section = relationship("Section", back_populates="questions")
-    answers = relationship("Answer", back_populates="question")
+    answers = relationship("Answer", back_populates="question", order_by="Answer.id")
 
 class Answer(Base):
     __tablename__ = "answers"
 
     id = Column(Integer, primary_key=True, index=True)
-    text = Column(String, index=True)
+    # Текст ответа; при ANSWER_STORAGE=interned - NULL, текст в answer_texts по text_id
+    text = Column(String)
     is_correct = Column(Boolean, default=False)
-    question_id = Column(Integer, ForeignKey("questions.id"))
+    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"), index=True)
+    text_id = Column(Integer, ForeignKey("answer_texts.id"), nullable=True)
 
     question = relationship("Question", back_populates="answers")
+
+    __table_args__ = (
+        # Только тексты, хранящиеся в самой строке: интернированные в индекс не попадают
+        Index("ix_answers_text", "text", postgresql_where=text.isnot(None)),
+    )
+
+class AnswerText(Base):
+    """Уникальный текст ответа (ANSWER_STORAGE=interned); строки не меняются и не удаляются"""
+    __tablename__ = "answer_texts"
+
+    id = Column(Integer, primary_key=True)
+    text = Column(String, nullable=False, unique=True)
+
+
+# Корзины ограничения частоты (RATE_LIMIT_BACKEND=postgres), общие для воркеров.
+# UNLOGGED: без WAL и репликации, после сбоя таблица очищается - для лимитов это допустимо
+rate_limit_buckets = Table(
+    "rate_limit_buckets",
+    Base.metadata,
+    Column("key", Text, primary_key=True),
+    Column("tokens", Float, nullable=False),
+    Column("updated_at", Float, nullable=False),
+    Column("allowed", Boolean, nullable=False),
+    prefixes=["UNLOGGED"],
+)
+
+
+# Состояние интервальных повторений (SM-2) по ученику и вопросу, см. app/scheduler.py.
+# Время - unix-время в секундах, как в очереди планировщика
+review_states = Table(
+    "review_states",
+    Base.metadata,
+    Column("learner_id", Text, primary_key=True),
+    Column("question_id", Integer, ForeignKey("questions.id", ondelete="CASCADE"), primary_key=True),
+    Column("section_id", Integer, ForeignKey("sections.id", ondelete="CASCADE"), nullable=False),
+    Column("repetitions", Integer, nullable=False),
+    Column("interval_days", Float, nullable=False),
+    Column("easiness", Float, nullable=False),
+    Column("due_at", Float, nullable=False),
+    Column("updated_at", Float, nullable=False),
+    Index("ix_review_states_learner_section", "learner_id", "section_id"),
+    # Для каскадного удаления вопросов и секций
+    Index("ix_review_states_question_id", "question_id"),
+    Index("ix_review_states_section_id", "section_id"),
+)
+
+
+# Снимок таблиц лидеров (см. app/leaderboard.py): очки ученика в секции и
+# unix-время, когда они набраны (при равенстве очков выше тот, кто раньше)
+leaderboard_scores = Table(
+    "leaderboard_scores",
+    Base.metadata,
+    Column("section_id", Integer, ForeignKey("sections.id", ondelete="CASCADE"), primary_key=True),
+    Column("learner_id", Text, primary_key=True),
+    Column("score", Integer, nullable=False),
+    Column("reached_at", Float, nullable=False),
+)
+
+# Вопросы, за которые ученик уже получил очко в рейтинге секции: очко - только
+# за первый правильный ответ на вопрос
+leaderboard_answers = Table(
+    "leaderboard_answers",
+    Base.metadata,
+    Column("section_id", Integer, ForeignKey("sections.id", ondelete="CASCADE"), primary_key=True),
+    Column("learner_id", Text, primary_key=True),
+    Column("question_id", Integer, ForeignKey("questions.id", ondelete="CASCADE"), primary_key=True),
+    # Для каскадного удаления вопросов
+    Index("ix_leaderboard_answers_question_id", "question_id"),
+)
+
+
+# Статистика секций пересчитывается одним UPDATE на оператор (а не на строку):
+# массовая вставка/удаление вопросов обновляет каждую секцию один раз.
+# Та же логика создается миграциями 8e04ac52e2e9_add_section_stats и
+# e9c3a7f5d1b2. UPDATE учитывает только вопросы, перенесенные в другую секцию:
+# перезапись без смены секции не меняет ни счетчик, ни updated_at.
+SECTION_STATS_DDL = """
+CREATE OR REPLACE FUNCTION sections_apply_question_delta() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE sections s
+        SET question_count = s.question_count + d.n, updated_at = now()
+        FROM (SELECT section_id, count(*) AS n FROM new_questions
+              WHERE section_id IS NOT NULL GROUP BY section_id) d
+        WHERE s.id = d.section_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE sections s
+        SET question_count = s.question_count - d.n, updated_at = now()
+        FROM (SELECT section_id, count(*) AS n FROM old_questions
+              WHERE section_id IS NOT NULL GROUP BY section_id) d
+        WHERE s.id = d.section_id;
+    ELSE
+        UPDATE sections s
+        SET question_count = s.question_count + d.n, updated_at = now()
+        FROM (SELECT section_id, sum(delta) AS n
+              FROM (SELECT n.section_id, 1 AS delta
+                    FROM old_questions o JOIN new_questions n ON n.id = o.id
+                    WHERE o.section_id IS DISTINCT FROM n.section_id
+                    UNION ALL
+                    SELECT o.section_id, -1
+                    FROM old_questions o JOIN new_questions n ON n.id = o.id
+                    WHERE o.section_id IS DISTINCT FROM n.section_id) moved
+              WHERE section_id IS NOT NULL GROUP BY section_id) d
+        WHERE s.id = d.section_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER questions_section_stats_insert AFTER INSERT ON questions
+    REFERENCING NEW TABLE AS new_questions
+    FOR EACH STATEMENT EXECUTE FUNCTION sections_apply_question_delta();
+CREATE TRIGGER questions_section_stats_update AFTER UPDATE ON questions
+    REFERENCING OLD TABLE AS old_questions NEW TABLE AS new_questions
+    FOR EACH STATEMENT EXECUTE FUNCTION sections_apply_question_delta();
+CREATE TRIGGER questions_section_stats_delete AFTER DELETE ON questions
+    REFERENCING OLD TABLE AS old_questions
+    FOR EACH STATEMENT EXECUTE FUNCTION sections_apply_question_delta();
+"""
+
+event.listen(Question.__table__, "after_create", DDL(SECTION_STATS_DDL).execute_if(dialect="postgresql"))
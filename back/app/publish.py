@@ -0,0 +1,349 @@
+"""
+Статическая публикация секций: готовые JSON-файлы, которые nginx отдает без backend
+
+Структура каталога PUBLISH_DIR (совпадает с путями API без префикса /api):
+    sections/index.json                     - список секций (как GET /sections/)
+    sections/index.<hash>.json              - тот же список под неизменяемым именем
+    sections/<id>/tests/index.json          - вопросы секции (как GET /sections/<id>/tests/)
+    sections/<id>/tests.<hash>.json         - то же под неизменяемым именем
+    sections/<id>/tests/index.columnar      - колоночный формат (?format=columnar)
+    sections/<id>/tests-columnar.<hash>.json - то же под неизменяемым именем
+    manifest.json                           - текущие неизменяемые имена
+Рядом с каждым файлом лежат заранее сжатые .gz (и .br, если установлен brotli)
+для gzip_static/brotli_static. index.json - жесткая ссылка на файл с хэшем,
+подменяется атомарно (rename), поэтому nginx не видит недописанных файлов.
+
+Публикуются только переданные секции и список. После записи публикация идет
+в фоновом потоке (Publisher): запрос не ждет чтения, рендеринга и сжатия, а
+несколько записей в одну секцию публикуются один раз. Запуск полной публикации
+из каталога back:
+    python -m app.publish [--prune]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from pydantic import TypeAdapter
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from . import crud, models, schemas
+from .compression import ENCODINGS, compress
+from .core.config import settings
+from .database import SessionLocal
+from .formats import render_questions
+
+logger = logging.getLogger(__name__)
+
+# Заранее сжатые варианты: расширение файла -> кодировка
+VARIANTS = {".gz": "gzip", ".br": "br"}
+
+# Ключ advisory-блокировки: публикации одной секции из разных воркеров идут по очереди,
+# поэтому последним всегда публикуется последний закоммиченный снимок
+LOCK_NAMESPACE = 4201
+LIST_LOCK_KEY = 0
+
+# Форматы тестов секции: файл tests/index.<формат> и запрос, которому он отвечает
+# (nginx выбирает файл по $args, TestPage запрашивает ?format=columnar)
+SECTION_FORMATS = {"json": "", "columnar": "?format=columnar"}
+
+# Список секций публикуется так же, как его отдает GET /sections/ без параметров
+LIST_LIMIT = 100
+
+sections_adapter = TypeAdapter(List[schemas.SectionInfo])
+
+
+def content_hash(payload: bytes) -> str:
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def _write_atomic(path: str, payload: bytes):
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(payload)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _link_atomic(target: str, path: str):
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    if os.path.lexists(tmp_path):
+        os.unlink(tmp_path)
+    os.link(target, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _remove(path: str):
+    if os.path.lexists(path):
+        os.unlink(path)
+
+
+def write_versioned(directory: str, stem: str, index_path: str, payload: bytes,
+                    keep_versions: int) -> Optional[str]:
+    """Записать payload как <stem>.<hash>.json (+ сжатые) и указать на него index_path
+
+    Возвращает имя файла с хэшем или None, если содержимое не изменилось.
+    Хранится keep_versions последних версий: клиенты, получившие старое имя
+    из манифеста, успевают его дочитать.
+    """
+    os.makedirs(directory, exist_ok=True)
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    name = f"{stem}.{content_hash(payload)}.json"
+    path = os.path.join(directory, name)
+    if os.path.exists(path) and os.path.exists(index_path) and os.path.samefile(index_path, path):
+        return None
+    if not os.path.exists(path):
+        for suffix, encoding in VARIANTS.items():
+            if encoding in ENCODINGS:
+                _write_atomic(path + suffix, compress(payload, encoding, cached=True))
+        _write_atomic(path, payload)
+    # Сначала сжатые варианты, затем основной файл: по index.json всегда есть свежий .gz
+    for suffix, encoding in VARIANTS.items():
+        if encoding in ENCODINGS:
+            _link_atomic(path + suffix, index_path + suffix)
+    _link_atomic(path, index_path)
+    os.utime(path)
+    _prune_versions(directory, stem, keep_versions)
+    return name
+
+
+def _prune_versions(directory: str, stem: str, keep_versions: int):
+    prefix = stem + "."
+    versions = [
+        entry for entry in os.scandir(directory)
+        if entry.name.startswith(prefix) and entry.name.endswith(".json") and entry.is_file()
+    ]
+    versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in versions[max(keep_versions, 1):]:
+        for suffix in ("", *VARIANTS):
+            _remove(entry.path + suffix)
+
+
+def _unpublish_section(root: str, section_id: int):
+    # Без файлов nginx уходит в API, который ответит 404 (или актуальными данными)
+    shutil.rmtree(os.path.join(root, "sections", str(section_id)), ignore_errors=True)
+
+
+def _lock(db: Session, key: int):
+    db.execute(text("SELECT pg_advisory_xact_lock(:namespace, :key)"),
+               {"namespace": LOCK_NAMESPACE, "key": key})
+
+
+def _update_manifest(root: str, changes: Dict[str, Optional[str]]):
+    path = os.path.join(root, "manifest.json")
+    try:
+        with open(path, encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+    for key, name in changes.items():
+        if name is None:
+            manifest.pop(key, None)
+        else:
+            manifest[key] = name
+    _write_atomic(path, json.dumps(manifest, sort_keys=True).encode())
+
+
+def publish_sections(db: Session, section_ids: Iterable[int], root: Optional[str] = None,
+                     keep_versions: Optional[int] = None) -> Dict[str, int]:
+    """Перепубликовать секции section_ids и список секций
+
+    Вызывается после commit записи. Каждая секция читается и пишется под
+    advisory-блокировкой в своей короткой транзакции. Возвращает счетчики
+    опубликованных, неизменившихся и снятых с публикации секций.
+    """
+    root = root or settings.PUBLISH_DIR
+    keep_versions = keep_versions or settings.PUBLISH_KEEP_VERSIONS
+    counts = {"published": 0, "unchanged": 0, "removed": 0}
+    manifest = {}
+    for section_id in sorted(set(section_ids)):
+        _lock(db, section_id)
+        questions = crud.get_questions_by_sections(db, [section_id]).get(section_id, [])
+        section_dir = os.path.join(root, "sections", str(section_id))
+        key = f"sections/{section_id}/tests/"
+        if not questions:
+            _unpublish_section(root, section_id)
+            for query in SECTION_FORMATS.values():
+                manifest[key + query] = None
+            counts["removed"] += 1
+        else:
+            changed = False
+            for fmt, query in SECTION_FORMATS.items():
+                name = write_versioned(
+                    section_dir, "tests" if fmt == "json" else f"tests-{fmt}",
+                    os.path.join(section_dir, "tests", f"index.{fmt}"),
+                    render_questions(questions, fmt), keep_versions,
+                )
+                if name is not None:
+                    manifest[key + query] = f"sections/{section_id}/{name}"
+                    changed = True
+            counts["published" if changed else "unchanged"] += 1
+        db.commit()
+
+    _lock(db, LIST_LOCK_KEY)
+    sections = db.query(models.Section).order_by(models.Section.id).limit(LIST_LIMIT).all()
+    sections_dir = os.path.join(root, "sections")
+    name = write_versioned(
+        sections_dir, "index", os.path.join(sections_dir, "index.json"),
+        sections_adapter.dump_json(sections_adapter.validate_python(sections, from_attributes=True)),
+        keep_versions,
+    )
+    if name is not None:
+        manifest["sections/"] = f"sections/{name}"
+    if manifest:
+        # Под блокировкой списка: манифест не перезаписывается параллельно
+        _update_manifest(root, manifest)
+    db.commit()
+    return counts
+
+
+def _publish_or_unpublish(db: Session, section_ids: Set[int]):
+    """Ошибка публикации снимает секции с публикации: их отдает API"""
+    try:
+        publish_sections(db, section_ids)
+    except Exception:
+        try:
+            db.rollback()
+        except SQLAlchemyError:
+            # Соединение потеряно: сессию закроет вызывающий
+            pass
+        logger.exception("Не удалось опубликовать секции %s, они будут отдаваться через API", sorted(section_ids))
+        for section_id in section_ids:
+            _unpublish_section(settings.PUBLISH_DIR, section_id)
+        _remove(os.path.join(settings.PUBLISH_DIR, "sections", "index.json"))
+
+
+class Publisher:
+    """Очередь секций на публикацию и фоновый поток, который ее разбирает"""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._pending: Set[int] = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.published = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, section_ids: Iterable[int]):
+        """Поставить секции в очередь; без фонового потока (CLI) - опубликовать сразу"""
+        with self._lock:
+            self._pending.update(section_ids)
+        if self.is_running:
+            self._wake.set()
+        else:
+            self.flush()
+
+    def flush(self) -> int:
+        """Опубликовать накопленные секции; вернуть их число"""
+        with self._flush_lock:
+            with self._lock:
+                section_ids, self._pending = self._pending, set()
+            if not section_ids:
+                return 0
+            db = self.session_factory()
+            try:
+                _publish_or_unpublish(db, section_ids)
+            finally:
+                db.close()
+            self.published += len(section_ids)
+            return len(section_ids)
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Остановить поток и опубликовать остаток очереди"""
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Ошибка фоновой публикации")
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {"pending": pending, "published": self.published, "running": self.is_running}
+
+
+publisher = Publisher(SessionLocal)
+
+
+def publish_after_write(section_ids: Iterable[int]):
+    """Публикация после записи: секции уходят в очередь фонового потока
+
+    Запись уже закоммичена, поэтому ни время публикации, ни ее ошибки
+    (диск, SQL, блокировка) не влияют на ответ клиенту.
+    """
+    if not settings.PUBLISH_DIR:
+        return
+    publisher.submit(section_ids)
+
+
+def prune_sections(db: Session, root: str) -> int:
+    """Удалить опубликованные секции, которых больше нет в БД"""
+    sections_dir = os.path.join(root, "sections")
+    if not os.path.isdir(sections_dir):
+        return 0
+    existing = {section_id for (section_id,) in db.query(models.Section.id)}
+    removed = 0
+    for entry in os.scandir(sections_dir):
+        if entry.is_dir() and entry.name.isdigit() and int(entry.name) not in existing:
+            _unpublish_section(root, int(entry.name))
+            removed += 1
+    return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Полная публикация секций в PUBLISH_DIR")
+    parser.add_argument("--root", default=settings.PUBLISH_DIR, help="по умолчанию PUBLISH_DIR")
+    parser.add_argument("--prune", action="store_true", help="удалить секции, которых нет в БД")
+    args = parser.parse_args(argv)
+    if not args.root:
+        parser.error("PUBLISH_DIR не задан, укажите --root")
+
+    db = SessionLocal()
+    try:
+        section_ids = [section_id for (section_id,) in db.query(models.Section.id).order_by(models.Section.id)]
+        counts = publish_sections(db, section_ids, args.root)
+        removed = prune_sections(db, args.root) if args.prune else 0
+    finally:
+        db.close()
+    print(f"Секций опубликовано: {counts['published']}, без изменений: {counts['unchanged']}, "
+          f"без вопросов: {counts['removed']}, удалено лишних: {removed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Ограничение частоты запросов: token bucket на клиента (IP или API-ключ) и маршрут
+
+Правила задаются строкой RATE_LIMITS, например
+    "POST /tests/=5/s:20; GET /sections/*=20/s:60; *=50/s:100"
+- метод (необязательно), шаблон пути (* - любая подстрока), скорость в
+запросах в секунду и размер корзины (burst). Срабатывает первое подходящее
+правило. Шаблоны пишутся без префикса /api (root_path приложения).
+Заголовок с IP клиента (X-Real-IP от nginx) учитывается только от доверенных
+прокси RATE_LIMIT_TRUSTED_PROXIES, иначе его мог бы подделать любой клиент.
+Состояние корзин хранится в процессе (LRU с вытеснением) или в
+UNLOGGED-таблице Postgres, общей для всех воркеров.
+"""
+import fnmatch
+import ipaddress
+import json
+import math
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from .admission import EXEMPT_PATHS, route_path
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    spec: str
+    method: Optional[str]
+    pattern: re.Pattern
+    rate: float
+    burst: float
+
+    def matches(self, method: str, path: str) -> bool:
+        return (self.method is None or self.method == method) and self.pattern.match(path) is not None
+
+
+def parse_rules(spec: str) -> List[RateLimitRule]:
+    """Разобрать RATE_LIMITS; пустая строка - ограничение отключено"""
+    rules = []
+    for item in spec.split(";"):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            route, limit = item.rsplit("=", 1)
+            rate, burst = limit.split(":")
+            rate = float(rate.strip().removesuffix("/s"))
+            burst = float(burst)
+        except ValueError:
+            raise ValueError(f"Invalid rate limit rule: {item!r}, expected 'METHOD /path=RATE/s:BURST'")
+        method, _, path = route.strip().rpartition(" ")
+        rules.append(RateLimitRule(
+            spec=item,
+            method=method.strip().upper() or None,
+            pattern=re.compile(fnmatch.translate(path.strip())),
+            rate=rate,
+            burst=burst,
+        ))
+    return rules
+
+
+class MemoryBuckets:
+    """Корзины в памяти процесса: key -> (токены, время), вытесняются по LRU
+
+    Вызывается только из event loop, поэтому без блокировок.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: str, rate: float, burst: float, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Взять токен; вернуть (разрешено, остаток токенов)"""
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            tokens = burst
+        else:
+            tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+            self.evicted += 1
+        return allowed, tokens
+
+
+# Одно атомарное выражение на запрос: пополнение, списание и результат
+TAKE_SQL = text("""
+INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at, allowed)
+VALUES (:key, :burst - 1, :now, true)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = CASE WHEN LEAST(:burst, b.tokens + (:now - b.updated_at) * :rate) >= 1
+                  THEN LEAST(:burst, b.tokens + (:now - b.updated_at) * :rate) - 1
+                  ELSE LEAST(:burst, b.tokens + (:now - b.updated_at) * :rate) END,
+    updated_at = :now,
+    allowed = LEAST(:burst, b.tokens + (:now - b.updated_at) * :rate) >= 1
+RETURNING allowed, tokens
+""")
+
+
+class PostgresBuckets:
+    """Корзины в UNLOGGED-таблице rate_limit_buckets: общий лимит для всех воркеров
+
+    Стоит одного короткого запроса к primary на каждый ограничиваемый запрос.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def take(self, key: str, rate: float, burst: float, now: Optional[float] = None) -> Tuple[bool, float]:
+        now = time.time() if now is None else now
+        with self.engine.begin() as connection:
+            allowed, tokens = connection.execute(
+                TAKE_SQL, {"key": key, "rate": rate, "burst": burst, "now": now}
+            ).one()
+        return allowed, tokens
+
+    def purge(self, older_than: float = 3600) -> int:
+        """Удалить давно не использованные корзины (для периодического запуска)"""
+        with self.engine.begin() as connection:
+            return connection.execute(
+                text("DELETE FROM rate_limit_buckets WHERE updated_at < :edge"),
+                {"edge": time.time() - older_than},
+            ).rowcount
+
+
+class RateLimiter:
+    """Правила, корзины и определение клиента; счетчики для /metrics"""
+
+    def __init__(self, rules: List[RateLimitRule], buckets, client_header: str = "",
+                 api_keys: Iterable[str] = (), trusted_proxies: Iterable[str] = ()):
+        self.rules = rules
+        self.buckets = buckets
+        self.client_header = client_header.lower().encode()
+        self.trusted_proxies = [ipaddress.ip_network(proxy, strict=False) for proxy in trusted_proxies]
+        self.api_keys = frozenset(api_keys)
+        self.shared = isinstance(buckets, PostgresBuckets)
+        self.allowed = 0
+        self.limited = 0
+
+    def is_trusted_proxy(self, peer: str) -> bool:
+        if not self.trusted_proxies:
+            return False
+        try:
+            address = ipaddress.ip_address(peer)
+        except ValueError:
+            return False
+        return any(address in network for network in self.trusted_proxies)
+
+    def client_key(self, scope) -> str:
+        peer = scope["client"][0] if scope.get("client") else "unknown"
+        client_ip = None
+        for name, value in scope["headers"]:
+            if name == b"x-api-key":
+                key = value.decode("latin-1")
+                # Только известные ключи получают свою корзину, иначе ключи можно перебирать
+                if key in self.api_keys:
+                    return "key:" + key
+            elif self.client_header and name == self.client_header:
+                client_ip = value.decode("latin-1")
+        # Заголовок от клиента напрямую (мимо nginx) - новая корзина на каждый запрос
+        if client_ip is None or not self.is_trusted_proxy(peer):
+            client_ip = peer
+        return "ip:" + client_ip
+
+    def match(self, method: str, path: str) -> Optional[Tuple[int, RateLimitRule]]:
+        for index, rule in enumerate(self.rules):
+            if rule.matches(method, path):
+                return index, rule
+        return None
+
+    async def check(self, scope) -> Optional[Tuple[RateLimitRule, int]]:
+        """None - запрос разрешен, иначе (правило, Retry-After в секундах)"""
+        path = route_path(scope)
+        if not self.rules or path in EXEMPT_PATHS:
+            return None
+        matched = self.match(scope["method"], path)
+        if matched is None:
+            return None
+        index, rule = matched
+        key = f"{index}:{self.client_key(scope)}"
+        if self.shared:
+            allowed, tokens = await run_in_threadpool(self.buckets.take, key, rule.rate, rule.burst)
+        else:
+            allowed, tokens = self.buckets.take(key, rule.rate, rule.burst)
+        if allowed:
+            self.allowed += 1
+            return None
+        self.limited += 1
+        retry_after = max(1, math.ceil((1 - tokens) / rule.rate)) if rule.rate > 0 else 60
+        return rule, retry_after
+
+    def stats(self):
+        stats = {"rules": [rule.spec for rule in self.rules], "allowed": self.allowed, "limited": self.limited}
+        if isinstance(self.buckets, MemoryBuckets):
+            stats.update(clients=len(self.buckets), evicted=self.buckets.evicted)
+        return stats
+
+
+class RateLimitMiddleware:
+    """ASGI-middleware: 429 с Retry-After, когда у клиента закончились токены"""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        limited = await self.limiter.check(scope) if scope["type"] == "http" else None
+        if limited is None:
+            await self.app(scope, receive, send)
+            return
+        rule, retry_after = limited
+        body = json.dumps({"detail": "Rate limit exceeded"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+                (b"x-ratelimit-limit", f"{rule.rate:g}/s;burst={rule.burst:g}".encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,382 @@
+"""
+Интервальные повторения (SM-2): какой вопрос секции показать ученику следующим
+
+Для каждой пары (ученик, секция) в памяти воркера живет очередь: куча по
+времени следующего повторения и указатель на еще не показанные вопросы.
+Следующая пачка из k вопросов - O(k log n), ответ - O(log n). Изменения
+копятся в буфере и пишутся в review_states пачками фоновым потоком
+(SCHEDULER_FLUSH_INTERVAL / SCHEDULER_FLUSH_BATCH). После записи воркер
+публикует NOTIFY review_changed: другие воркеры выбрасывают очереди этих
+учеников и при следующем запросе читают их из БД.
+"""
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, replace
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400.0
+MIN_EASINESS = 1.3
+
+CHANNEL = "review_changed"
+# Ученики в одном NOTIFY: id не длиннее 64 символов, нагрузка < 8000 байт
+NOTIFY_LEARNERS = 100
+FLUSH_CHUNK = 1000
+
+
+@dataclass(slots=True)
+class ReviewState:
+    question_id: int
+    repetitions: int = 0
+    interval_days: float = 0.0
+    easiness: float = 2.5
+    due_at: float = 0.0
+    # Номер версии: устаревшие записи кучи пропускаются (ленивое удаление)
+    version: int = 0
+
+
+def quality_from_answer(correct: bool, quality: Optional[int] = None) -> int:
+    """Оценка SM-2 (0-5): явная от клиента или 4/1 по правильности ответа"""
+    if quality is not None:
+        return quality
+    return 4 if correct else 1
+
+
+def sm2(state: ReviewState, quality: int, now: float) -> ReviewState:
+    """Следующее состояние по алгоритму SM-2"""
+    if quality < 3:
+        repetitions, interval = 0, 1.0
+    else:
+        repetitions = state.repetitions + 1
+        if repetitions == 1:
+            interval = 1.0
+        elif repetitions == 2:
+            interval = 6.0
+        else:
+            interval = round(state.interval_days * state.easiness, 2)
+    easiness = state.easiness + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    return replace(
+        state,
+        repetitions=repetitions,
+        interval_days=interval,
+        easiness=max(MIN_EASINESS, easiness),
+        due_at=now + interval * DAY,
+        version=state.version + 1,
+    )
+
+
+class SectionQuestions:
+    """Вопросы секции по порядку; один объект на секцию, общий для всех учеников"""
+
+    __slots__ = ("ids", "id_set")
+
+    def __init__(self, ids: Iterable[int]):
+        self.ids = tuple(ids)
+        self.id_set = frozenset(self.ids)
+
+
+class ReviewQueue:
+    """Очередь одного ученика в одной секции"""
+
+    __slots__ = ("questions", "states", "heap", "new_position")
+
+    def __init__(self, questions: SectionQuestions, states: Iterable[ReviewState] = ()):
+        self.questions = questions
+        self.states: Dict[int, ReviewState] = {
+            state.question_id: state for state in states if state.question_id in questions.id_set
+        }
+        self.heap = [(state.due_at, state.question_id, state.version) for state in self.states.values()]
+        heapq.heapify(self.heap)
+        self.new_position = 0
+
+    def _is_current(self, entry) -> bool:
+        state = self.states.get(entry[1])
+        return state is not None and state.version == entry[2]
+
+    def next_batch(self, limit: int, now: float, new_limit: int) -> Tuple[List[int], int]:
+        """До limit вопросов: сначала просроченные по времени, затем новые; (id, сколько просрочено)"""
+        due = []
+        while self.heap and len(due) < limit:
+            entry = heapq.heappop(self.heap)
+            if not self._is_current(entry):
+                continue
+            if entry[0] > now:
+                heapq.heappush(self.heap, entry)
+                break
+            due.append(entry)
+        # Вопросы остаются в очереди до ответа
+        for entry in due:
+            heapq.heappush(self.heap, entry)
+        question_ids = [entry[1] for entry in due]
+
+        ids, states = self.questions.ids, self.states
+        # Уже отвеченные вопросы в начале "новых" пропускаются один раз
+        while self.new_position < len(ids) and ids[self.new_position] in states:
+            self.new_position += 1
+        position = self.new_position
+        new_count = 0
+        while position < len(ids) and len(question_ids) < limit and new_count < new_limit:
+            if ids[position] not in states:
+                question_ids.append(ids[position])
+                new_count += 1
+            position += 1
+        return question_ids, len(due)
+
+    def record(self, question_id: int, quality: int, now: float) -> ReviewState:
+        state = sm2(self.states.get(question_id) or ReviewState(question_id), quality, now)
+        self.states[question_id] = state
+        heapq.heappush(self.heap, (state.due_at, question_id, state.version))
+        if len(self.heap) > 2 * len(self.states) + 64:
+            self.heap = [(s.due_at, s.question_id, s.version) for s in self.states.values()]
+            heapq.heapify(self.heap)
+        return state
+
+
+class Scheduler:
+    """Очереди учеников (LRU), буфер несохраненных изменений и их пакетная запись"""
+
+    def __init__(self, session_factory, max_queues: int = 200_000, flush_interval: float = 1.0,
+                 flush_batch: int = 5000, new_per_batch: int = 10):
+        self.session_factory = session_factory
+        self.max_queues = max_queues
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.new_per_batch = new_per_batch
+        self._queues: "OrderedDict[Tuple[str, int], ReviewQueue]" = OrderedDict()
+        self._by_learner: Dict[str, Set[int]] = defaultdict(set)
+        self._by_section: Dict[int, Set[str]] = defaultdict(set)
+        self._sections: Dict[int, SectionQuestions] = {}
+        # (ученик, вопрос) -> (секция, состояние): еще не записано в БД
+        self._dirty: Dict[Tuple[str, int], Tuple[int, ReviewState]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.loads = 0
+        self.flushed = 0
+        self.evicted = 0
+
+    # Очереди
+
+    def _load_section(self, db, section_id: int) -> SectionQuestions:
+        questions = self._sections.get(section_id)
+        if questions is None:
+            ids = db.execute(
+                select(models.Question.id).where(models.Question.section_id == section_id).order_by(models.Question.id)
+            ).scalars()
+            questions = SectionQuestions(ids)
+        return questions
+
+    def _load_queue(self, learner_id: str, section_id: int) -> ReviewQueue:
+        table = models.review_states
+        db = self.session_factory()
+        try:
+            questions = self._load_section(db, section_id)
+            rows = db.execute(
+                select(table.c.question_id, table.c.repetitions, table.c.interval_days,
+                       table.c.easiness, table.c.due_at)
+                .where(table.c.learner_id == learner_id, table.c.section_id == section_id)
+            )
+            states = {row.question_id: ReviewState(*row) for row in rows}
+        finally:
+            db.close()
+        with self._lock:
+            # Несохраненные изменения новее того, что в БД
+            for (dirty_learner, question_id), (dirty_section, state) in self._dirty.items():
+                if dirty_learner == learner_id and dirty_section == section_id:
+                    states[question_id] = state
+            self._sections.setdefault(section_id, questions)
+        self.loads += 1
+        return ReviewQueue(questions, states.values())
+
+    def _queue(self, learner_id: str, section_id: int) -> ReviewQueue:
+        key = (learner_id, section_id)
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is not None:
+                self._queues.move_to_end(key)
+                return queue
+        # Чтение из БД идет без блокировки: остальные ученики не ждут
+        loaded = self._load_queue(learner_id, section_id)
+        with self._lock:
+            queue = self._queues.setdefault(key, loaded)
+            self._by_learner[learner_id].add(section_id)
+            self._by_section[section_id].add(learner_id)
+            while len(self._queues) > self.max_queues:
+                self._drop(next(iter(self._queues)))
+                self.evicted += 1
+        return queue
+
+    def has_questions(self, section_id: int) -> bool:
+        questions = self._sections.get(section_id)
+        return questions is not None and bool(questions.ids)
+
+    def _drop(self, key: Tuple[str, int]):
+        learner_id, section_id = key
+        self._queues.pop(key, None)
+        sections = self._by_learner.get(learner_id)
+        if sections is not None:
+            sections.discard(section_id)
+            if not sections:
+                del self._by_learner[learner_id]
+        learners = self._by_section.get(section_id)
+        if learners is not None:
+            learners.discard(learner_id)
+            if not learners:
+                del self._by_section[section_id]
+
+    def next_batch(self, learner_id: str, section_id: int, limit: int,
+                   now: Optional[float] = None) -> Tuple[List[int], int]:
+        queue = self._queue(learner_id, section_id)
+        now = time.time() if now is None else now
+        with self._lock:
+            return queue.next_batch(limit, now, self.new_per_batch)
+
+    def record(self, learner_id: str, section_id: int, answers: Iterable[Tuple[int, int]],
+               now: Optional[float] = None) -> List[ReviewState]:
+        """Учесть ответы [(question_id, оценка 0-5)]; ValueError для вопросов не из секции"""
+        queue = self._queue(learner_id, section_id)
+        now = time.time() if now is None else now
+        answers = list(answers)
+        unknown = [question_id for question_id, _ in answers if question_id not in queue.questions.id_set]
+        if unknown:
+            raise ValueError(f"Questions {unknown} are not in section {section_id}")
+        with self._lock:
+            states = []
+            for question_id, quality in answers:
+                state = queue.record(question_id, quality, now)
+                self._dirty[(learner_id, question_id)] = (section_id, state)
+                states.append(state)
+            pending = len(self._dirty)
+        if pending >= self.flush_batch:
+            self._wake.set()
+        return states
+
+    # Сброс устаревших очередей
+
+    def evict_learners(self, learner_ids: Iterable[str]):
+        with self._lock:
+            for learner_id in learner_ids:
+                for section_id in list(self._by_learner.get(learner_id, ())):
+                    self._drop((learner_id, section_id))
+
+    def invalidate_sections(self, section_ids: Iterable[int]):
+        """Вопросы секций изменились: список вопросов и очереди перечитываются"""
+        with self._lock:
+            for section_id in section_ids:
+                self._sections.pop(section_id, None)
+                for learner_id in list(self._by_section.get(section_id, ())):
+                    self._drop((learner_id, section_id))
+
+    def clear(self):
+        with self._lock:
+            self._queues.clear()
+            self._by_learner.clear()
+            self._by_section.clear()
+            self._sections.clear()
+
+    def handle_notify(self, payload: str):
+        """Обработчик канала review_changed: очереди, измененные другими воркерами"""
+        message = json.loads(payload)
+        if message.get("pid") != os.getpid():
+            self.evict_learners(message.get("learners", []))
+
+    # Запись в БД
+
+    def flush(self) -> int:
+        """Записать накопленные изменения одним upsert на FLUSH_CHUNK строк"""
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+            if not dirty:
+                return 0
+            now = time.time()
+            rows = [
+                {
+                    "learner_id": learner_id, "question_id": question_id, "section_id": section_id,
+                    "repetitions": state.repetitions, "interval_days": state.interval_days,
+                    "easiness": state.easiness, "due_at": state.due_at, "updated_at": now,
+                }
+                for (learner_id, question_id), (section_id, state) in dirty.items()
+            ]
+            learners = sorted({row["learner_id"] for row in rows})
+            statement = insert(models.review_states)
+            statement = statement.on_conflict_do_update(
+                index_elements=["learner_id", "question_id"],
+                set_={column: statement.excluded[column] for column in (
+                    "section_id", "repetitions", "interval_days", "easiness", "due_at", "updated_at"
+                )},
+            )
+            db = self.session_factory()
+            try:
+                # Вопросы могли удалить (PUT/DELETE /admin/...) - их состояние уже не нужно
+                existing = {question_id for (question_id,) in db.execute(
+                    text("SELECT id FROM questions WHERE id = ANY(:ids)"),
+                    {"ids": list({row["question_id"] for row in rows})},
+                )}
+                rows = [row for row in rows if row["question_id"] in existing]
+                # executemany: SQLAlchemy сворачивает строки в многострочные INSERT
+                for start in range(0, len(rows), FLUSH_CHUNK):
+                    db.execute(statement, rows[start:start + FLUSH_CHUNK])
+                for start in range(0, len(learners), NOTIFY_LEARNERS):
+                    payload = json.dumps({"pid": os.getpid(), "learners": learners[start:start + NOTIFY_LEARNERS]})
+                    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+                db.commit()
+            except Exception:
+                db.rollback()
+                with self._lock:
+                    # Вернуть в буфер то, что не успело измениться заново
+                    for key, value in dirty.items():
+                        self._dirty.setdefault(key, value)
+                raise
+            finally:
+                db.close()
+            self.flushed += len(rows)
+            return len(rows)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="scheduler-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Остановить поток записи и сохранить остаток буфера"""
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Не удалось сохранить состояние повторений, повтор через %.1f с", self.flush_interval)
+
+    def stats(self):
+        return {
+            "queues": len(self._queues),
+            "learners": len(self._by_learner),
+            "pending": len(self._dirty),
+            "loads": self.loads,
+            "flushed": self.flushed,
+            "evicted": self.evicted,
+        }
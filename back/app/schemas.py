@@ -1,5 +1,9 @@
-from pydantic import BaseModel, ConfigDict
-from typing import List
+from datetime import datetime
+from pydantic import (
+    AfterValidator, BaseModel, ConfigDict, Field, StringConstraints, TypeAdapter, ValidationError, ValidationInfo,
+    model_validator,
+)
+from typing import Annotated, List, Optional
 
 class AnswerBase(BaseModel):
     text: str
@@ -25,6 +29,22 @@ class Question(QuestionBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+    @model_validator(mode="before")
+    @classmethod
+    def answers_from_row(cls, data):
+        # Ответы в JSONB на строке вопроса; id ответов - из answer_ids (та же последовательность, что answers.id)
+        answers_data = getattr(data, "answers_data", None)
+        if answers_data is None:
+            return data
+        return {
+            "id": data.id,
+            "text": data.text,
+            "answers": [
+                {"id": answer_id, "text": text, "is_correct": i == data.correct_index}
+                for i, (answer_id, text) in enumerate(zip(data.answer_ids, answers_data))
+            ],
+        }
+
 class SectionBase(BaseModel):
     name: str
 
@@ -39,11 +59,128 @@ class Section(SectionBase):
 
 class SectionInfo(SectionBase):
     id: int
+    question_count: int = 0
+    updated_at: Optional[datetime] = None
 
     model_config = ConfigDict(from_attributes=True)
 
+class SectionTests(BaseModel):
+    section_id: int
+    questions: List[Question]
+
+class SectionTestsBatch(BaseModel):
+    sections: List[SectionTests]
+    missing: List[int] = []
+
+# Ограничения входных тестов: нарушения находятся до записи в БД, а не посреди импорта
+MAX_SECTION_NAME_LENGTH = 200
+MAX_QUESTION_LENGTH = 2000
+MAX_ANSWER_LENGTH = 1000
+MAX_ANSWERS = 20
+
+def correct_is_answer_index(correct: int, info: ValidationInfo) -> int:
+    # answers проверяются раньше; если они невалидны, их нет в info.data
+    answers = info.data.get("answers")
+    if answers is not None and correct >= len(answers):
+        raise ValueError(f"correct must be an index into answers (0..{len(answers) - 1})")
+    return correct
+
+SectionName = Annotated[str, StringConstraints(min_length=1, max_length=MAX_SECTION_NAME_LENGTH)]
+QuestionText = Annotated[str, StringConstraints(min_length=1, max_length=MAX_QUESTION_LENGTH)]
+AnswerTexts = Annotated[
+    List[Annotated[str, StringConstraints(min_length=1, max_length=MAX_ANSWER_LENGTH)]],
+    Field(min_length=1, max_length=MAX_ANSWERS),
+]
+CorrectIndex = Annotated[int, Field(ge=0), AfterValidator(correct_is_answer_index)]
+
 class TestPayload(BaseModel):
-    section: str
-    question: str
-    answers: List[str]
-    correct: int
+    section: SectionName
+    question: QuestionText
+    answers: AnswerTexts
+    correct: CorrectIndex
+
+class QuestionReplace(BaseModel):
+    """Новое содержимое существующего вопроса (PUT /admin/questions/)"""
+    id: int
+    question: QuestionText
+    answers: AnswerTexts
+    correct: CorrectIndex
+
+# Проверка целого пакета одним вызовом (разбор JSON и валидация в pydantic-core)
+TEST_PAYLOAD = TypeAdapter(TestPayload)
+TEST_PAYLOADS = TypeAdapter(List[TestPayload])
+
+def payload_errors(exc: ValidationError, index: Optional[int] = None) -> List[dict]:
+    """Ошибки валидации с номером теста: index - для одного теста, иначе первый элемент loc"""
+    errors = []
+    for error in exc.errors(include_url=False, include_context=False, include_input=False):
+        loc = list(error["loc"])
+        if index is None and loc and isinstance(loc[0], int):
+            position, loc = loc[0], loc[1:]
+        else:
+            position = index
+        errors.append({"index": position, "loc": loc, "msg": error["msg"], "type": error["type"]})
+    return errors
+
+class ImportResult(BaseModel):
+    questions: int
+    answers: int
+    sections: int
+    # Прежние вопросы, удаленные при замене секций (PUT /admin/import/)
+    deleted: int = 0
+    seconds: float
+
+class BulkResult(BaseModel):
+    """Итог массового удаления или замены; missing - запрошенные id, которых нет в БД"""
+    sections: int
+    questions: int
+    answers: int = 0
+    missing: List[int] = []
+    seconds: float
+
+class ReviewBatch(BaseModel):
+    """Следующие вопросы для повторения: сначала просроченные (due), затем новые"""
+    question_ids: List[int]
+    due: int
+
+class ReviewAnswer(BaseModel):
+    question_id: int
+    # Выбранный ответ; правильность определяет сервер по ответам вопроса в БД
+    answer_id: int
+    # Оценка SM-2 0-5; без нее: 4 за правильный ответ, 1 за неправильный
+    quality: Optional[int] = Field(None, ge=0, le=5)
+
+class ReviewState(BaseModel):
+    question_id: int
+    repetitions: int
+    interval_days: float
+    easiness: float
+    due_at: float
+
+    model_config = ConfigDict(from_attributes=True)
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    # Публичное имя ученика (хэш X-Learner-Id), сам id не раскрывается
+    learner: str
+    score: int
+
+class Leaderboard(BaseModel):
+    section_id: int
+    total: int
+    entries: List[LeaderboardEntry]
+    # Место ученика из X-Learner-Id, если заголовок передан и ученик набирал очки
+    me: Optional[LeaderboardEntry] = None
+
+class QuestionColumns(BaseModel):
+    """Колоночное представление списка вопросов
+
+    Ответы вопроса i: answer_*[answer_offsets[i]:answer_offsets[i + 1]];
+    correct - позиции правильных ответов в answer_* массивах.
+    """
+    question_ids: List[int]
+    question_texts: List[str]
+    answer_offsets: List[int]
+    answer_ids: List[int]
+    answer_texts: List[str]
+    correct: List[int]
@@ -0,0 +1,399 @@
+"""
+Трассировка запросов: span на HTTP-запрос, выдачу соединения из пула, каждый SQL-запрос и сериализацию
+
+Контекст приходит по W3C trace context (заголовок traceparent от nginx или клиента).
+Без него трасса начинается в backend, trace-id берется из X-Request-Id nginx,
+чтобы строку access log можно было найти в трассах. Решение о записи:
+флаг sampled родителя, для новых трасс - доля TRACING_SAMPLE_RATIO по trace-id
+(как ParentBased(TraceIdRatioBased) в OpenTelemetry). Несэмплированный запрос
+не создает ни одного объекта span.
+
+Законченные span копятся в ограниченной очереди и уходят в фоне пачками
+в формате OTLP/JSON: строками в файл (его читает receiver otlpjsonfile
+коллектора) или POST в коллектор OTLP/HTTP. Переполнение очереди - span
+отбрасываются, запрос не ждет экспорта.
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from starlette.datastructures import Headers
+
+from .core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Виды span в OTLP
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+STATUS_ERROR = 2
+
+# Длинные запросы (импорт, jsonb_to_recordset) обрезаются; параметры не пишутся никогда
+MAX_STATEMENT = 2000
+
+TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?$")
+REQUEST_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+ZERO_TRACE_ID = "0" * 32
+ZERO_SPAN_ID = "0" * 16
+
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace_id, parent_span_id, sampled) из traceparent или None, если заголовок невалиден"""
+    if not header:
+        return None
+    match = TRACEPARENT_RE.match(header.strip())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags, rest = match.groups()
+    # Версия ff запрещена; у версии 00 не бывает хвоста
+    if version == "ff" or (version == "00" and rest) or trace_id == ZERO_TRACE_ID or span_id == ZERO_SPAN_ID:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+
+def current_span() -> Optional["Span"]:
+    return _current.get()
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "kind", "start", "end", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int, attributes: Dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64) or 1:016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start = time.time_ns()
+        self.end = None
+        self.attributes = attributes
+        self.error = None
+
+    def record_error(self, exc: BaseException):
+        self.error = f"{type(exc).__name__}: {exc}"
+
+
+def _attribute(key: str, value) -> Dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        # uint64/int64 в OTLP/JSON - строки
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def encode_otlp(spans, service_name: str) -> Dict:
+    """Пачка span в теле ExportTraceServiceRequest (OTLP/JSON)"""
+    encoded = []
+    for span in spans:
+        item = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.start),
+            "endTimeUnixNano": str(span.end),
+            "attributes": [_attribute(key, value) for key, value in span.attributes.items()],
+        }
+        if span.parent_id:
+            item["parentSpanId"] = span.parent_id
+        if span.error:
+            item["status"] = {"code": STATUS_ERROR, "message": span.error}
+        encoded.append(item)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [_attribute("service.name", service_name)]},
+        "scopeSpans": [{"scope": {"name": __name__}, "spans": encoded}],
+    }]}
+
+
+class FileSink:
+    """Одна строка JSON на пачку; воркеры пишут в один файл через O_APPEND"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __call__(self, payload: Dict):
+        line = json.dumps(payload, separators=(",", ":")) + "\n"
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(line)
+
+
+class OtlpHttpSink:
+    """POST пачки в коллектор OTLP/HTTP (обычно http://collector:4318/v1/traces)"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def __call__(self, payload: Dict):
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class SpanExporter:
+    """Очередь законченных span и фоновый поток, отправляющий их пачками"""
+
+    def __init__(self, sink: Callable[[Dict], None], service_name: str, max_queue: int,
+                 batch_size: int = 512, interval: float = 1.0):
+        self.sink = sink
+        self.service_name = service_name
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.interval = interval
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self._spans = deque()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def export(self, span: Span):
+        if len(self._spans) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._spans.append(span)
+
+    def flush(self) -> int:
+        """Отправить все накопленные span; ошибка приемника теряет только текущую пачку"""
+        sent = 0
+        with self._flush_lock:
+            while self._spans:
+                batch = []
+                while self._spans and len(batch) < self.batch_size:
+                    batch.append(self._spans.popleft())
+                try:
+                    self.sink(encode_otlp(batch, self.service_name))
+                except Exception:
+                    self.failed += len(batch)
+                    logger.exception("Не удалось отправить %d span", len(batch))
+                    continue
+                self.exported += len(batch)
+                sent += len(batch)
+        return sent
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {"queued": len(self._spans), "exported": self.exported, "dropped": self.dropped, "failed": self.failed}
+
+
+class Tracer:
+    """Создание span; без экспортера (TRACING_EXPORTER=none) трассировка выключена"""
+
+    def __init__(self, sample_ratio: float, exporter: Optional[SpanExporter]):
+        self.sample_ratio = sample_ratio
+        self.exporter = exporter
+        self.sampled = 0
+        self.not_sampled = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None, request_id: Optional[str] = None,
+                    kind: int = SERVER, **attributes) -> Optional[Span]:
+        """Корневой span процесса или None, если трасса не сэмплирована"""
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        elif self.sample_ratio <= 0:
+            self.not_sampled += 1
+            return None
+        else:
+            if request_id and REQUEST_ID_RE.match(request_id) and request_id != ZERO_TRACE_ID:
+                trace_id = request_id
+            else:
+                trace_id = f"{random.getrandbits(128) or 1:032x}"
+            parent_id = None
+            # Младшие 64 бита trace-id: решение одинаково во всех сервисах с той же долей
+            sampled = int(trace_id[16:], 16) < self.sample_ratio * 2 ** 64
+        if not sampled:
+            self.not_sampled += 1
+            return None
+        self.sampled += 1
+        return Span(name, trace_id, parent_id, kind, attributes)
+
+    def start_span(self, name: str, kind: int = INTERNAL, **attributes) -> Optional[Span]:
+        """Дочерний span текущего (не делает его текущим); None вне сэмплированной трассы"""
+        parent = _current.get()
+        if parent is None:
+            return None
+        return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+
+    def end(self, span: Span):
+        span.end = time.time_ns()
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    @contextmanager
+    def activate(self, span: Span):
+        """span становится текущим и заканчивается на выходе из блока"""
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.record_error(exc)
+            raise
+        finally:
+            _current.reset(token)
+            self.end(span)
+
+    @contextmanager
+    def span(self, name: str, kind: int = INTERNAL, **attributes):
+        """Дочерний span на время блока; вне трассы ничего не создается"""
+        span = self.start_span(name, kind, **attributes)
+        if span is None:
+            yield None
+            return
+        with self.activate(span):
+            yield span
+
+    def start(self):
+        if self.exporter is not None:
+            self.exporter.start()
+
+    def stop(self):
+        if self.exporter is not None:
+            self.exporter.stop()
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "sample_ratio": self.sample_ratio,
+            "sampled": self.sampled,
+            "not_sampled": self.not_sampled,
+            **(self.exporter.stats() if self.exporter is not None else {}),
+        }
+
+
+def make_exporter() -> Optional[SpanExporter]:
+    if settings.TRACING_EXPORTER == "file":
+        sink = FileSink(settings.TRACING_FILE)
+    elif settings.TRACING_EXPORTER == "otlp":
+        sink = OtlpHttpSink(settings.TRACING_OTLP_ENDPOINT)
+    else:
+        return None
+    return SpanExporter(sink, settings.TRACING_SERVICE_NAME, settings.TRACING_QUEUE_SIZE)
+
+
+tracer = Tracer(settings.TRACING_SAMPLE_RATIO, make_exporter())
+
+
+class TracingMiddleware:
+    """ASGI-middleware: серверный span на запрос, имя по шаблону маршрута ("GET /sections/{section_id}/tests/")"""
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        method = scope["method"]
+        span = self.tracer.start_trace(
+            f"{method} {scope['path']}", headers.get("traceparent"), headers.get("x-request-id"),
+            **{"http.request.method": method, "url.path": scope["path"]},
+        )
+        if span is None:
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = _current.set(span)
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException as exc:
+            span.record_error(exc)
+            raise
+        finally:
+            _current.reset(token)
+            # Маршрут известен только после роутинга: FastAPI кладет его в тот же scope
+            route = scope.get("route")
+            if route is not None:
+                span.name = f"{method} {route.path}"
+                span.attributes["http.route"] = route.path
+            span.attributes["http.response.status_code"] = status
+            if status >= 500 and span.error is None:
+                span.error = f"HTTP {status}"
+            self.tracer.end(span)
+
+
+class TracedQueuePool(QueuePool):
+    """QueuePool со span на выдачу соединения: ожидание свободного соединения и подключение к БД"""
+
+    def _do_get(self):
+        if _current.get() is None:
+            return super()._do_get()
+        span = tracer.start_span("db.checkout", **{"db.pool.size": self.size(), "db.pool.checked_out": self.checkedout()})
+        with tracer.activate(span):
+            return super()._do_get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is None:
+        return
+    # Имя span - операция (SELECT, INSERT, ...), текст запроса - в атрибуте
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+    span = tracer.start_span(operation, CLIENT, **{"db.system": "postgresql", "db.statement": statement[:MAX_STATEMENT]})
+    conn.info.setdefault("trace_spans", []).append(span)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    if spans:
+        span = spans.pop()
+        span.attributes["db.rowcount"] = cursor.rowcount
+        tracer.end(span)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    spans = context.connection.info.get("trace_spans") if context.connection is not None else None
+    if spans:
+        span = spans.pop()
+        span.record_error(context.original_exception)
+        tracer.end(span)
@@ -0,0 +1,119 @@
+"""
+Прогрев при старте: соединения пула и ответы самых больших секций
+"""
+import logging
+import threading
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import crud, models
+from .cache import section_cache
+from .core.config import settings
+from .database import SessionLocal, engine, replica_router
+from .formats import render_questions
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """Флаг готовности приложения принимать трафик"""
+
+    def __init__(self):
+        self._ready = threading.Event()
+        self.error = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def mark_ready(self):
+        self.error = None
+        self._ready.set()
+
+    def reset(self):
+        self._ready.clear()
+
+
+readiness = Readiness()
+
+# Остановка повторов прогрева при завершении процесса
+_stop = threading.Event()
+
+
+def warm_pool(db_engine):
+    """Открыть pool_size соединений одновременно, чтобы они остались в пуле"""
+    size = db_engine.pool.size() if hasattr(db_engine.pool, "size") else 1
+    connections = []
+    try:
+        for _ in range(size):
+            connection = db_engine.connect()
+            connection.exec_driver_sql("SELECT 1")
+            connections.append(connection)
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def warm_sections(limit: int) -> int:
+    """Заполнить кэш ответами секций с наибольшим числом вопросов"""
+    if limit <= 0:
+        return 0
+    # Сброс секции между чтением и set не оставит в кэше устаревший ответ
+    token = section_cache.fill_token()
+    db = SessionLocal()
+    try:
+        section_ids = [
+            section_id
+            for section_id, _ in db.query(models.Question.section_id, func.count(models.Question.id))
+            .group_by(models.Question.section_id)
+            .order_by(func.count(models.Question.id).desc())
+            .limit(limit)
+        ]
+        for section_id, questions in crud.get_questions_by_sections(db, section_ids).items():
+            section_cache.set(section_id, render_questions(questions), token=token)
+        return len(section_ids)
+    finally:
+        db.close()
+
+
+def run_warmup(backoff: float = 1.0, max_backoff: float = 30.0, stop: Optional[threading.Event] = None) -> bool:
+    """Прогреть пулы и кэш; пока БД недоступна - повторять с экспоненциальной паузой
+    не длиннее max_backoff, пока прогрев не удастся или не будет вызван stop
+
+    Короткий сбой БД при выкатке не должен навсегда оставить воркер вне балансировки.
+    """
+    stop = stop or _stop
+    attempt = 0
+    while not stop.is_set():
+        try:
+            warm_pool(engine)
+            # Недоступная или отстающая реплика не блокирует готовность: чтение уйдет на primary
+            replica_router.check_health()
+            warmed = warm_sections(settings.WARMUP_SECTIONS)
+        except SQLAlchemyError as exc:
+            readiness.error = str(exc)
+            delay = min(max_backoff, backoff * 2 ** attempt)
+            attempt += 1
+            logger.warning("Прогрев не удался (попытка %s), повтор через %.1f с: %s", attempt, delay, exc)
+            stop.wait(delay)
+        else:
+            logger.info("Прогрев завершен: секций в кэше %s", warmed)
+            readiness.mark_ready()
+            return True
+    return False
+
+
+def start_warmup() -> threading.Thread:
+    """Запустить прогрев в фоне: liveness доступен сразу, readiness - после прогрева"""
+    readiness.reset()
+    _stop.clear()
+    thread = threading.Thread(target=run_warmup, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def stop_warmup():
+    """Прекратить повторы прогрева (завершение воркера)"""
+    _stop.set()
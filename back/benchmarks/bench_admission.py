@@ -0,0 +1,98 @@
+"""
+Задержка чтения во время массовых записей: проверка контроля допуска
+
+Параллельно шлет крупные POST /tests/ и GET /sections/, /sections/{id}/tests/
+и печатает p50/p99 чтений и распределение статусов (429/503 - отказы допуска).
+Сравните запуск с настройками по умолчанию и с WRITE_CONCURRENCY=1000
+(фактически без ограничения записей).
+
+Запуск (backend поднят, например uvicorn app.main:app):
+    poetry run python benchmarks/bench_admission.py --backend http://localhost:8000 --section 1
+"""
+import argparse
+import collections
+import json
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+import http.client
+
+
+def run(base_url: str, method: str, paths, body: bytes, duration: float, clients: int):
+    """Нагрузить base_url; вернуть (задержки мс, счетчик статусов)"""
+    parts = urlsplit(base_url)
+    latencies = []
+    statuses = collections.Counter()
+    lock = threading.Lock()
+
+    def worker():
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=120)
+        local_latencies, local_statuses = [], collections.Counter()
+        done = 0
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                conn.request(method, paths[done % len(paths)], body=body,
+                             headers={"Content-Type": "application/json"} if body else {})
+                response = conn.getresponse()
+                response.read()
+            except OSError:
+                local_statuses["error"] += 1
+                conn.close()
+                continue
+            finally:
+                done += 1
+            local_latencies.append((time.perf_counter() - started) * 1000)
+            local_statuses[response.status] += 1
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    return threads, latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", default="http://localhost:8000")
+    parser.add_argument("--section", type=int, action="append", default=[])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--batch", type=int, default=500, help="тестов в одном POST")
+    parser.add_argument("--duration", type=float, default=20.0)
+    args = parser.parse_args()
+
+    body = json.dumps([
+        {"section": f"bench-admission-{i % 10}", "question": f"Question {i}?",
+         "answers": ["a", "b", "c", "d"], "correct": i % 4}
+        for i in range(args.batch)
+    ]).encode()
+    read_paths = ["/sections/"] + [f"/sections/{s}/tests/" for s in args.section]
+
+    # Секции создаются заранее: параллельные первые записи в новую секцию конфликтуют
+    parts = urlsplit(args.backend)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=120)
+    conn.request("POST", "/tests/", body=json.dumps([
+        {"section": f"bench-admission-{i}", "question": "Warmup?", "answers": ["a"], "correct": 0}
+        for i in range(10)
+    ]), headers={"Content-Type": "application/json"})
+    conn.getresponse().read()
+    conn.close()
+
+    writers, _, write_statuses = run(args.backend, "POST", ["/tests/"], body, args.duration, args.writers)
+    readers, read_latencies, read_statuses = run(args.backend, "GET", read_paths, b"", args.duration, args.readers)
+    for thread in writers + readers:
+        thread.join()
+
+    read_latencies.sort()
+    print(f"чтение: {len(read_latencies)} запросов  p50={statistics.median(read_latencies):8.1f} ms  "
+          f"p99={read_latencies[int(len(read_latencies) * 0.99)]:8.1f} ms  статусы={dict(read_statuses)}")
+    print(f"запись: статусы={dict(write_statuses)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Бенчмарк хранения ответов: таблица answers против JSONB в строке вопроса
+
+Пишет одинаковую секцию в обоих режимах (ANSWER_STORAGE) в БД из DATABASE_URL,
+меряет время записи и чтения (запросы + сериализация), затем удаляет данные.
+
+Запуск (из каталога back, после alembic upgrade head):
+    poetry run python benchmarks/bench_answer_storage.py --questions 2000 --answers 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import crud, models  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.formats import render_questions  # noqa: E402
+
+
+def write_section(db, name: str, storage: str, questions: int, answers: int) -> tuple:
+    started = time.perf_counter()
+    section = models.Section(name=name)
+    db.add(section)
+    db.flush()
+    db.add_all(
+        crud.build_question(
+            f"Question number {i}: which of the following is correct?",
+            section.id,
+            [f"Answer option {j}" for j in range(answers)],
+            i % answers,
+            storage,
+        )
+        for i in range(questions)
+    )
+    db.commit()
+    return section.id, (time.perf_counter() - started) * 1000
+
+
+def read_section(section_id: int, runs: int) -> float:
+    started = time.perf_counter()
+    for _ in range(runs):
+        # Новая сессия на каждый прогон: без identity map, как в запросе API
+        db = SessionLocal()
+        try:
+            render_questions(crud.get_questions_by_sections(db, [section_id])[section_id])
+        finally:
+            db.close()
+    return (time.perf_counter() - started) / runs * 1000
+
+
+def cleanup(db, section_ids):
+    question_ids = db.query(models.Question.id).filter(models.Question.section_id.in_(section_ids))
+    db.query(models.Answer).filter(models.Answer.question_id.in_(question_ids)).delete(synchronize_session=False)
+    db.query(models.Question).filter(models.Question.section_id.in_(section_ids)).delete(synchronize_session=False)
+    db.query(models.Section).filter(models.Section.id.in_(section_ids)).delete(synchronize_session=False)
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--answers", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    section_ids = []
+    try:
+        for storage in ("normalized", "jsonb"):
+            section_id, write_ms = write_section(
+                db, f"bench-answer-storage-{storage}-{os.getpid()}", storage, args.questions, args.answers
+            )
+            section_ids.append(section_id)
+            read_ms = read_section(section_id, args.runs)
+            print(f"{storage:10s} write={write_ms:9.1f} ms  read={read_ms:7.2f} ms")
+    finally:
+        cleanup(db, section_ids)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
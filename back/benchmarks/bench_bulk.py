@@ -0,0 +1,133 @@
+"""
+Замена и удаление секции целиком: set-based запросы (app/bulk.py) против построчной работы через ORM
+
+Создает секцию из --questions вопросов и меряет:
+- ORM: каждому вопросу новый текст, удаление и вставка его ответов по одному;
+- bulk.replace_questions: тот же результат одним UPDATE и двумя запросами по ответам;
+- импорт с заменой (ingest, replace=True): прежние вопросы удаляются, новые пишутся через COPY;
+- удаление секции: один DELETE (каскад) против удаления ответов, вопросов и секции через ORM.
+Пишет в БД из DATABASE_URL и удаляет свои секции после замера.
+
+Запуск (из каталога back, после alembic upgrade head):
+    poetry run python benchmarks/bench_bulk.py --questions 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import bulk, crud, models, schemas  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.ingest import ingest  # noqa: E402
+
+
+def make_tests(section: str, questions: int, answers: int, version: int):
+    return [
+        schemas.TestPayload(
+            section=section,
+            question=f"Question {i} v{version}: which of the following is correct?",
+            answers=[f"Answer option {j} v{version}" for j in range(answers)],
+            correct=i % answers,
+        )
+        for i in range(questions)
+    ]
+
+
+def create_section(db, name: str, questions: int, answers: int, storage: str) -> int:
+    ingest(db, make_tests(name, questions, answers, 0), storage)
+    return db.query(models.Section.id).filter(models.Section.name == name).scalar()
+
+
+def orm_replace(db, section_id: int, answers: int, storage: str):
+    questions = db.query(models.Question).filter(models.Question.section_id == section_id).all()
+    for i, question in enumerate(questions):
+        question.text = f"Question {i} v1: which of the following is correct?"
+        texts = [f"Answer option {j} v1" for j in range(answers)]
+        if storage == "jsonb":
+            question.answers_data, question.correct_index = texts, i % answers
+            question.answer_ids = text(crud.ALLOCATE_ANSWER_IDS_SQL.format(count=answers))
+            continue
+        for answer in list(question.answers):
+            db.delete(answer)
+        db.add_all(models.Answer(text=text, is_correct=j == i % answers, question_id=question.id)
+                   for j, text in enumerate(texts))
+    db.commit()
+
+
+def orm_delete(db, section_id: int):
+    for question in db.query(models.Question).filter(models.Question.section_id == section_id):
+        for answer in question.answers:
+            db.delete(answer)
+        db.delete(question)
+    db.flush()
+    db.delete(db.get(models.Section, section_id))
+    db.commit()
+
+
+def bulk_replace(db, section_id: int, answers: int, storage: str):
+    question_ids = [row[0] for row in db.query(models.Question.id).filter(models.Question.section_id == section_id)]
+    questions = [
+        schemas.QuestionReplace(
+            id=question_id,
+            question=f"Question {i} v1: which of the following is correct?",
+            answers=[f"Answer option {j} v1" for j in range(answers)],
+            correct=i % answers,
+        )
+        for i, question_id in enumerate(question_ids)
+    ]
+    bulk.replace_questions(db, questions, storage)
+    db.commit()
+
+
+def timed(function) -> float:
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=10_000)
+    parser.add_argument("--answers", type=int, default=4)
+    parser.add_argument("--storage", choices=("normalized", "jsonb", "interned"), default="normalized")
+    args = parser.parse_args()
+
+    name = f"bench-bulk-{os.getpid()}"
+    db = SessionLocal()
+    results = {}
+    try:
+        section_id = create_section(db, name, args.questions, args.answers, args.storage)
+        results["замена: ORM по вопросу"] = timed(lambda: orm_replace(db, section_id, args.answers, args.storage))
+        db.expunge_all()
+        results["замена: bulk.replace_questions"] = timed(
+            lambda: bulk_replace(db, section_id, args.answers, args.storage)
+        )
+        results["замена: импорт replace=True"] = timed(
+            lambda: ingest(db, make_tests(name, args.questions, args.answers, 2), args.storage, replace=True)
+        )
+        db.expunge_all()
+        results["удаление: ORM по строке"] = timed(lambda: orm_delete(db, section_id))
+
+        section_id = create_section(db, name, args.questions, args.answers, args.storage)
+
+        def delete_section():
+            bulk.delete_sections(db, [section_id])
+            db.commit()
+        results["удаление: один DELETE с каскадом"] = timed(delete_section)
+    finally:
+        db.rollback()
+        db.query(models.Section).filter(models.Section.name == name).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+    print(f"секция из {args.questions} вопросов по {args.answers} ответа, хранение {args.storage}")
+    for label, seconds in results.items():
+        print(f"{label:<36} {seconds * 1000:10.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
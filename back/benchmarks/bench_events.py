@@ -0,0 +1,75 @@
+"""
+Задержка доставки событий секций: COMMIT с NOTIFY -> кадр в очереди каждого подписчика
+
+Поднимает EventBroadcaster на БД из DATABASE_URL, подписывает --subscribers
+клиентов и делает --events записей. Для сравнения печатает размер события и
+размер полного списка /sections/, который клиент перечитывал бы без событий.
+
+Запуск (из каталога back):
+    poetry run python benchmarks/bench_events.py --subscribers 1000 --events 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import models, schemas  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.events import EventBroadcaster, notify_sections_changed  # noqa: E402
+
+SECTION_NAME = "bench-events"
+
+
+async def run(subscribers: int, events: int):
+    broadcaster = EventBroadcaster(engine, max_subscribers=subscribers)
+    broadcaster.start()
+    if not broadcaster.wait_listening(10):
+        raise SystemExit("LISTEN не запустился, проверьте DATABASE_URL")
+    subscriptions = [broadcaster.subscribe() for _ in range(subscribers)]
+
+    db = SessionLocal()
+    section = db.query(models.Section).filter_by(name=SECTION_NAME).first()
+    if section is None:
+        section = models.Section(name=SECTION_NAME)
+        db.add(section)
+        db.commit()
+
+    latencies = []
+    frame = b""
+    try:
+        for _ in range(events):
+            notify_sections_changed(db, [section.id])
+            started = time.perf_counter()
+            db.commit()
+            # Последний подписчик получает кадр позже всех
+            for subscription in subscriptions:
+                frame = await asyncio.wait_for(subscription.queue.get(), 10)
+            latencies.append((time.perf_counter() - started) * 1000)
+        all_sections = db.query(models.Section).order_by(models.Section.id).limit(100).all()
+        list_size = len(json.dumps([schemas.SectionInfo.model_validate(s).model_dump(mode="json") for s in all_sections]))
+    finally:
+        db.close()
+        broadcaster.stop()
+
+    latencies.sort()
+    print(f"подписчиков: {subscribers}, событий: {events}")
+    print(f"доставка всем: p50 {statistics.median(latencies):.2f} мс, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.2f} мс")
+    print(f"размер события: {len(frame)} байт, полный список /sections/: {list_size} байт")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.subscribers, args.events))
+
+
+if __name__ == "__main__":
+    main()
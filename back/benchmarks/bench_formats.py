@@ -0,0 +1,59 @@
+"""
+Бенчмарк форматов ответа тестов секции: размер (сырой и gzip) и время разбора
+
+Запуск (из каталога back):
+    poetry run python benchmarks/bench_formats.py --questions 2000 --answers 4
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.formats import available_formats, msgpack, render_questions  # noqa: E402
+from app.schemas import Question  # noqa: E402
+
+
+def make_questions(count: int, answers: int):
+    return [
+        Question(
+            id=i,
+            text=f"Question number {i}: which of the following is correct?",
+            answers=[
+                {"id": i * answers + j, "text": f"Answer option {j}", "is_correct": j == 0}
+                for j in range(answers)
+            ],
+        )
+        for i in range(count)
+    ]
+
+
+def parse_time(payload: bytes, fmt: str, runs: int) -> float:
+    loads = msgpack.unpackb if fmt == "msgpack" else json.loads
+    started = time.perf_counter()
+    for _ in range(runs):
+        loads(payload)
+    return (time.perf_counter() - started) / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--answers", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    questions = make_questions(args.questions, args.answers)
+    for fmt in available_formats():
+        payload = render_questions(questions, fmt)
+        print(
+            f"{fmt:9s} raw={len(payload):10d} B  gzip={len(gzip.compress(payload)):9d} B  "
+            f"parse={parse_time(payload, fmt, args.runs):7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
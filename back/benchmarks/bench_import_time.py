@@ -0,0 +1,54 @@
+"""
+Бенчмарк холодного старта: время импорта модулей в новом процессе
+
+Запуск (из каталога back):
+    poetry run python benchmarks/bench_import_time.py --runs 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    "config": "from app.core.config import settings; settings.DATABASE_URL",
+    "database": "import app.database",
+    "main": "import app.main",
+}
+
+
+def measure(statement: str) -> float:
+    """Время (мс) выполнения statement в отдельном интерпретаторе"""
+    code = (
+        "import time; _t = time.perf_counter(); "
+        f"{statement}; "
+        "print((time.perf_counter() - _t) * 1000)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACK_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--target", choices=sorted(TARGETS), action="append")
+    args = parser.parse_args()
+
+    for name in args.target or sorted(TARGETS):
+        timings = [measure(TARGETS[name]) for _ in range(args.runs)]
+        print(
+            f"{name:10s} median={statistics.median(timings):8.2f} ms  "
+            f"min={min(timings):8.2f} ms  max={max(timings):8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Бенчмарк массового импорта: COPY + set-based слияние против вставки через ORM
+
+Пишет в БД из DATABASE_URL и удаляет свои секции после замера.
+
+Запуск (из каталога back, после alembic upgrade head):
+    poetry run python benchmarks/bench_ingest.py --questions 100000 --answers 4
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import crud, models  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.ingest import ingest, read_payloads  # noqa: E402
+
+
+def make_ndjson(prefix: str, questions: int, answers: int, sections: int) -> str:
+    return "".join(
+        json.dumps({
+            "section": f"{prefix}-{i % sections}",
+            "question": f"Question number {i}: which of the following is correct?",
+            "answers": [f"Answer option {j}" for j in range(answers)],
+            "correct": i % answers,
+        }) + "\n"
+        for i in range(questions)
+    )
+
+
+def orm_insert(db, payloads, storage: str):
+    sections = {}
+    for test in payloads:
+        if test.section not in sections:
+            section = models.Section(name=test.section)
+            db.add(section)
+            db.flush()
+            sections[test.section] = section.id
+        db.add(crud.build_question(test.question, sections[test.section], test.answers, test.correct, storage))
+    db.commit()
+
+
+def cleanup(db, prefix: str):
+    section_ids = db.query(models.Section.id).filter(models.Section.name.like(f"{prefix}-%"))
+    question_ids = db.query(models.Question.id).filter(models.Question.section_id.in_(section_ids))
+    db.query(models.Answer).filter(models.Answer.question_id.in_(question_ids)).delete(synchronize_session=False)
+    db.query(models.Question).filter(models.Question.section_id.in_(section_ids)).delete(synchronize_session=False)
+    db.query(models.Section).filter(models.Section.name.like(f"{prefix}-%")).delete(synchronize_session=False)
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=100_000)
+    parser.add_argument("--answers", type=int, default=4)
+    parser.add_argument("--sections", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    parser.add_argument("--storage", choices=("normalized", "jsonb"), default="normalized")
+    parser.add_argument("--skip-orm", action="store_true", help="не замерять вставку через ORM")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        for method in ("copy", "orm")[: 1 if args.skip_orm else 2]:
+            prefix = f"bench-ingest-{method}-{os.getpid()}"
+            payloads = read_payloads(io.StringIO(make_ndjson(prefix, args.questions, args.answers, args.sections)), "ndjson")
+            started = time.perf_counter()
+            try:
+                if method == "copy":
+                    ingest(db, payloads, args.storage, args.batch_size)
+                else:
+                    orm_insert(db, payloads, args.storage)
+                elapsed = time.perf_counter() - started
+            finally:
+                cleanup(db, prefix)
+            print(f"{method:5s} {args.questions} вопросов за {elapsed:7.2f} с  "
+                  f"{args.questions / elapsed:10.0f} вопросов/с  "
+                  f"{args.questions * (args.answers + 1) / elapsed:10.0f} строк/с")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
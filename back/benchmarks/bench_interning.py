@@ -0,0 +1,159 @@
+"""
+Хранение ответов с общими текстами (ANSWER_STORAGE=interned) против текста в каждой строке answers
+
+Генерирует банк вопросов, где большая часть ответов повторяется ("True", "False",
+"None of the above", числа), и импортирует его через COPY в обоих режимах. Меряет:
+- место: строки answers и индекс ix_answers_text, плюс answer_texts с уникальным
+  индексом (копии строк бенчмарка во временных таблицах, без чужих данных);
+- чтение секции (запросы + сериализация JSON): normalized, interned с холодным
+  кэшем текстов и с прогретым, и долю попаданий в кэш.
+Пишет в БД из DATABASE_URL и удаляет свои секции после замера.
+
+Запуск (из каталога back, после alembic upgrade head):
+    poetry run python benchmarks/bench_interning.py --questions 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app import crud, models, schemas  # noqa: E402
+from app.cache import AnswerTexts, answer_texts  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.formats import render_questions  # noqa: E402
+from app.ingest import ingest  # noqa: E402
+
+COMMON = ["True", "False", "None of the above", "All of the above", "Yes", "No", "Both A and B", "Neither"]
+
+
+def make_tests(prefix: str, questions: int, sections: int, shared: float):
+    rng = random.Random(1)
+    tests = []
+    for i in range(questions):
+        answers = []
+        while len(answers) < 4:
+            if rng.random() < shared:
+                # Частые ответы: распределение с длинным хвостом, как в реальных банках
+                pool = COMMON if rng.random() < 0.5 else [str(n) for n in range(200)]
+                answer = pool[min(int(rng.paretovariate(1.2)) - 1, len(pool) - 1)]
+            else:
+                answer = f"Unique answer {i}-{len(answers)}: " + "x" * rng.randrange(10, 60)
+            if answer not in answers:
+                answers.append(answer)
+        tests.append(schemas.TestPayload(
+            section=f"{prefix}-{i % sections}", question=f"Question {i}?", answers=answers, correct=i % 4,
+        ))
+    return tests
+
+
+STORAGE_SQL = {
+    "normalized": [
+        "CREATE TEMP TABLE bench_answers AS SELECT a.* FROM answers a JOIN questions q ON q.id = a.question_id "
+        "JOIN sections s ON s.id = q.section_id WHERE s.name LIKE :pattern",
+        "CREATE INDEX bench_answers_text ON bench_answers (text)",
+    ],
+    "interned": [
+        "CREATE TEMP TABLE bench_answers AS SELECT a.* FROM answers a JOIN questions q ON q.id = a.question_id "
+        "JOIN sections s ON s.id = q.section_id WHERE s.name LIKE :pattern",
+        "CREATE INDEX bench_answers_text ON bench_answers (text) WHERE text IS NOT NULL",
+        "CREATE TEMP TABLE bench_texts AS SELECT * FROM answer_texts WHERE id IN (SELECT text_id FROM bench_answers)",
+        "CREATE UNIQUE INDEX ON bench_texts (text)",
+    ],
+}
+
+
+def storage_bytes(db, storage: str, pattern: str) -> dict:
+    """Размеры таблиц и индексов только со строками бенчмарка"""
+    for statement in STORAGE_SQL[storage]:
+        db.execute(text(statement), {"pattern": pattern})
+
+    def size(function: str, relation: str) -> int:
+        return db.execute(text(f"SELECT {function}(:relation)"), {"relation": relation}).scalar()
+
+    sizes = {
+        "answers": size("pg_relation_size", "bench_answers"),
+        "ix_answers_text": size("pg_relation_size", "bench_answers_text"),
+        "answer_texts": size("pg_total_relation_size", "bench_texts") if storage == "interned" else 0,
+    }
+    db.execute(text("DROP TABLE bench_answers"))
+    if storage == "interned":
+        db.execute(text("DROP TABLE bench_texts"))
+    return sizes
+
+
+def read_latency(section_id: int, runs: int, cold: bool) -> float:
+    latencies = []
+    for _ in range(runs):
+        if cold:
+            answer_texts.clear()
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            render_questions(crud.get_questions_by_sections(db, [section_id])[section_id])
+            latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            db.close()
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=100_000)
+    parser.add_argument("--sections", type=int, default=100)
+    parser.add_argument("--shared", type=float, default=0.7, help="доля повторяющихся ответов")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    prefixes = []
+    try:
+        sizes, reads, section_ids = {}, {}, {}
+        for storage in ("normalized", "interned"):
+            prefix = f"bench-interning-{storage}-{os.getpid()}"
+            prefixes.append(prefix)
+            tests = make_tests(prefix, args.questions, args.sections, args.shared)
+            started = time.perf_counter()
+            ingest(db, tests, storage)
+            print(f"{storage:10s} импорт {args.questions} вопросов: {time.perf_counter() - started:6.2f} с")
+            sizes[storage] = storage_bytes(db, storage, f"{prefix}-%")
+            db.commit()
+            section_ids[storage] = db.query(models.Section.id).filter(models.Section.name == f"{prefix}-0").scalar()
+
+        distinct = db.execute(text(
+            "SELECT count(DISTINCT text_id) FROM answers a JOIN questions q ON q.id = a.question_id "
+            "JOIN sections s ON s.id = q.section_id WHERE s.name LIKE :pattern"
+        ), {"pattern": f"{prefixes[1]}-%"}).scalar()
+        print(f"ответов: {args.questions * 4}, уникальных текстов: {distinct}")
+        for storage, parts in sizes.items():
+            details = ", ".join(f"{name} {value / 2**20:.1f}" for name, value in parts.items())
+            print(f"{storage:10s} место: {sum(parts.values()) / 2**20:7.1f} МБ ({details})")
+
+        reads["normalized"] = read_latency(section_ids["normalized"], args.runs, cold=False)
+        reads["interned, холодный кэш"] = read_latency(section_ids["interned"], args.runs, cold=True)
+        answer_texts.__init__(answer_texts.max_texts)
+        reads["interned, прогретый кэш"] = read_latency(section_ids["interned"], args.runs, cold=False)
+        hit_rate = answer_texts.stats()["hit_rate"]
+        for label, ms in reads.items():
+            print(f"чтение секции ({args.questions // args.sections} вопросов), {label:<24} p50 {ms:7.2f} мс")
+        print(f"попадания в кэш текстов при прогретом кэше: {hit_rate:.1%}")
+
+        # Кэш на весь банк: сколько текстов нужно держать, чтобы читать без промахов
+        whole = AnswerTexts(max_texts=distinct)
+        whole.texts(db, [row[0] for row in db.execute(text("SELECT id FROM answer_texts"))])
+        print(f"кэш всех текстов банка: {whole.stats()['texts']} текстов")
+    finally:
+        db.rollback()
+        for prefix in prefixes:
+            db.query(models.Section).filter(models.Section.name.like(f"{prefix}-%")).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Рейтинг секции в памяти: построение, обновление очков, место ученика и топ
+
+Строит Leaderboard из --entries отсортированных строк (как при старте воркера),
+затем меряет на случайных учениках прибавку очков (удаление + вставка в skip
+list), место ученика и топ --top. Память - tracemalloc на первых 100k строках
+(под tracemalloc построение в разы медленнее). БД не нужна.
+
+Запуск (из каталога back):
+    poetry run python benchmarks/bench_leaderboard.py --entries 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.leaderboard import Leaderboard  # noqa: E402
+
+
+def percentiles(latencies):
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99)]
+
+
+def measure(operation, operations: int):
+    latencies = []
+    for _ in range(operations):
+        started = time.perf_counter()
+        operation()
+        latencies.append((time.perf_counter() - started) * 1e6)
+    return percentiles(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--operations", type=int, default=100_000)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    rows = sorted(
+        ((f"learner-{i}", rng.randint(0, 1000), rng.uniform(0, 1e6)) for i in range(args.entries)),
+        key=lambda row: (-row[1], row[2], row[0]),
+    )
+    started = time.perf_counter()
+    board = Leaderboard(rows)
+    built = time.perf_counter() - started
+    sample = rows[:100_000]
+    tracemalloc.start()
+    sample_board = Leaderboard(sample)
+    per_entry = tracemalloc.get_traced_memory()[0] / len(sample)
+    tracemalloc.stop()
+    del rows, sample, sample_board
+
+    learners = list(board.entries)
+    clock = [2e6]
+
+    def add_point():
+        learner_id = learners[rng.randrange(len(learners))]
+        clock[0] += 1
+        board.set(learner_id, board.entries[learner_id][0] + 1, clock[0])
+
+    update = measure(add_point, args.operations)
+    rank = measure(lambda: board.rank(learners[rng.randrange(len(learners))]), args.operations)
+    top = measure(lambda: board.top(0, args.top), args.operations)
+    page = measure(lambda: board.top(rng.randrange(len(learners)), args.top), args.operations)
+
+    print(f"учеников в рейтинге: {args.entries}")
+    print(f"построение из снимка: {built:.2f} с, память ~{per_entry * args.entries / 2**20:.0f} МБ "
+          f"({per_entry:.0f} байт на ученика)")
+    for name, (p50, p99) in (("прибавка очков", update), ("место ученика", rank),
+                             (f"топ-{args.top}", top), (f"страница {args.top} с случайного места", page)):
+        print(f"{name:<34} p50 {p50:7.1f} мкс, p99 {p99:7.1f} мкс")
+
+
+if __name__ == "__main__":
+    main()
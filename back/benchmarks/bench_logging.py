@@ -0,0 +1,92 @@
+"""
+Цена записи в лог в потоке запроса: синхронный StreamHandler против очереди (app/logs.py)
+
+Пишет --records записей access log в файл во временном каталоге и меряет
+время вызова logger.info в вызывающем потоке (p50/p99/max). --stall имитирует
+медленный диск: каждая сотая запись ждет указанное число миллисекунд.
+С очередью ожидание достается потоку вывода, а не запросу.
+
+Запуск (из каталога back):
+    poetry run python benchmarks/bench_logging.py --records 50000 --stall 5
+"""
+import argparse
+import logging
+import os
+import queue
+import statistics
+import sys
+import tempfile
+import time
+from logging.handlers import QueueListener
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.logs import ContextQueueHandler, JsonFormatter, RequestLog, _request  # noqa: E402
+
+
+class SlowFileHandler(logging.FileHandler):
+    def __init__(self, path: str, stall_ms: float):
+        super().__init__(path)
+        self.stall = stall_ms / 1000
+        self.count = 0
+
+    def emit(self, record):
+        super().emit(record)
+        self.count += 1
+        if self.stall and self.count % 100 == 0:
+            time.sleep(self.stall)
+
+
+def measure(handler: logging.Handler, records: int) -> list:
+    logger = logging.getLogger(f"bench.{id(handler)}")
+    logger.addHandler(handler)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    token = _request.set(RequestLog("4bf92f3577b34da6a3ce929d0e0e4736", "GET", "/sections/1/tests/"))
+    latencies = []
+    try:
+        for i in range(records):
+            started = time.perf_counter()
+            logger.info("%s %s %d %.1f ms", "GET", "/sections/1/tests/", 200, 3.2,
+                        extra={"status": 200, "latency_ms": 3.2, "db_queries": 2, "db_ms": 1.1})
+            latencies.append((time.perf_counter() - started) * 1e6)
+    finally:
+        _request.reset(token)
+        logger.removeHandler(handler)
+    return latencies
+
+
+def report(label: str, latencies: list):
+    latencies.sort()
+    print(f"{label:<22} p50 {statistics.median(latencies):7.1f} мкс, "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:8.1f} мкс, max {latencies[-1] / 1000:7.2f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=50_000)
+    parser.add_argument("--stall", type=float, default=5.0, help="задержка каждой сотой записи, мс")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        direct = SlowFileHandler(os.path.join(directory, "direct.log"), args.stall)
+        direct.setFormatter(JsonFormatter())
+        report("синхронно", measure(direct, args.records))
+        direct.close()
+
+        output = SlowFileHandler(os.path.join(directory, "queued.log"), args.stall)
+        output.setFormatter(JsonFormatter())
+        handler = ContextQueueHandler(queue.Queue(maxsize=args.records))
+        listener = QueueListener(handler.queue, output)
+        listener.start()
+        latencies = measure(handler, args.records)
+        started = time.perf_counter()
+        listener.stop()
+        report("через очередь", latencies)
+        print(f"поток вывода дописывал очередь еще {time.perf_counter() - started:.2f} с, "
+              f"отброшено {handler.dropped}")
+        output.close()
+
+
+if __name__ == "__main__":
+    main()
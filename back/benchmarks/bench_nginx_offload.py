@@ -0,0 +1,73 @@
+"""
+Нагрузочный тест микрокэша nginx: какая доля GET-запросов не дошла до backend
+
+Считает статусы X-Cache-Status (HIT/MISS/EXPIRED/STALE/UPDATING/BYPASS)
+и пропускную способность через nginx и напрямую в backend.
+
+Запуск (стек из docker-compose.prod.yml поднят, в БД есть секции):
+    poetry run python benchmarks/bench_nginx_offload.py \
+        --nginx http://localhost --backend http://localhost:8000 --section 1
+"""
+import argparse
+import collections
+import threading
+import time
+from urllib.parse import urlsplit
+import http.client
+
+
+def load(base_url: str, paths, duration: float, clients: int):
+    """Нагрузить base_url по кругу путями paths; вернуть (req/s, счетчик статусов кэша)"""
+    parts = urlsplit(base_url)
+    statuses = collections.Counter()
+    total = [0]
+    lock = threading.Lock()
+
+    def worker():
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+        local = collections.Counter()
+        done = 0
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            conn.request("GET", paths[done % len(paths)], headers={"Accept-Encoding": "gzip"})
+            response = conn.getresponse()
+            response.read()
+            local[response.getheader("X-Cache-Status", "-")] += 1
+            done += 1
+        with lock:
+            statuses.update(local)
+            total[0] += done
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return total[0] / duration, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nginx", default="http://localhost")
+    parser.add_argument("--backend", default="http://localhost:8000")
+    parser.add_argument("--section", type=int, action="append", default=[])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15.0)
+    args = parser.parse_args()
+
+    paths = ["/api/sections/"] + [f"/api/sections/{s}/tests/" for s in args.section]
+
+    rps, statuses = load(args.nginx, paths, args.duration, args.clients)
+    requests = sum(statuses.values())
+    served_by_nginx = statuses["HIT"] + statuses["STALE"] + statuses["UPDATING"]
+    print(f"nginx:   {rps:10.1f} req/s")
+    for status, count in statuses.most_common():
+        print(f"  {status:10s} {count:8d} ({count / requests:6.1%})")
+    print(f"  разгрузка backend: {served_by_nginx / requests:6.1%}")
+
+    backend_rps, _ = load(args.backend, paths, args.duration, args.clients)
+    print(f"backend: {backend_rps:10.1f} req/s (напрямую, без кэша)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Бенчмарк hash-секционирования answers: задержка чтения и обслуживание
+
+Создает в БД из DATABASE_URL две временные таблицы той же структуры, что answers:
+обычную и секционированную по question_id, заполняет их generate_series и меряет
+чтение ответов случайного вопроса, VACUUM после обновления части строк и REINDEX.
+Таблицы удаляются после замера.
+
+Запуск (из каталога back); полный замер - 100M строк, нужен запас диска ~30 ГБ:
+    poetry run python benchmarks/bench_partitions.py --rows 1000000 --partitions 16
+    poetry run python benchmarks/bench_partitions.py --rows 100000000 --partitions 32
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import engine  # noqa: E402
+
+TABLES = {"plain": "bench_answers_plain", "hash": "bench_answers_hash"}
+
+
+def create(connection, table: str, partitions: int):
+    if partitions:
+        connection.exec_driver_sql(
+            f"CREATE TABLE {table} (id integer NOT NULL, text varchar, is_correct boolean, "
+            f"question_id integer) PARTITION BY HASH (question_id)"
+        )
+        for remainder in range(partitions):
+            connection.exec_driver_sql(
+                f"CREATE TABLE {table}_p{remainder} PARTITION OF {table} "
+                f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+            )
+    else:
+        connection.exec_driver_sql(
+            f"CREATE TABLE {table} (id integer NOT NULL, text varchar, is_correct boolean, question_id integer)"
+        )
+
+
+def fill(connection, table: str, rows: int, answers: int, chunk: int = 5_000_000):
+    for start in range(0, rows, chunk):
+        connection.exec_driver_sql(
+            f"INSERT INTO {table} SELECT n, 'Answer option ' || mod(n, {answers}), mod(n, {answers}) = 0, n / {answers} "
+            f"FROM generate_series({start}, {min(start + chunk, rows) - 1}) n"
+        )
+
+
+def timed(connection, sql: str) -> float:
+    started = time.perf_counter()
+    connection.exec_driver_sql(sql)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--answers", type=int, default=4, help="ответов на вопрос")
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--update-share", type=float, default=0.05, help="доля строк, обновляемых перед VACUUM")
+    args = parser.parse_args()
+
+    questions = args.rows // args.answers
+    sample = [random.randrange(questions) for _ in range(args.queries)]
+    # Без транзакции: VACUUM нельзя выполнять внутри нее
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        try:
+            for kind, table in TABLES.items():
+                connection.exec_driver_sql(f"DROP TABLE IF EXISTS {table}")
+                create(connection, table, args.partitions if kind == "hash" else 0)
+                started = time.perf_counter()
+                fill(connection, table, args.rows, args.answers)
+                load = time.perf_counter() - started
+                index = timed(connection, f"CREATE INDEX ON {table} (question_id)")
+                connection.exec_driver_sql(f"VACUUM ANALYZE {table}")
+
+                latencies = []
+                for question_id in sample:
+                    started = time.perf_counter()
+                    connection.exec_driver_sql(
+                        f"SELECT id, text, is_correct FROM {table} WHERE question_id = %(q)s", {"q": question_id}
+                    ).all()
+                    latencies.append((time.perf_counter() - started) * 1000)
+                latencies.sort()
+
+                connection.exec_driver_sql(
+                    f"UPDATE {table} SET is_correct = NOT is_correct WHERE mod(id, 1000) < {int(args.update_share * 1000)}"
+                )
+                vacuum = timed(connection, f"VACUUM {table}")
+                reindex = timed(connection, f"REINDEX TABLE {table}")
+                size = connection.exec_driver_sql(
+                    f"SELECT pg_size_pretty(coalesce(sum(pg_total_relation_size(relid)), "
+                    f"pg_total_relation_size('{table}'))) FROM pg_partition_tree('{table}')"
+                ).scalar()
+                print(
+                    f"{kind:5s} load={load:7.1f} s  index={index:6.1f} s  "
+                    f"read p50={statistics.median(latencies):6.3f} ms p99={latencies[int(len(latencies) * 0.99)]:6.3f} ms  "
+                    f"vacuum={vacuum:6.2f} s  reindex={reindex:6.2f} s  size={size}"
+                )
+        finally:
+            for table in TABLES.values():
+                connection.exec_driver_sql(f"DROP TABLE IF EXISTS {table}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Статическая публикация секций: цена публикации и цена чтения против пути через API
+
+Создает --sections секций по --questions вопросов в БД из DATABASE_URL и
+публикует их во временный каталог. Меряет полную публикацию, инкрементальную
+(изменилась одна секция) и сравнивает чтение опубликованного файла с тем, что
+делает API при промахе кэша (запросы + сериализация + gzip). Данные удаляются.
+
+Запуск (из каталога back, после alembic upgrade head):
+    poetry run python benchmarks/bench_publish.py --sections 200 --questions 200
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import crud, models  # noqa: E402
+from app.compression import compress  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.formats import render_questions  # noqa: E402
+from app.publish import publish_sections  # noqa: E402
+from bench_answer_storage import cleanup  # noqa: E402
+
+
+def create_sections(db, count: int, questions: int):
+    section_ids = []
+    for s in range(count):
+        section = models.Section(name=f"bench-publish-{s}")
+        db.add(section)
+        db.flush()
+        db.add_all(
+            crud.build_question(f"Question {i} of section {s}?", section.id,
+                                [f"Answer {j}" for j in range(4)], i % 4, "jsonb")
+            for i in range(questions)
+        )
+        section_ids.append(section.id)
+    db.commit()
+    return section_ids
+
+
+def timed(function, runs: int = 1) -> float:
+    started = time.perf_counter()
+    for _ in range(runs):
+        function()
+    return (time.perf_counter() - started) / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sections", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    root = tempfile.mkdtemp(prefix="bench-publish-")
+    section_ids = create_sections(db, args.sections, args.questions)
+    try:
+        full = timed(lambda: publish_sections(db, section_ids, root))
+        unchanged = timed(lambda: publish_sections(db, section_ids[:1], root), args.runs)
+
+        def change_and_publish():
+            db.add(crud.build_question("Changed?", section_ids[0], ["a", "b"], 0, "jsonb"))
+            db.commit()
+            publish_sections(db, section_ids[:1], root)
+        incremental = timed(change_and_publish, args.runs)
+
+        def api_miss():
+            session = SessionLocal()
+            try:
+                payload = render_questions(crud.get_questions_by_sections(session, section_ids[1:2])[section_ids[1]])
+                compress(payload, "gzip")
+            finally:
+                session.close()
+        api = timed(api_miss, args.runs)
+
+        published = os.path.join(root, "sections", str(section_ids[1]), "tests", "index.json.gz")
+
+        def read_static():
+            with open(published, "rb") as static_file:
+                static_file.read()
+        static = timed(read_static, args.runs * 100)
+        size = os.path.getsize(published)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        cleanup(db, section_ids)
+        db.close()
+
+    print(f"секций: {args.sections} x {args.questions} вопросов")
+    print(f"полная публикация:          {full:9.1f} мс ({full / args.sections:.2f} мс на секцию)")
+    print(f"публикация без изменений:   {unchanged:9.2f} мс")
+    print(f"запись + публикация секции: {incremental:9.2f} мс")
+    print(f"промах кэша API (gzip):     {api:9.2f} мс на запрос")
+    print(f"чтение опубликованного .gz: {static:9.3f} мс на запрос ({size} байт)")
+
+
+if __name__ == "__main__":
+    main()
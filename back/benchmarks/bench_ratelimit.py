@@ -0,0 +1,73 @@
+"""
+Накладные расходы ограничения частоты на запрос
+
+Прогоняет RateLimitMiddleware с пустым приложением и сравнивает со временем
+без middleware. --backend postgres меряет общую таблицу (нужна БД из DATABASE_URL).
+
+Запуск (из каталога back):
+    poetry run python benchmarks/bench_ratelimit.py --requests 200000 --clients 50000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ratelimit import MemoryBuckets, RateLimiter, RateLimitMiddleware, parse_rules  # noqa: E402
+
+RULES = "POST /admin/*=1/s:5; POST /tests/=5/s:20; GET /sections/*=20/s:60; *=50/s:100"
+
+
+async def noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+
+
+async def noop_send(message):
+    pass
+
+
+async def run(app, requests: int, clients: int) -> float:
+    scopes = [
+        {
+            "type": "http", "method": "GET", "path": f"/sections/{i % 100}/tests/",
+            "headers": [
+                (b"host", b"localhost"),
+                (b"accept-encoding", b"gzip"),
+                (b"x-real-ip", f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}".encode()),
+            ],
+            "client": ("127.0.0.1", 5000),
+        }
+        for i in range(clients)
+    ]
+    started = time.perf_counter()
+    for i in range(requests):
+        await app(scopes[i % clients], None, noop_send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--clients", type=int, default=50_000)
+    parser.add_argument("--backend", choices=("memory", "postgres"), default="memory")
+    args = parser.parse_args()
+
+    if args.backend == "postgres":
+        from app.database import engine
+        from app.ratelimit import PostgresBuckets
+        buckets = PostgresBuckets(engine)
+    else:
+        buckets = MemoryBuckets(max_keys=args.clients)
+    limiter = RateLimiter(parse_rules(RULES), buckets, client_header="x-real-ip")
+
+    baseline = asyncio.run(run(noop_app, args.requests, args.clients))
+    limited = asyncio.run(run(RateLimitMiddleware(noop_app, limiter), args.requests, args.clients))
+    print(f"без лимита: {baseline:7.2f} мкс/запрос")
+    print(f"с лимитом:  {limited:7.2f} мкс/запрос (+{limited - baseline:.2f} мкс, {args.backend}, "
+          f"клиентов {args.clients}, отказов {limiter.limited})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Планировщик повторений: память и задержка на 100k учеников, скорость пакетной записи
+
+Часть 1 (без БД): --learners очередей ReviewQueue по --history отвеченных
+вопросов в секции из --questions вопросов; память (tracemalloc) и время
+"следующая пачка + ответ" на случайных учениках.
+Часть 2 (--flush N, БД из DATABASE_URL): N учеников отвечают через Scheduler,
+меряется время Scheduler.flush() для всех накопленных изменений. Данные удаляются.
+
+Запуск (из каталога back, после alembic upgrade head):
+    poetry run python benchmarks/bench_scheduler.py --learners 100000 --flush 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import models  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.scheduler import DAY, ReviewQueue, ReviewState, Scheduler, SectionQuestions  # noqa: E402
+
+
+def bench_queues(learners: int, questions: int, history: int, operations: int):
+    now = time.time()
+    rng = random.Random(1)
+    section = SectionQuestions(range(1, questions + 1))
+    tracemalloc.start()
+    queues = []
+    for _ in range(learners):
+        states = [
+            ReviewState(question_id, rng.randint(0, 5), rng.uniform(1, 30), 2.5, now + rng.uniform(-5, 30) * DAY)
+            for question_id in rng.sample(section.ids, history)
+        ]
+        queues.append(ReviewQueue(section, states))
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    latencies = []
+    for _ in range(operations):
+        queue = queues[rng.randrange(learners)]
+        started = time.perf_counter()
+        question_ids, _ = queue.next_batch(10, now, 10)
+        queue.record(question_ids[0], rng.randint(0, 5), now)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    latencies.sort()
+    print(f"учеников: {learners}, вопросов в секции: {questions}, отвечено каждым: {history}")
+    print(f"память очередей: {memory / 2**20:.0f} МБ ({memory / learners:.0f} байт на ученика)")
+    print(f"следующая пачка + ответ: p50 {statistics.median(latencies):.1f} мкс, "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:.1f} мкс")
+
+
+def bench_flush(learners: int, questions: int):
+    db = SessionLocal()
+    section = models.Section(name="bench-scheduler")
+    db.add(section)
+    db.flush()
+    db.add_all(models.Question(text=f"Q{i}?", section_id=section.id) for i in range(questions))
+    db.commit()
+    scheduler = Scheduler(SessionLocal, flush_batch=10**9)
+    try:
+        question_ids = scheduler.next_batch("bench-0", section.id, 10)[0]
+        started = time.perf_counter()
+        for learner in range(learners):
+            scheduler.record(f"bench-{learner}", section.id, [(question_id, 4) for question_id in question_ids])
+        recorded = time.perf_counter() - started
+        started = time.perf_counter()
+        rows = scheduler.flush()
+        flushed = time.perf_counter() - started
+        print(f"ответы {learners} учеников (с загрузкой очередей из БД): {recorded:.2f} с")
+        print(f"пакетная запись {rows} строк: {flushed:.2f} с ({rows / flushed:.0f} строк/с)")
+    finally:
+        db.execute(models.review_states.delete().where(models.review_states.c.section_id == section.id))
+        db.query(models.Question).filter(models.Question.section_id == section.id).delete()
+        db.delete(section)
+        db.commit()
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--learners", type=int, default=100_000)
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--history", type=int, default=50)
+    parser.add_argument("--operations", type=int, default=100_000)
+    parser.add_argument("--flush", type=int, default=0, help="учеников для замера записи в БД")
+    args = parser.parse_args()
+    bench_queues(args.learners, args.questions, args.history, args.operations)
+    if args.flush:
+        bench_flush(args.flush, args.questions)
+
+
+if __name__ == "__main__":
+    main()
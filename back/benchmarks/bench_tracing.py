@@ -0,0 +1,105 @@
+"""
+Цена трассировки: TracingMiddleware на пустом приложении и чтение секции (SQL + сериализация)
+
+Режимы: трассировка выключена (TRACING_EXPORTER=none), включена, но запрос не
+попал в выборку, и каждый запрос сэмплирован (span пишутся в файл во временном
+каталоге фоновым потоком). Чтение секции пишет в БД из DATABASE_URL свою
+секцию и удаляет ее после замера.
+
+Запуск (из каталога back, после alembic upgrade head):
+    poetry run python benchmarks/bench_tracing.py --questions 200 --runs 500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import crud, models, schemas  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.formats import render_questions  # noqa: E402
+from app.ingest import ingest  # noqa: E402
+from app.tracing import FileSink, SpanExporter, TracingMiddleware, tracer  # noqa: E402
+
+SCOPE = {
+    "type": "http", "method": "GET", "path": "/sections/1/tests/",
+    "headers": [(b"host", b"localhost"), (b"x-request-id", b"4bf92f3577b34da6a3ce929d0e0e4736")],
+}
+
+
+async def noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+
+
+async def noop_send(message):
+    pass
+
+
+async def middleware_us(requests: int) -> float:
+    app = TracingMiddleware(noop_app, tracer)
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(SCOPE, None, noop_send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def read_ms(section_id: int, runs: int) -> float:
+    """p50 чтения секции из БД с сериализацией, внутри трассы, если она сэмплирована"""
+    latencies = []
+    db = SessionLocal()
+    try:
+        for _ in range(runs):
+            started = time.perf_counter()
+            root = tracer.start_trace("bench") if tracer.enabled else None
+            if root is None:
+                render_questions(crud.get_questions_by_sections(db, [section_id])[section_id])
+            else:
+                with tracer.activate(root):
+                    render_questions(crud.get_questions_by_sections(db, [section_id])[section_id])
+            latencies.append((time.perf_counter() - started) * 1000)
+            db.rollback()
+    finally:
+        db.close()
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+
+    name = f"bench-tracing-{os.getpid()}"
+    db = SessionLocal()
+    with tempfile.TemporaryDirectory() as directory:
+        exporter = SpanExporter(FileSink(os.path.join(directory, "traces.jsonl")), "bench", max_queue=100_000)
+        modes = {"выключена": (None, 0.0), "не в выборке": (exporter, 0.0), "каждый запрос": (exporter, 1.0)}
+        try:
+            ingest(db, [
+                schemas.TestPayload(section=name, question=f"Question {i}?", answers=["a", "b", "c", "d"], correct=0)
+                for i in range(args.questions)
+            ], "normalized")
+            section_id = db.query(models.Section.id).filter(models.Section.name == name).scalar()
+            exporter.start()
+            for label, (mode_exporter, ratio) in modes.items():
+                tracer.exporter, tracer.sample_ratio = mode_exporter, ratio
+                middleware = asyncio.run(middleware_us(args.requests))
+                read = read_ms(section_id, args.runs)
+                print(f"трассировка {label:<14} middleware {middleware:6.2f} мкс/запрос, "
+                      f"чтение секции ({args.questions} вопросов) p50 {read:6.2f} мс")
+            exporter.stop()
+            print(f"span записано: {exporter.exported}, отброшено: {exporter.dropped}")
+        finally:
+            db.rollback()
+            db.query(models.Section).filter(models.Section.name == name).delete(synchronize_session=False)
+            db.commit()
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
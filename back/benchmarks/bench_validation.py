@@ -0,0 +1,94 @@
+"""
+Проверка пакета TestPayload: TypeAdapter по всему телу против разбора и проверки по одному
+
+Генерирует --items тестов (JSON-массив и NDJSON) и меряет:
+- по одному: json.loads + TestPayload.model_validate на каждый тест (прежний read_payloads);
+- JSON-массив: TEST_PAYLOADS.validate_json по всему телу, один вызов pydantic-core
+  (сам по себе и в validate_payloads, где на время вызова отключен сборщик мусора);
+- NDJSON: TEST_PAYLOAD.validate_json построчно (первый проход validate_payloads);
+- пакет с --errors ошибками в случайных местах: сбор всех ошибок с номерами тестов.
+БД не нужна.
+
+Запуск (из каталога back):
+    poetry run python benchmarks/bench_validation.py --items 100000
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import schemas  # noqa: E402
+from app.ingest import InvalidPayloads, validate_payloads  # noqa: E402
+
+
+def make_tests(count: int):
+    rng = random.Random(1)
+    return [
+        {
+            "section": f"Section {rng.randrange(50)}",
+            "question": f"Question {i}: " + "x" * rng.randrange(20, 200),
+            "answers": [f"Answer {j} " + "y" * rng.randrange(5, 50) for j in range(4)],
+            "correct": rng.randrange(4),
+        }
+        for i in range(count)
+    ]
+
+
+def timed(function, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--errors", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    tests = make_tests(args.items)
+    body = json.dumps(tests)
+    lines = [json.dumps(test) for test in tests]
+    ndjson = "\n".join(lines) + "\n"
+
+    def one_by_one():
+        for item in json.loads(body):
+            schemas.TestPayload.model_validate(item)
+
+    results = {
+        "по одному (json.loads + model_validate)": timed(one_by_one, args.runs),
+        "JSON-массив (TypeAdapter.validate_json)": timed(lambda: schemas.TEST_PAYLOADS.validate_json(body), args.runs),
+        "JSON-массив через validate_payloads": timed(lambda: validate_payloads(io.StringIO(body), "json"), args.runs),
+        "NDJSON построчно (validate_json)": timed(lambda: [schemas.TEST_PAYLOAD.validate_json(line) for line in lines], args.runs),
+    }
+
+    rng = random.Random(2)
+    for index in rng.sample(range(args.items), args.errors):
+        tests[index] = dict(tests[index], correct=10)
+    bad_body = json.dumps(tests)
+    reported = []
+
+    def collect_errors():
+        try:
+            validate_payloads(io.StringIO(bad_body), "json")
+        except InvalidPayloads as exc:
+            reported[:] = exc.errors
+    results[f"JSON-массив с {args.errors} ошибками"] = timed(collect_errors, args.runs)
+
+    print(f"тестов: {args.items}, JSON {len(body) / 2**20:.1f} МБ, NDJSON {len(ndjson) / 2**20:.1f} МБ")
+    for name, seconds in results.items():
+        print(f"{name:<42} {seconds * 1000:8.1f} мс ({args.items / seconds:,.0f} тестов/с)")
+    print(f"найдено ошибок: {len(reported)}, первая: тест {reported[0]['index']}, поле {reported[0]['loc']}")
+
+
+if __name__ == "__main__":
+    main()
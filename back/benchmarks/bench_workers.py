@@ -0,0 +1,105 @@
+"""
+Бенчмарк масштабирования пропускной способности по числу воркеров gunicorn
+
+Для каждого значения --workers поднимает `gunicorn -c gunicorn.conf.py`
+на свободном порту и нагружает его из нескольких процессов с keep-alive.
+
+Запуск (из каталога back, БД должна быть доступна):
+    poetry run python benchmarks/bench_workers.py --workers 1 2 4 --path /sections/
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+BACK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Сервер на порту {port} не поднялся за {timeout} с")
+
+
+def client_loop(port: int, path: str, duration: float, counter):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    done = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        response.read()
+        done += 1
+    with counter.get_lock():
+        counter.value += done
+
+
+def run(workers: int, clients: int, path: str, duration: float) -> float:
+    port = free_port()
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(workers),
+        BACKEND_HOST="127.0.0.1",
+        BACKEND_PORT=str(port),
+        GUNICORN_MAX_REQUESTS="0",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app.main:app", "-c", "gunicorn.conf.py",
+         "--access-logfile", "/dev/null"],
+        cwd=BACK_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(port)
+        counter = multiprocessing.Value("l", 0)
+        procs = [
+            multiprocessing.Process(target=client_loop, args=(port, path, duration, counter))
+            for _ in range(clients)
+        ]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+        return counter.value / duration
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=multiprocessing.cpu_count() * 2)
+    parser.add_argument("--path", default="/health")
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    baseline = None
+    for workers in args.workers:
+        rps = run(workers, args.clients, args.path, args.duration)
+        baseline = baseline or rps
+        print(f"workers={workers:3d}  {rps:10.1f} req/s  x{rps / baseline:5.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Конфигурация gunicorn для продакшн-режима (несколько uvicorn-воркеров)
+
+Запуск (из каталога back):
+    poetry run gunicorn app.main:app -c gunicorn.conf.py
+"""
+import os
+import signal
+import threading
+import time
+
+# Сеть
+bind = f"{os.getenv('BACKEND_HOST', '0.0.0.0')}:{os.getenv('BACKEND_PORT', '8000')}"
+
+
+def _default_workers() -> int:
+    # Учитываем ограничения по CPU (cgroups/taskset), а не только число ядер хоста
+    try:
+        return max(len(os.sched_getaffinity(0)), 1)
+    except AttributeError:
+        return max(os.cpu_count() or 1, 1)
+
+
+# Воркеры: по умолчанию один асинхронный воркер на доступное ядро
+workers = int(os.getenv("WEB_CONCURRENCY") or _default_workers())
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Приложение загружается в мастере до fork, воркеры наследуют импортированный код
+preload_app = True
+
+# Перезапуск воркеров после N запросов (с разбросом, чтобы не рестартовать все разом)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = max(max_requests // 10, 0)
+
+# Перезапуск воркера при превышении памяти (0 - отключено)
+max_worker_memory_mb = int(os.getenv("GUNICORN_MAX_WORKER_MEMORY_MB", "512"))
+memory_check_interval = int(os.getenv("GUNICORN_MEMORY_CHECK_INTERVAL", "10"))
+
+# Корректное завершение
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Логи gunicorn в stderr контейнера; access log пишет приложение (JSON, app/logs.py)
+accesslog = None
+errorlog = "-"
+
+
+def _rss_mb() -> float:
+    """Текущий RSS процесса в МБ"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        # Не Linux: берем пиковое значение
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _watch_memory(worker):
+    while True:
+        time.sleep(memory_check_interval)
+        rss = _rss_mb()
+        if rss > max_worker_memory_mb:
+            worker.log.warning(
+                "Worker %s использует %.0f МБ (лимит %s МБ), перезапуск",
+                worker.pid, rss, max_worker_memory_mb,
+            )
+            # SIGTERM - штатное завершение: воркер дообслужит запросы, мастер поднимет новый
+            os.kill(worker.pid, signal.SIGTERM)
+            return
+
+
+def post_fork(server, worker):
+    # Соединения пулов, унаследованные от мастера, нельзя использовать в дочернем процессе
+    from app.database import dispose_engines
+    dispose_engines(close=False)
+    # Поток вывода логов остался в мастере; воркер запускает свой и забирает логи uvicorn
+    from app.logs import configure_logging
+    configure_logging()
+
+
+def post_worker_init(worker):
+    if max_worker_memory_mb > 0:
+        threading.Thread(
+            target=_watch_memory, args=(worker,), name="memory-watchdog", daemon=True
+        ).start()
+
+
+def worker_exit(server, worker):
+    from app.database import dispose_engines
+    from app.logs import stop_logging
+    dispose_engines()
+    stop_logging()
@@ -1,27 +1,23 @@
-import pytest
 import os
-import sys
+import pytest
+
+# Прогрев кэша секций в тестах отключен: фоновый поток не должен видеть данные тестов
+os.environ.setdefault("WARMUP_SECTIONS", "0")
+# Ограничение частоты отключено: все тесты идут от одного клиента
+os.environ.setdefault("RATE_LIMITS", "")
+# Поток LISTEN не запускается: тесты событий запускают свой EventBroadcaster
+os.environ.setdefault("EVENTS_ENABLED", "0")
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from fastapi.testclient import TestClient
 from app.main import app
-from app.database import get_db
-
-# Добавляем путь к корневой директории проекта для импорта config
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+from app.database import get_db, get_read_db
+from app.core.config import get_settings
+from app.cache import section_resolver
 
-try:
-    from config.database import config as app_config
-    # Используем централизованную конфигурацию
-    database_url = app_config.database_url
-except ImportError:
-    # Fallback для случаев, когда config недоступен
-    database_url = os.getenv("DATABASE_URL")
-    if not database_url:
-        raise ValueError(
-            "Отсутствует обязательная переменная: DATABASE_URL\n"
-            "Скопируйте config/env.example в .env и заполните значения"
-        )
+# Используем тот же снимок конфигурации, что и приложение
+database_url = get_settings().DATABASE_URL
 
 @pytest.fixture(scope="session")
 def engine():
@@ -50,6 +46,8 @@ def db_session(engine):
     for table in reversed(Base.metadata.sorted_tables):
         session.execute(table.delete())
     session.commit()
+    # id удаленных секций не должны достаться следующему тесту из кэша имен
+    section_resolver.clear()
     
     yield session
     
@@ -67,6 +65,7 @@ def client(db_session):
             pass
     
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     with TestClient(app) as test_client:
         yield test_client
     
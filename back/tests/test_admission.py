@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from app.admission import AdmissionLimit, AdmissionMiddleware, Rejected, route_class
+
+def test_route_class():
+    assert route_class("POST", "/tests/") == "write"
+    assert route_class("GET", "/sections/") == "read"
+    assert route_class("GET", "/ready") is None
+    assert route_class("GET", "/api/events/") is None
+
+@pytest.mark.asyncio
+async def test_queue_full_rejected_with_429():
+    limit = AdmissionLimit("write", concurrency=1, queue_size=1, queue_timeout=5)
+    await limit.acquire()
+    waiter = asyncio.ensure_future(limit.acquire())
+    await asyncio.sleep(0)
+    assert limit.waiting == 1
+
+    with pytest.raises(Rejected) as exc:
+        await limit.acquire()
+    assert exc.value.status_code == 429
+    assert exc.value.retry_after == 5
+
+    # Освободившийся слот достается ожидающему
+    limit.release()
+    await waiter
+    assert (limit.active, limit.waiting, limit.admitted, limit.rejected) == (1, 0, 2, 1)
+    limit.release()
+    assert limit.active == 0
+
+@pytest.mark.asyncio
+async def test_queue_timeout_rejected_with_503():
+    limit = AdmissionLimit("read", concurrency=1, queue_size=10, queue_timeout=0.01)
+    await limit.acquire()
+    with pytest.raises(Rejected) as exc:
+        await limit.acquire()
+    assert exc.value.status_code == 503
+    assert limit.timed_out == 1 and limit.waiting == 0
+    limit.release()
+    # После таймаута слот не потерян
+    await limit.acquire()
+    assert limit.active == 1
+
+@pytest.mark.asyncio
+async def test_middleware_separates_reads_and_writes():
+    release_write = asyncio.Event()
+
+    async def app(scope, receive, send):
+        if scope["method"] == "POST":
+            await release_write.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    limits = {
+        "read": AdmissionLimit("read", 4, 4, 1),
+        "write": AdmissionLimit("write", 1, 0, 1),
+    }
+    middleware = AdmissionMiddleware(app, limits)
+
+    async def request(method):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await middleware({"type": "http", "method": method, "path": "/tests/"}, None, send)
+        return messages
+
+    slow_write = asyncio.ensure_future(request("POST"))
+    await asyncio.sleep(0)
+
+    # Вторая запись отклонена, чтение проходит, пока запись занята
+    rejected = await request("POST")
+    assert rejected[0]["status"] == 429
+    assert (b"retry-after", b"1") in rejected[0]["headers"]
+    assert (await request("GET"))[0]["status"] == 200
+
+    release_write.set()
+    assert (await slow_write)[0]["status"] == 200
+    assert limits["write"].active == 0
@@ -1,4 +1,5 @@
 import pytest
+from app.core.config import get_settings
 from app.models import Section, Question, Answer
 
 def test_create_tests_api(client, db_session):
@@ -29,6 +30,21 @@ def test_create_tests_api(client, db_session):
     assert answers[0].is_correct is False
     assert answers[2].is_correct is False
 
+def test_create_tests_validates_whole_batch(client, db_session):
+    """Тест: ошибки всех тестов пакета возвращаются сразу, в БД ничего не пишется"""
+    test_data = [
+        {"section": "Valid", "question": "Q1?", "answers": ["a", "b"], "correct": 1},
+        {"section": "Valid", "question": "Q2?", "answers": ["a", "b"], "correct": 2},
+        {"section": "Valid", "question": "x" * 5000, "answers": ["a"], "correct": 0},
+    ]
+    response = client.post("/tests/", json=test_data)
+    assert response.status_code == 422
+    assert [error["loc"] for error in response.json()["detail"]] == [
+        ["body", 1, "correct"], ["body", 2, "question"]
+    ]
+    assert db_session.query(Section).count() == 0
+    assert db_session.query(Question).count() == 0
+
 def test_create_multiple_tests_api(client, db_session):
     """Тест API создания нескольких тестов"""
     test_data = [
@@ -161,3 +177,116 @@ def test_root_api(client):
     assert response.status_code == 200
     assert "message" in response.json()
 
+
+def test_create_tests_sets_primary_sticky_cookie(client, db_session):
+    """Тест: после записи клиент получает cookie для чтения с primary"""
+    test_data = [{
+        "section": "Mathematics",
+        "question": "What is 2+2?",
+        "answers": ["3", "4"],
+        "correct": 1
+    }]
+
+    response = client.post("/tests/", json=test_data)
+    assert response.status_code == 200
+    assert "db_read_primary" in response.cookies
+
+def test_read_section_tests_cache_invalidated_on_create(client, db_session):
+    """Тест: добавление вопросов сбрасывает кэш ответа секции"""
+    payload = {"section": "Cached", "question": "Q1?", "answers": ["a", "b"], "correct": 0}
+    client.post("/tests/", json=[payload])
+    section_id = db_session.query(Section).filter(Section.name == "Cached").one().id
+
+    assert len(client.get(f"/sections/{section_id}/tests/").json()) == 1
+
+    client.post("/tests/", json=[dict(payload, question="Q2?")])
+    data = client.get(f"/sections/{section_id}/tests/").json()
+    assert [q["text"] for q in data] == ["Q1?", "Q2?"]
+
+def test_sticky_cookie_bypasses_section_cache(client, db_session):
+    """Тест: клиент после записи (cookie) читает с primary мимо кэша секции и не заполняет его"""
+    from app.cache import section_cache
+    payload = {"section": "Sticky", "question": "Q1?", "answers": ["a", "b"], "correct": 0}
+    client.post("/tests/", json=[payload])
+    section_id = db_session.query(Section).filter(Section.name == "Sticky").one().id
+    client.cookies.clear()
+    assert [q["text"] for q in client.get(f"/sections/{section_id}/tests/").json()] == ["Q1?"]
+
+    # Изменение мимо API: в кэше остается старый ответ
+    db_session.query(Question).filter(Question.section_id == section_id).update({"text": "Q1 edited?"})
+    db_session.commit()
+    assert client.get(f"/sections/{section_id}/tests/").json()[0]["text"] == "Q1?"
+    client.cookies.set("db_read_primary", "1")
+    assert client.get(f"/sections/{section_id}/tests/").json()[0]["text"] == "Q1 edited?"
+    batch = client.get(f"/sections/tests/?ids={section_id}").json()
+    assert batch["sections"][0]["questions"][0]["text"] == "Q1 edited?"
+
+    section_cache.invalidate([section_id])
+    client.get(f"/sections/{section_id}/tests/")
+    assert section_cache.get(section_id, "json") is None
+
+def test_read_endpoints_send_cache_headers(client, sample_question):
+    """Тест: GET-ответы можно кэшировать на границе"""
+    for url in ["/sections/", f"/sections/{sample_question.section_id}/tests/"]:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert "max-age=" in response.headers["cache-control"]
+        assert "stale-if-error=" in response.headers["cache-control"]
+
+def test_sticky_cookie_disables_browser_cache(client, sample_question):
+    """Тест: после записи браузер не должен показывать свою старую копию ответа"""
+    client.cookies.set("db_read_primary", "1")
+    for url in ["/sections/", f"/sections/{sample_question.section_id}/tests/",
+                f"/sections/tests/?ids={sample_question.section_id}"]:
+        assert client.get(url).headers["cache-control"] == "private, no-cache"
+
+def test_read_sections_tests_batch(client, db_session):
+    """Тест пакетного получения вопросов нескольких секций"""
+    client.post("/tests/", json=[
+        {"section": "A", "question": "A1?", "answers": ["x", "y"], "correct": 0},
+        {"section": "B", "question": "B1?", "answers": ["x", "y"], "correct": 1},
+        {"section": "A", "question": "A2?", "answers": ["x"], "correct": 0},
+    ])
+    ids = {s.name: s.id for s in db_session.query(Section).all()}
+
+    # Секция A уже в кэше, B загружается из БД
+    client.get(f"/sections/{ids['A']}/tests/")
+    response = client.get(f"/sections/tests/?ids={ids['A']},{ids['B']},999999")
+    assert response.status_code == 200
+    data = response.json()
+    assert [s["section_id"] for s in data["sections"]] == [ids["A"], ids["B"]]
+    assert [q["text"] for q in data["sections"][0]["questions"]] == ["A1?", "A2?"]
+    assert data["sections"][1]["questions"][0]["answers"][1]["is_correct"] is True
+    assert data["missing"] == [999999]
+
+def test_read_sections_tests_batch_validation(client):
+    """Тест валидации списка id секций"""
+    assert client.get("/sections/tests/?ids=1,abc").status_code == 422
+    too_many = ",".join(str(i) for i in range(1000))
+    assert client.get(f"/sections/tests/?ids={too_many}").status_code == 422
+
+def test_read_sections_includes_question_count(client, db_session):
+    """Тест: список секций содержит число вопросов и время обновления"""
+    client.post("/tests/", json=[
+        {"section": "Counted", "question": f"Q{i}?", "answers": ["a"], "correct": 0}
+        for i in range(3)
+    ])
+    data = client.get("/sections/").json()
+    assert data[0]["name"] == "Counted"
+    assert data[0]["question_count"] == 3
+    assert data[0]["updated_at"] is not None
+
+def test_create_tests_jsonb_storage(client, db_session, monkeypatch):
+    """Тест: в режиме ANSWER_STORAGE=jsonb ответы пишутся в строку вопроса"""
+    monkeypatch.setattr("app.main.settings", get_settings().model_copy(update={"ANSWER_STORAGE": "jsonb"}))
+    response = client.post("/tests/", json=[
+        {"section": "Json", "question": "2+2?", "answers": ["3", "4"], "correct": 1}
+    ])
+    assert response.status_code == 200
+    answers = response.json()[0]["answers"]
+    assert [(a["text"], a["is_correct"]) for a in answers] == [("3", False), ("4", True)]
+    assert db_session.query(Answer).count() == 0
+
+    section_id = db_session.query(Section).one().id
+    data = client.get(f"/sections/{section_id}/tests/").json()
+    assert data[0]["answers"] == answers
@@ -0,0 +1,149 @@
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import get_settings
+from app.ingest import ingest
+from app.leaderboard import Leaderboards
+from app.models import Answer, Question, Section, leaderboard_answers, leaderboard_scores, review_states
+from app.scheduler import Scheduler
+from app.schemas import TestPayload as Payload
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+TESTS = [
+    {"section": "Math", "question": "2+2?", "answers": ["3", "4"], "correct": 1},
+    {"section": "Math", "question": "3+3?", "answers": ["6", "7"], "correct": 0},
+    {"section": "Physics", "question": "g?", "answers": ["9.8"], "correct": 0},
+]
+
+@pytest.fixture(params=["normalized", "jsonb", "interned"])
+def storage(request, monkeypatch):
+    monkeypatch.setattr("app.main.settings", get_settings().model_copy(
+        update={"ADMIN_API_TOKEN": "secret", "ANSWER_STORAGE": request.param}
+    ))
+    return request.param
+
+def section_id(db_session, name):
+    return db_session.query(Section.id).filter(Section.name == name).scalar()
+
+def count(db_session, table):
+    return db_session.execute(select(func.count()).select_from(table)).scalar()
+
+def test_delete_sections_cascades(client, db_session, storage):
+    client.post("/tests/", json=TESTS)
+    math, physics = section_id(db_session, "Math"), section_id(db_session, "Physics")
+    question = client.get(f"/sections/{math}/tests/").json()[0]
+    correct = next(answer["id"] for answer in question["answers"] if answer["is_correct"])
+    client.post(f"/sections/{math}/review/", headers={"X-Learner-Id": "u1"},
+                json=[{"question_id": question["id"], "answer_id": correct}])
+    assert client.get(f"/sections/{math}/leaderboard/").json()["total"] == 1
+    from app.main import leaderboards, scheduler
+    scheduler.flush()
+    leaderboards.snapshot()
+
+    assert client.delete(f"/admin/sections/?ids={math},{physics}").status_code == 403
+    response = client.delete(f"/admin/sections/?ids={math},999999", headers=ADMIN)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["sections"], body["questions"], body["missing"]) == (1, 2, [999999])
+
+    db_session.expire_all()
+    assert [name for (name,) in db_session.query(Section.name)] == ["Physics"]
+    assert db_session.query(Question).count() == 1
+    assert db_session.query(Answer).count() == (0 if storage == "jsonb" else 1)
+    assert count(db_session, review_states) == count(db_session, leaderboard_scores) == 0
+    assert count(db_session, leaderboard_answers) == 0
+
+    # Кэш секции и рейтинг сброшены, имя секции снова свободно
+    assert client.get(f"/sections/{math}/tests/").status_code == 404
+    assert client.get(f"/sections/{math}/leaderboard/").json()["total"] == 0
+    client.post("/tests/", json=TESTS[:1])
+    assert section_id(db_session, "Math") not in (None, math)
+
+def test_delete_questions(client, db_session, storage):
+    client.post("/tests/", json=TESTS)
+    math = section_id(db_session, "Math")
+    first, second = [q["id"] for q in client.get(f"/sections/{math}/tests/").json()]
+
+    response = client.delete(f"/admin/questions/?ids={first},0", headers=ADMIN)
+    assert response.status_code == 200
+    assert (response.json()["questions"], response.json()["missing"]) == (1, [0])
+    assert [q["id"] for q in client.get(f"/sections/{math}/tests/").json()] == [second]
+    db_session.expire_all()
+    assert db_session.get(Section, math).question_count == 1
+
+    assert client.delete("/admin/questions/?ids=1,x", headers=ADMIN).status_code == 422
+
+def test_replace_questions(client, db_session, storage):
+    client.post("/tests/", json=TESTS)
+    math = section_id(db_session, "Math")
+    first, second = [q["id"] for q in client.get(f"/sections/{math}/tests/").json()]
+    updated_at = db_session.get(Section, math).updated_at
+
+    response = client.put("/admin/questions/", headers=ADMIN, json=[
+        {"id": first, "question": "2*2?", "answers": ["4", "5", "6"], "correct": 0},
+    ])
+    assert response.status_code == 200
+    assert (response.json()["questions"], response.json()["sections"]) == (1, 1)
+    # Замена содержимого - изменение секции, хотя триггер статистики его не видит
+    db_session.expire_all()
+    assert db_session.get(Section, math).updated_at > updated_at
+    questions = client.get(f"/sections/{math}/tests/").json()
+    assert questions[0]["text"] == "2*2?"
+    assert [(a["text"], a["is_correct"]) for a in questions[0]["answers"]] == [("4", True), ("5", False), ("6", False)]
+    assert questions[1]["text"] == "3+3?"
+
+    # Все или ничего: неизвестный id откатывает и остальные изменения
+    response = client.put("/admin/questions/", headers=ADMIN, json=[
+        {"id": second, "question": "changed?", "answers": ["x"], "correct": 0},
+        {"id": 10**9, "question": "missing?", "answers": ["x"], "correct": 0},
+    ])
+    assert response.status_code == 404
+    assert response.json()["detail"]["missing"] == [10**9]
+    assert client.get(f"/sections/{math}/tests/").json()[1]["text"] == "3+3?"
+
+    duplicate = {"id": second, "question": "q?", "answers": ["x"], "correct": 0}
+    assert client.put("/admin/questions/", headers=ADMIN, json=[duplicate, duplicate]).status_code == 422
+
+def test_replace_import(client, db_session, storage):
+    client.post("/tests/", json=TESTS)
+    math, physics = section_id(db_session, "Math"), section_id(db_session, "Physics")
+
+    response = client.put("/admin/import/", headers=ADMIN, json=[
+        {"section": "Math", "question": "5+5?", "answers": ["10"], "correct": 0},
+        {"section": "Chemistry", "question": "H2O?", "answers": ["water"], "correct": 0},
+    ])
+    assert response.status_code == 200
+    assert (response.json()["questions"], response.json()["deleted"]) == (2, 2)
+    assert [q["text"] for q in client.get(f"/sections/{math}/tests/").json()] == ["5+5?"]
+    assert [q["text"] for q in client.get(f"/sections/{physics}/tests/").json()] == ["g?"]
+
+def test_replace_import_keeps_earlier_batches(db_session):
+    ingest(db_session, [Payload(**test) for test in TESTS], "normalized")
+    replacement = [Payload(section="Math", question=f"Q{i}?", answers=["a"], correct=0) for i in range(3)]
+    # Секция встречается в нескольких пачках: удаляются только вопросы, бывшие до импорта
+    result = ingest(db_session, replacement, "normalized", batch_size=1, replace=True)
+    assert (result.questions, result.deleted) == (3, 2)
+    math = db_session.query(Section).filter(Section.name == "Math").one()
+    assert sorted(q.text for q in math.questions) == ["Q0?", "Q1?", "Q2?"]
+    assert math.question_count == 3
+
+def test_background_writers_skip_deleted_rows(engine, db_session):
+    ingest(db_session, [Payload(**test) for test in TESTS], "normalized")
+    math = db_session.query(Section).filter(Section.name == "Math").one()
+    question_ids = [question.id for question in math.questions]
+    factory = sessionmaker(bind=engine)
+    scheduler, leaderboards = Scheduler(factory), Leaderboards(factory)
+    scheduler.record("u1", math.id, [(question_ids[0], 4), (question_ids[1], 4)])
+    leaderboards.add("u1", math.id, 2)
+
+    # Вопрос и секцию удалили другие воркеры до записи накопленного
+    db_session.query(Question).filter(Question.id == question_ids[0]).delete()
+    db_session.commit()
+    assert scheduler.flush() == 1
+    db_session.query(Section).filter(Section.id == math.id).delete()
+    db_session.commit()
+    assert leaderboards.snapshot() == 0
+    assert count(db_session, review_states) == count(db_session, leaderboard_scores) == 0
+    assert count(db_session, leaderboard_answers) == 0
@@ -0,0 +1,217 @@
+import threading
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from app.cache import AnswerTexts, SectionCache, SectionResolver
+from app.models import AnswerText, Section
+
+class TestSectionCache:
+    """Тесты кэша ответов по секциям"""
+
+    def test_get_set(self):
+        """Тест: сохраненный ответ возвращается из кэша"""
+        cache = SectionCache(max_sections=10, ttl=60)
+        assert cache.get(1) is None
+        cache.set(1, b"[]")
+        assert cache.get(1) == b"[]"
+        assert cache.stats() == {"sections": 1, "hits": 1, "misses": 1, "rejected": 0}
+
+    def test_variants_are_invalidated_together(self):
+        """Тест: инвалидация удаляет все варианты ответа секции"""
+        cache = SectionCache(max_sections=10, ttl=60)
+        cache.set(1, b"json")
+        cache.set(1, b"gzip", variant="gzip")
+        assert cache.get(1, variant="gzip") == b"gzip"
+        cache.invalidate([1])
+        assert cache.get(1) is None
+        assert cache.get(1, variant="gzip") is None
+
+    def test_lru_eviction(self):
+        """Тест: при переполнении вытесняется давно не использованная секция"""
+        cache = SectionCache(max_sections=2, ttl=60)
+        cache.set(1, b"1")
+        cache.set(2, b"2")
+        cache.get(1)
+        cache.set(3, b"3")
+        assert cache.get(2) is None
+        assert cache.get(1) == b"1"
+        assert cache.get(3) == b"3"
+
+    def test_fill_started_before_invalidation_is_rejected(self):
+        """Тест: ответ, прочитанный из БД до сброса секции, не попадает в кэш"""
+        cache = SectionCache(max_sections=10, ttl=60)
+        token = cache.fill_token()
+        cache.invalidate([1])
+        cache.set(1, b"old", token=token)
+        cache.set(2, b"other", token=token)
+        assert cache.get(1) is None
+        assert cache.get(2) == b"other"
+        cache.set(1, b"new", token=cache.fill_token())
+        assert cache.get(1) == b"new"
+
+        token = cache.fill_token()
+        cache.clear()
+        cache.set(2, b"old", token=token)
+        assert cache.get(2) is None
+        assert cache.stats()["rejected"] == 2
+
+    def test_replica_fill_held_after_invalidation(self):
+        """Тест: после сброса секция replica_hold секунд не заполняется чтением с реплики"""
+        cache = SectionCache(max_sections=10, ttl=60, replica_hold=60)
+        cache.invalidate([1])
+        cache.set(1, b"replica", token=cache.fill_token(), from_replica=True)
+        assert cache.get(1) is None
+        cache.set(2, b"replica", from_replica=True)
+        assert cache.get(2) == b"replica"
+        cache.set(1, b"primary", token=cache.fill_token())
+        assert cache.get(1) == b"primary"
+
+        released = SectionCache(max_sections=10, ttl=60, replica_hold=0.01)
+        released.invalidate([1])
+        time.sleep(0.02)
+        released.set(1, b"replica", token=released.fill_token(), from_replica=True)
+        assert released.get(1) == b"replica"
+
+    def test_ttl_expiry(self):
+        """Тест: устаревший ответ не возвращается"""
+        cache = SectionCache(max_sections=10, ttl=0.01)
+        cache.set(1, b"1")
+        time.sleep(0.02)
+        assert cache.get(1) is None
+
+def test_warm_sections_fills_cache(db_session):
+    """Тест: прогрев кладет в кэш самые большие секции"""
+    from app.cache import section_cache
+    from app.models import Section, Question
+    from app.warmup import warm_sections
+    small, big = Section(name="Small"), Section(name="Big")
+    db_session.add_all([small, big])
+    db_session.commit()
+    db_session.add_all([Question(text=f"Q{i}", section_id=big.id) for i in range(3)])
+    db_session.add(Question(text="Q", section_id=small.id))
+    db_session.commit()
+
+    section_cache.clear()
+    assert warm_sections(1) == 1
+    assert section_cache.get(big.id) is not None
+    assert section_cache.get(small.id) is None
+
+def test_warm_sections_skips_sections_invalidated_during_load(db_session, monkeypatch):
+    """Тест: секция, сброшенная между чтением и записью в кэш, не кэшируется прогревом"""
+    from app import warmup
+    from app.cache import section_cache
+    from app.models import Section, Question
+    section = Section(name="Big")
+    db_session.add(section)
+    db_session.commit()
+    db_session.add(Question(text="Q", section_id=section.id))
+    db_session.commit()
+
+    load = warmup.crud.get_questions_by_sections
+
+    def load_then_write(db, section_ids):
+        grouped = load(db, section_ids)
+        section_cache.invalidate([section.id])
+        return grouped
+    monkeypatch.setattr(warmup.crud, "get_questions_by_sections", load_then_write)
+    section_cache.clear()
+    assert warmup.warm_sections(1) == 1
+    assert section_cache.get(section.id) is None
+
+class TestSectionResolver:
+    """Тесты кэша id секций по имени"""
+
+    def test_resolve_creates_and_caches(self, db_session):
+        """Тест: новые секции создаются, закоммиченные берутся из кэша"""
+        db_session.add(Section(name="Existing"))
+        db_session.commit()
+        resolver = SectionResolver(max_names=10)
+
+        ids = resolver.resolve(db_session, ["Existing", "New", "Existing"])
+        db_session.commit()
+        assert set(ids) == {"Existing", "New"}
+        assert {s.name: s.id for s in db_session.query(Section)} == ids
+        assert resolver.stats()["created"] == 1
+
+        # "New" создана в транзакции resolve, поэтому попадает в кэш только после чтения из БД
+        assert resolver.resolve(db_session, ["Existing", "New"]) == ids
+        assert resolver.resolve(db_session, ["Existing", "New"]) == ids
+        stats = resolver.stats()
+        assert (stats["hits"], stats["misses"], stats["names"]) == (3, 3, 2)
+        assert stats["hit_rate"] == 0.5
+
+    def test_rolled_back_section_is_not_cached(self, db_session):
+        """Тест: id секции из откаченной транзакции не остается в кэше"""
+        resolver = SectionResolver(max_names=10)
+        first = resolver.resolve(db_session, ["Temp"])["Temp"]
+        db_session.rollback()
+        second = resolver.resolve(db_session, ["Temp"])["Temp"]
+        db_session.commit()
+        assert second != first
+        assert db_session.get(Section, second).name == "Temp"
+
+    def test_invalidate_ids_and_lru(self, db_session):
+        """Тест: удаленные секции и вытесненные имена перечитываются из БД"""
+        db_session.add_all([Section(name="A"), Section(name="B")])
+        db_session.commit()
+        resolver = SectionResolver(max_names=1)
+        ids = resolver.resolve(db_session, ["A", "B"])
+        assert resolver.stats()["names"] == 1
+        resolver.invalidate_ids([ids["B"]])
+        assert resolver.stats()["names"] == 0
+
+    def test_concurrent_creation_resolves_to_one_section(self, engine, db_session):
+        """Тест: два воркера создают одну секцию одновременно - оба получают один id"""
+        resolver = SectionResolver(max_names=10)
+        Session = sessionmaker(bind=engine)
+        first, second = Session(), Session()
+        try:
+            first_id = resolver.resolve(first, ["Race"])["Race"]
+            result = {}
+            # INSERT второй сессии ждет коммита первой на уникальном индексе
+            thread = threading.Thread(target=lambda: result.update(resolver.resolve(second, ["Race"])))
+            thread.start()
+            time.sleep(0.2)
+            assert thread.is_alive()
+            first.commit()
+            thread.join(5)
+            second.commit()
+            assert result == {"Race": first_id}
+            assert db_session.query(Section).filter(Section.name == "Race").count() == 1
+        finally:
+            first.close()
+            second.close()
+
+class TestAnswerTexts:
+    """Тесты интернирования текстов ответов"""
+
+    def test_intern_deduplicates_and_caches_texts(self, db_session):
+        """Тест: одинаковые тексты получают один id, тексты по id берутся из кэша"""
+        texts = AnswerTexts(max_texts=10)
+        ids = texts.intern(db_session, ["True", "False", "True"])
+        db_session.commit()
+        assert texts.intern(db_session, ["False", "None"])["False"] == ids["False"]
+        db_session.commit()
+        assert db_session.query(AnswerText).count() == 3
+        assert texts.stats()["created"] == 3
+
+        assert texts.texts(db_session, [ids["True"], ids["False"]]) == {ids["True"]: "True", ids["False"]: "False"}
+        assert (texts.stats()["hits"], texts.stats()["misses"]) == (2, 0)
+
+        # Холодный кэш (другой воркер) дочитывает промахи одним запросом
+        cold = AnswerTexts(max_texts=1)
+        assert cold.texts(db_session, [ids["True"], ids["False"]]) == {ids["True"]: "True", ids["False"]: "False"}
+        assert (cold.stats()["misses"], cold.stats()["texts"]) == (2, 1)
+
+def test_create_tests_resolves_sections_once(client, db_session):
+    """Тест: пакет в одну секцию создает ее один раз, повторный пакет берет id из кэша"""
+    from app.cache import section_resolver
+    payload = [{"section": "Batch", "question": f"Q{i}?", "answers": ["a", "b"], "correct": 0} for i in range(5)]
+    assert client.post("/tests/", json=payload).status_code == 200
+    assert client.post("/tests/", json=payload).status_code == 200
+    assert client.post("/tests/", json=payload).status_code == 200
+    section = db_session.query(Section).filter(Section.name == "Batch").one()
+    assert section.question_count == 15
+    assert section_resolver.stats()["hits"] >= 1
+    assert client.get("/metrics").json()["section_resolver"]["created"] >= 1
@@ -0,0 +1,87 @@
+import gzip
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response
+from fastapi.testclient import TestClient
+from app.compression import CompressionMiddleware, ENCODINGS, negotiate
+from app.models import Section, Question, Answer
+
+@pytest.fixture
+def small_app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/big")
+    def big():
+        return {"items": ["text"] * 100}
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/encoded")
+    def encoded():
+        return Response(gzip.compress(b"x" * 500), headers={"Content-Encoding": "gzip"})
+
+    return TestClient(app)
+
+class TestNegotiate:
+    """Тесты согласования Accept-Encoding"""
+
+    def test_gzip(self):
+        assert negotiate("gzip, deflate") == "gzip"
+
+    def test_server_preference(self):
+        """Тест: при нескольких вариантах выбирается предпочтительный для сервера"""
+        assert negotiate("gzip, br, zstd") == ENCODINGS[0]
+
+    def test_quality_zero_is_refused(self):
+        assert negotiate("gzip;q=0") is None
+
+    def test_wildcard(self):
+        assert negotiate("*") == ENCODINGS[0]
+
+    def test_identity_only(self):
+        assert negotiate("identity") is None
+        assert negotiate("") is None
+
+class TestCompressionMiddleware:
+    """Тесты middleware сжатия"""
+
+    def test_compresses_large_json(self, small_app):
+        response = small_app.get("/big", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert response.json() == {"items": ["text"] * 100}
+
+    def test_skips_small_response(self, small_app):
+        response = small_app.get("/small", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+
+    def test_skips_without_accept_encoding(self, small_app):
+        response = small_app.get("/big", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+
+    def test_keeps_already_encoded_response(self, small_app):
+        response = small_app.get("/encoded", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.content == b"x" * 500
+
+def test_section_tests_compressed_variant_is_cached(client, db_session):
+    """Тест: сжатый вариант тестов секции кэшируется"""
+    from app.cache import section_cache
+    section = Section(name="Large Section")
+    db_session.add(section)
+    db_session.commit()
+    for i in range(20):
+        question = Question(text=f"Question {i}?", section_id=section.id)
+        db_session.add(question)
+        db_session.commit()
+        db_session.add_all([Answer(text=f"Answer {j}", is_correct=j == 0, question_id=question.id) for j in range(4)])
+    db_session.commit()
+
+    response = client.get(f"/sections/{section.id}/tests/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 20
+    assert section_cache.get(section.id, variant="json:gzip") is not None
@@ -0,0 +1,22 @@
+import pytest
+from pydantic import ValidationError
+from app.core.config import get_settings, settings
+from config.database import get_config
+
+def test_settings_are_memoized():
+    """Тест: настройки создаются один раз и переиспользуются"""
+    assert get_settings() is get_settings()
+    assert settings is get_settings()
+
+def test_settings_are_immutable():
+    """Тест: снимок настроек нельзя изменить"""
+    with pytest.raises(ValidationError):
+        get_settings().DATABASE_URL = "postgresql://other"
+
+def test_app_config_is_memoized_and_frozen():
+    """Тест: общий снимок конфигурации неизменяем"""
+    config = get_config()
+    assert config is get_config()
+    assert config.database_url.startswith("postgresql://")
+    with pytest.raises(AttributeError):
+        config.environment = "production"
@@ -0,0 +1,112 @@
+import json
+
+from app import crud
+from app.cache import answer_texts
+from app.core.config import get_settings
+from app.formats import questions_adapter, render_questions
+from app.models import Section, Question, Answer, AnswerText
+
+def create_section(db_session, name, storage, tests):
+    section = Section(name=name)
+    db_session.add(section)
+    db_session.flush()
+    text_ids = None
+    if storage == "interned":
+        text_ids = answer_texts.intern(db_session, (a for _, answers, _ in tests for a in answers))
+    for text, answers, correct in tests:
+        db_session.add(crud.build_question(text, section.id, answers, correct, storage, text_ids))
+    db_session.commit()
+    return section
+
+TESTS = [("2+2?", ["3", "4", "5"], 1), ("Color?", ["Red"], 0)]
+
+def strip_ids(questions):
+    return [(q.text, [(a.text, a.is_correct) for a in q.answers]) for q in questions]
+
+def test_build_question_jsonb(db_session):
+    """Тест: в режиме jsonb ответы хранятся в строке вопроса"""
+    create_section(db_session, "Json", "jsonb", TESTS)
+    question = db_session.query(Question).filter(Question.text == "2+2?").one()
+    assert question.answers_data == ["3", "4", "5"]
+    assert question.correct_index == 1
+    assert len(question.answer_ids) == 3
+    assert db_session.query(Answer).count() == 0
+
+def test_jsonb_answer_ids_are_stable(db_session):
+    """Тест: id ответов JSONB-вопросов из последовательности answers - не позиции и не пересекаются с answers.id"""
+    create_section(db_session, "Rows", "normalized", TESTS)
+    section = create_section(db_session, "Json", "jsonb", TESTS)
+    questions = crud.get_questions_by_sections(db_session, [section.id])[section.id]
+    first = questions_adapter.validate_python(questions, from_attributes=True)
+    ids = [a.id for q in first for a in q.answers]
+    assert len(set(ids)) == 4
+    assert not set(ids) & {id for (id,) in db_session.query(Answer.id)}
+
+    # Повторное чтение и другой формат отдают те же id
+    db_session.expire_all()
+    questions = crud.get_questions_by_sections(db_session, [section.id])[section.id]
+    assert [a.id for q in questions_adapter.validate_python(questions, from_attributes=True) for a in q.answers] == ids
+    assert json.loads(render_questions(questions, "columnar"))["answer_ids"] == ids
+
+def test_dual_read_same_payload(db_session):
+    """Тест: обе схемы хранения читаются одинаково (кроме id ответов)"""
+    normalized = create_section(db_session, "Rows", "normalized", TESTS)
+    denormalized = create_section(db_session, "Json", "jsonb", TESTS)
+    grouped = crud.get_questions_by_sections(db_session, [normalized.id, denormalized.id])
+
+    rows = questions_adapter.validate_python(grouped[normalized.id], from_attributes=True)
+    jsonb = questions_adapter.validate_python(grouped[denormalized.id], from_attributes=True)
+    assert strip_ids(rows) == strip_ids(jsonb)
+    assert [a.id for a in jsonb[0].answers] == grouped[denormalized.id][0].answer_ids
+    assert jsonb[0].answers[1].is_correct is True
+
+def test_interned_answers_read_like_rows(db_session):
+    """Тест: интернированные ответы ссылаются на общие тексты и читаются как обычные строки"""
+    normalized = create_section(db_session, "Rows", "normalized", TESTS)
+    interned = create_section(db_session, "Interned", "interned", TESTS + [("Again?", ["4", "3"], 0)])
+    assert db_session.query(Answer).filter(Answer.text.is_(None)).count() == 6
+    assert sorted(t.text for t in db_session.query(AnswerText)) == ["3", "4", "5", "Red"]
+
+    answer_texts.clear()
+    grouped = crud.get_questions_by_sections(db_session, [normalized.id, interned.id])
+    assert strip_ids(grouped[interned.id])[:2] == strip_ids(grouped[normalized.id])
+    assert render_questions(grouped[interned.id], "columnar")
+    # Тексты подставлены без изменения строк: сессии нечего записывать
+    assert not db_session.dirty
+
+def test_intern_and_denormalize_interned_answers(db_session):
+    """Тест: перевод секции на общие тексты и обратно в JSONB"""
+    section = create_section(db_session, "Rows", "normalized", TESTS)
+    assert crud.intern_answers(db_session, [section.id]) == 4
+    db_session.commit()
+    db_session.expire_all()
+    assert db_session.query(Answer).filter(Answer.text.isnot(None)).count() == 0
+    questions = crud.get_questions_by_sections(db_session, [section.id])[section.id]
+    assert strip_ids(questions) == [("2+2?", [("3", False), ("4", True), ("5", False)]), ("Color?", [("Red", True)])]
+
+    assert crud.denormalize_answers(db_session, [section.id]) == 2
+    db_session.commit()
+    question = db_session.query(Question).filter(Question.text == "2+2?").one()
+    assert (question.answers_data, question.correct_index) == (["3", "4", "5"], 1)
+
+def test_denormalize_answers(db_session):
+    """Тест переноса ответов секции из таблицы answers в JSONB"""
+    section = create_section(db_session, "Rows", "normalized", TESTS)
+    before = render_questions(crud.get_questions_by_sections(db_session, [section.id])[section.id], "columnar")
+
+    assert crud.denormalize_answers(db_session, [section.id]) == 2
+    db_session.commit()
+    db_session.expire_all()
+
+    assert db_session.query(Answer).count() == 0
+    question = db_session.query(Question).filter(Question.text == "2+2?").one()
+    assert (question.answers_data, question.correct_index) == (["3", "4", "5"], 1)
+    after = crud.get_questions_by_sections(db_session, [section.id])[section.id]
+    assert [len(q.answers_data) for q in after] == [3, 1]
+    assert [len(q.answer_ids) for q in after] == [3, 1]
+    assert before == render_questions(after, "columnar")  # id ответов сохранились
+    # Повторный перенос ничего не делает
+    assert crud.denormalize_answers(db_session, [section.id]) == 0
+
+def test_default_answer_storage():
+    assert get_settings().ANSWER_STORAGE == "normalized"
@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+import pytest
+from app.events import (
+    KEEPALIVE_FRAME, MAX_PAYLOAD_BYTES, RESET_FRAME, EventBroadcaster, Subscription, TooManySubscribers,
+    event_stream, notify_sections_changed, section_event_payloads,
+)
+from app.models import Section
+
+@pytest.fixture
+def broadcaster(engine):
+    changed = []
+    broadcaster = EventBroadcaster(engine, max_subscribers=2, on_change=changed.extend)
+    broadcaster.changed = changed
+    broadcaster.start()
+    assert broadcaster.wait_listening(5)
+    yield broadcaster
+    broadcaster.stop()
+    assert not broadcaster.is_running
+
+def test_payloads_split_under_notify_limit():
+    sections = [{"id": i, "name": "Секция %d" % i + "x" * 100, "question_count": i} for i in range(500)]
+    payloads = section_event_payloads(sections)
+    assert len(payloads) > 1
+    assert all(len(payload.encode()) <= MAX_PAYLOAD_BYTES for payload in payloads)
+    ids = [section["id"] for payload in payloads for section in json.loads(payload)["sections"]]
+    assert ids == list(range(500))
+
+    # Слишком длинное имя не помещается - остается только id
+    [payload] = section_event_payloads([{"id": 1, "name": "x" * 10_000, "question_count": 1}])
+    assert json.loads(payload) == {"sections": [{"id": 1}]}
+
+@pytest.mark.asyncio
+async def test_overflowed_subscriber_gets_reset():
+    subscription = Subscription(asyncio.get_running_loop(), queue_size=2)
+    for i in range(3):
+        subscription.deliver(b"frame %d" % i)
+    assert subscription.queue.qsize() == 1
+    assert subscription.queue.get_nowait() == RESET_FRAME
+    assert subscription.resets == 1
+
+@pytest.mark.asyncio
+async def test_event_stream_keepalive_and_unsubscribe(broadcaster):
+    subscription = broadcaster.subscribe()
+    stream = event_stream(broadcaster, subscription, keepalive=0.01)
+    assert await stream.__anext__() == b"retry: 3000\n\n"
+    assert await stream.__anext__() == KEEPALIVE_FRAME
+    broadcaster.publish(b"event: sections\ndata: {}\n\n")
+    assert await stream.__anext__() == b"event: sections\ndata: {}\n\n"
+    await stream.aclose()
+    assert broadcaster.subscribers == 0
+
+@pytest.mark.asyncio
+async def test_subscriber_limit(broadcaster):
+    broadcaster.subscribe()
+    broadcaster.subscribe()
+    with pytest.raises(TooManySubscribers):
+        broadcaster.subscribe()
+
+@pytest.mark.asyncio
+async def test_notify_delivered_after_commit_only(broadcaster, db_session):
+    subscription = broadcaster.subscribe()
+    section = Section(name="Алгебра")
+    db_session.add(section)
+    db_session.commit()
+
+    # Откат транзакции - уведомления нет
+    notify_sections_changed(db_session, [section.id])
+    db_session.rollback()
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(subscription.queue.get(), 0.3)
+
+    notify_sections_changed(db_session, [section.id])
+    db_session.commit()
+    frame = await asyncio.wait_for(subscription.queue.get(), 5)
+    event, data = frame.decode().strip().split("\n")
+    assert event == "event: sections"
+    assert json.loads(data.removeprefix("data: ")) == {
+        "sections": [{"id": section.id, "name": "Алгебра", "question_count": 0}]
+    }
+    assert broadcaster.changed == [section.id]
+
+@pytest.mark.asyncio
+async def test_create_tests_emits_section_event(broadcaster, client):
+    subscription = broadcaster.subscribe()
+    response = client.post("/tests/", json=[
+        {"section": "Физика", "question": "Q1?", "answers": ["a", "b"], "correct": 0},
+        {"section": "Физика", "question": "Q2?", "answers": ["a", "b"], "correct": 1},
+    ])
+    assert response.status_code == 200
+    frame = await asyncio.wait_for(subscription.queue.get(), 5)
+    sections = json.loads(frame.decode().split("data: ", 1)[1])["sections"]
+    assert [(section["name"], section["question_count"]) for section in sections] == [("Физика", 2)]
+
+def test_events_endpoint_disabled(client):
+    # В тестах поток LISTEN приложения не запущен (EVENTS_ENABLED=0)
+    response = client.get("/events/")
+    assert response.status_code == 503
+
+@pytest.mark.asyncio
+async def test_deleted_sections_marked_in_event(broadcaster, db_session, engine):
+    subscription = broadcaster.subscribe()
+    notify_sections_changed(db_session, [10**9])
+    db_session.commit()
+    frame = await asyncio.wait_for(subscription.queue.get(), 5)
+    payload = frame.decode().split("data: ", 1)[1].strip()
+    assert json.loads(payload) == {"sections": [{"id": 10**9, "deleted": True}]}
+
+    deleted = []
+    EventBroadcaster(engine, on_delete=deleted.extend).dispatch(payload)
+    assert deleted == [10**9]
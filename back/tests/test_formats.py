@@ -0,0 +1,81 @@
+import pytest
+from app.formats import MEDIA_TYPES, negotiate_format, to_columnar
+from app.models import Section, Question, Answer
+from app.schemas import Question as QuestionSchema
+
+QUESTIONS = [
+    QuestionSchema(id=1, text="2+2?", answers=[
+        {"id": 10, "text": "3", "is_correct": False},
+        {"id": 11, "text": "4", "is_correct": True},
+    ]),
+    QuestionSchema(id=2, text="Empty?", answers=[]),
+    QuestionSchema(id=3, text="Color?", answers=[
+        {"id": 12, "text": "Red", "is_correct": True},
+    ]),
+]
+
+class TestNegotiateFormat:
+    """Тесты выбора формата ответа"""
+
+    def test_default_json(self):
+        assert negotiate_format(None, "") == "json"
+        assert negotiate_format(None, "application/json, */*") == "json"
+
+    def test_format_param(self):
+        assert negotiate_format("columnar", "application/json") == "columnar"
+
+    def test_accept_header(self):
+        assert negotiate_format(None, MEDIA_TYPES["columnar"]) == "columnar"
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            negotiate_format("xml", "")
+
+class TestColumnar:
+    """Тесты колоночного представления"""
+
+    def test_to_columnar(self):
+        columns = to_columnar(QUESTIONS)
+        assert columns.question_ids == [1, 2, 3]
+        assert columns.question_texts == ["2+2?", "Empty?", "Color?"]
+        assert columns.answer_offsets == [0, 2, 2, 3]
+        assert columns.answer_ids == [10, 11, 12]
+        assert columns.answer_texts == ["3", "4", "Red"]
+        assert columns.correct == [1, 2]
+
+    def test_columnar_api(self, client, db_session):
+        """Тест: ?format=columnar и Accept возвращают колоночный ответ"""
+        section = Section(name="Columnar")
+        db_session.add(section)
+        db_session.commit()
+        question = Question(text="Q?", section_id=section.id)
+        db_session.add(question)
+        db_session.commit()
+        db_session.add_all([
+            Answer(text="a", is_correct=False, question_id=question.id),
+            Answer(text="b", is_correct=True, question_id=question.id),
+        ])
+        db_session.commit()
+
+        by_param = client.get(f"/sections/{section.id}/tests/?format=columnar")
+        by_accept = client.get(f"/sections/{section.id}/tests/", headers={"Accept": MEDIA_TYPES["columnar"]})
+        for response in (by_param, by_accept):
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith(MEDIA_TYPES["columnar"])
+            data = response.json()
+            assert data["question_texts"] == ["Q?"]
+            assert data["answer_texts"] == ["a", "b"]
+            assert data["correct"] == [1]
+
+        assert client.get(f"/sections/{section.id}/tests/").json()[0]["text"] == "Q?"
+
+    def test_unsupported_format(self, client, sample_question):
+        response = client.get(f"/sections/{sample_question.section_id}/tests/?format=xml")
+        assert response.status_code == 406
+
+def test_msgpack_roundtrip():
+    """Тест: MessagePack содержит те же колонки (если msgpack установлен)"""
+    from app.formats import msgpack, render_questions
+    if msgpack is None:
+        pytest.skip("msgpack не установлен")
+    assert msgpack.unpackb(render_questions(QUESTIONS, "msgpack")) == to_columnar(QUESTIONS).model_dump()
@@ -0,0 +1,135 @@
+import io
+import json
+
+import pytest
+from app.core.config import get_settings
+from app.ingest import InvalidPayloads, copy_row, ingest, read_payloads, validate_payloads
+from app.models import Section, Question, Answer, AnswerText
+from app.schemas import TestPayload as Payload
+
+TESTS = [
+    {"section": "Math", "question": "2+2?", "answers": ["3", "4"], "correct": 1},
+    {"section": "Tabs", "question": "a\tb\\c\nd?", "answers": ["\"quoted\"", "\\"], "correct": 0},
+    {"section": "Math", "question": "3+3?", "answers": ["6"], "correct": 0},
+]
+
+def ndjson(tests):
+    return "".join(json.dumps(test) + "\n" for test in tests)
+
+def test_read_payloads_json_and_ndjson():
+    from_json = list(read_payloads(io.StringIO(json.dumps(TESTS)), "json"))
+    from_ndjson = list(read_payloads(io.StringIO(ndjson(TESTS) + "\n"), "ndjson"))
+    assert from_json == from_ndjson
+    assert from_json[1].question == "a\tb\\c\nd?"
+
+def test_read_payloads_reports_position():
+    with pytest.raises(ValueError, match="position 1"):
+        list(read_payloads(io.StringIO(ndjson([TESTS[0], {"section": "x"}])), "ndjson"))
+
+BAD_TESTS = [
+    {"section": "Math", "question": "1+1?", "answers": ["2"], "correct": 1},
+    TESTS[0],
+    {"section": "", "question": "Q?", "answers": [], "correct": 0},
+]
+
+@pytest.mark.parametrize("fmt", ["json", "ndjson"])
+def test_validate_payloads_reports_every_error(fmt):
+    body = json.dumps(BAD_TESTS) if fmt == "json" else ndjson(BAD_TESTS)
+    with pytest.raises(InvalidPayloads) as exc_info:
+        validate_payloads(io.StringIO(body), fmt)
+    assert [(error["index"], error["loc"]) for error in exc_info.value.errors] == [
+        (0, ["correct"]), (2, ["section"]), (2, ["answers"])
+    ]
+    assert "position 0" in str(exc_info.value)
+
+def test_validate_payloads_rereads_ndjson():
+    assert list(validate_payloads(io.StringIO(ndjson(TESTS)), "ndjson")) == [Payload(**test) for test in TESTS]
+
+def test_copy_row_escapes_special_characters():
+    row = copy_row(7, Payload(**TESTS[1]))
+    assert row.count(b"\t") == 4
+    assert row.endswith(b"\n") and row.count(b"\n") == 1
+    assert b"a\\tb\\\\c\\nd?" in row
+
+def test_ingest_normalized(db_session):
+    """Тест импорта через COPY в таблицы sections/questions/answers"""
+    db_session.add(Section(name="Math"))
+    db_session.commit()
+
+    result = ingest(db_session, [Payload(**test) for test in TESTS], "normalized", batch_size=2)
+    assert (result.questions, result.answers, result.sections) == (3, 5, 3)
+
+    assert sorted(s.name for s in db_session.query(Section)) == ["Math", "Tabs"]
+    questions = db_session.query(Question).order_by(Question.id).all()
+    assert [q.text for q in questions] == ["2+2?", "a\tb\\c\nd?", "3+3?"]
+    assert [(a.text, a.is_correct) for a in questions[0].answers] == [("3", False), ("4", True)]
+    assert [a.text for a in questions[1].answers] == ["\"quoted\"", "\\"]
+    assert db_session.query(Section).filter(Section.name == "Math").one().question_count == 2
+
+def test_ingest_jsonb(db_session):
+    """Тест импорта с хранением ответов в JSONB"""
+    result = ingest(db_session, [Payload(**test) for test in TESTS], "jsonb")
+    assert (result.questions, result.answers) == (3, 0)
+    assert db_session.query(Answer).count() == 0
+    question = db_session.query(Question).filter(Question.text == "2+2?").one()
+    assert (question.answers_data, question.correct_index) == (["3", "4"], 1)
+
+def test_ingest_interned(db_session):
+    """Тест импорта с общими текстами ответов: новые тексты создаются один раз на пачку"""
+    db_session.add(AnswerText(text="4"))
+    db_session.commit()
+    result = ingest(db_session, [Payload(**test) for test in TESTS + TESTS], "interned", batch_size=4)
+    assert (result.questions, result.answers) == (6, 10)
+    assert sorted(t.text for t in db_session.query(AnswerText)) == ["\"quoted\"", "3", "4", "6", "\\"]
+    assert db_session.query(Answer).filter(Answer.text.isnot(None)).count() == 0
+    question = db_session.query(Question).filter(Question.text == "2+2?").first()
+    assert [(a.text_id, a.is_correct) for a in question.answers] == [
+        (db_session.query(AnswerText.id).filter(AnswerText.text == text).scalar(), correct)
+        for text, correct in (("3", False), ("4", True))
+    ]
+
+def test_import_endpoint(client, db_session, monkeypatch):
+    """Тест эндпоинта импорта: токен и NDJSON"""
+    assert client.post("/admin/import/", json=TESTS).status_code == 403
+
+    monkeypatch.setattr("app.main.settings", get_settings().model_copy(update={"ADMIN_API_TOKEN": "secret"}))
+    assert client.post("/admin/import/", json=TESTS, headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    response = client.post(
+        "/admin/import/",
+        content=ndjson(TESTS),
+        headers={"X-Admin-Token": "secret", "Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    assert response.json()["questions"] == 3
+
+    section_id = db_session.query(Section).filter(Section.name == "Math").one().id
+    assert [q["text"] for q in client.get(f"/sections/{section_id}/tests/").json()] == ["2+2?", "3+3?"]
+
+    response = client.post("/admin/import/", content="[{\"section\": 1}]", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 422
+
+    # Ошибка в последней строке: не записано ничего, даже при пачках по одному тесту
+    monkeypatch.setattr("app.main.settings", get_settings().model_copy(
+        update={"ADMIN_API_TOKEN": "secret", "IMPORT_BATCH_SIZE": 1}
+    ))
+    questions_before = db_session.query(Question).count()
+    response = client.post(
+        "/admin/import/",
+        content=ndjson(TESTS + [BAD_TESTS[0]]),
+        headers={"X-Admin-Token": "secret", "Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["index"] == 3
+    assert db_session.query(Question).count() == questions_before
+
+def test_import_endpoint_resets_review_queues(client, db_session, monkeypatch):
+    """Тест: импорт через API сбрасывает кэши процесса тем же хуком, что и POST /tests/"""
+    monkeypatch.setattr("app.main.settings", get_settings().model_copy(update={"ADMIN_API_TOKEN": "secret"}))
+    learner = {"X-Learner-Id": "learner-1"}
+    client.post("/admin/import/", json=TESTS[:1], headers={"X-Admin-Token": "secret"})
+    section_id = db_session.query(Section).filter(Section.name == "Math").one().id
+    assert len(client.get(f"/sections/{section_id}/review/", headers=learner).json()["question_ids"]) == 1
+
+    client.post("/admin/import/", json=TESTS[2:], headers={"X-Admin-Token": "secret"})
+    assert len(client.get(f"/sections/{section_id}/review/", headers=learner).json()["question_ids"]) == 2
@@ -0,0 +1,176 @@
+import json
+import random
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from app.leaderboard import Leaderboard, Leaderboards, SkipList, public_id
+from app.core.config import get_settings
+from app.models import Answer, Question, Section, leaderboard_scores
+
+LEARNER = {"X-Learner-Id": "learner-1"}
+
+def test_skiplist_matches_sorted_list():
+    rng = random.Random(7)
+    skiplist = SkipList(seed=1)
+    expected = []
+    for _ in range(2000):
+        key = rng.randrange(500)
+        if key in expected:
+            skiplist.remove(key)
+            expected.remove(key)
+        else:
+            skiplist.insert(key)
+            expected.append(key)
+            expected.sort()
+    assert len(skiplist) == len(expected)
+    assert skiplist.slice(0, len(expected)) == expected
+    assert all(skiplist.index(key) == position for position, key in enumerate(expected))
+    assert skiplist.slice(10, 5) == expected[10:15]
+    assert skiplist.slice(len(expected), 5) == []
+    with pytest.raises(KeyError):
+        skiplist.remove(-1)
+
+def test_skiplist_from_sorted_supports_updates():
+    skiplist = SkipList.from_sorted(range(0, 200, 2), seed=3)
+    skiplist.insert(51)
+    skiplist.remove(100)
+    expected = sorted(set(range(0, 200, 2)) - {100} | {51})
+    assert skiplist.slice(0, 1000) == expected
+    assert skiplist.index(51) == expected.index(51)
+
+def test_leaderboard_ranks_ties_by_time():
+    board = Leaderboard([("a", 5, 10.0), ("b", 3, 5.0)])
+    board.set("c", 5, 20.0)
+    board.set("b", 6, 30.0)
+    assert board.top(0, 10) == [(1, "b", 6), (2, "a", 5), (3, "c", 5)]
+    assert board.rank("c") == (3, 5)
+    assert board.rank("unknown") is None
+    assert board.top(1, 1) == [(2, "a", 5)]
+
+@pytest.fixture
+def section(db_session):
+    section = Section(name="Рейтинг")
+    db_session.add(section)
+    db_session.flush()
+    db_session.add_all(
+        Question(text=f"Q{i}?", section_id=section.id,
+                 answers=[Answer(text="yes", is_correct=True), Answer(text="no", is_correct=False)])
+        for i in range(3)
+    )
+    db_session.commit()
+    return section
+
+@pytest.fixture
+def leaderboards(engine):
+    return Leaderboards(sessionmaker(bind=engine))
+
+def test_snapshot_accumulates_and_reloads(leaderboards, db_session, section):
+    leaderboards.add("u1", section.id, 2, now=1.0)
+    leaderboards.add("u2", section.id, 3, now=2.0)
+    assert leaderboards.snapshot() == 2
+    leaderboards.add("u1", section.id, 2, now=3.0)
+    assert leaderboards.snapshot() == 1
+    rows = db_session.execute(
+        select(leaderboard_scores.c.learner_id, leaderboard_scores.c.score).order_by(leaderboard_scores.c.learner_id)
+    ).all()
+    assert rows == [("u1", 4), ("u2", 3)]
+
+    # Новый воркер строит рейтинг из снимка
+    fresh = Leaderboards(leaderboards.session_factory)
+    fresh.load()
+    assert fresh.top(section.id, 0, 10) == (2, [(1, "u1", 4), (2, "u2", 3)])
+
+def test_first_load_retries_until_database_is_back(engine, db_session, section):
+    """Тест: первая загрузка идет в фоне и повторяется, пока БД недоступна; рейтинги пока пусты"""
+    from sqlalchemy.exc import OperationalError
+    sessions = sessionmaker(bind=engine)
+    attempts = []
+
+    def flaky_sessions():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise OperationalError("SELECT 1", {}, Exception("connection refused"))
+        return sessions()
+
+    db_session.execute(leaderboard_scores.insert().values(section_id=section.id, learner_id="u1", score=2, reached_at=1.0))
+    db_session.commit()
+    leaderboards = Leaderboards(flaky_sessions, snapshot_interval=60, load_backoff=0.01)
+    leaderboards.start()
+    try:
+        assert leaderboards.loaded.wait(5)
+    finally:
+        leaderboards.stop()
+    assert len(attempts) >= 3 and leaderboards.error is None
+    assert leaderboards.top(section.id, 0, 10) == (1, [(1, "u1", 2)])
+
+    # Остановка воркера прерывает повторы
+    def down():
+        raise OperationalError("SELECT 1", {}, Exception("connection refused"))
+    leaderboards = Leaderboards(down, load_backoff=0.01)
+    leaderboards.start()
+    leaderboards.stop()
+    assert not leaderboards.loaded.is_set() and leaderboards.top(section.id, 0, 10) == (0, [])
+
+def test_notify_from_other_worker_keeps_local_points(leaderboards, section):
+    leaderboards.add("u1", section.id, 1, now=1.0)
+    leaderboards.handle_notify(json.dumps({"pid": -1, "scores": [[section.id, "u1", 5, 0.5], [section.id, "u2", 2, 0.5]]}))
+    # 5 очков в БД от другого воркера + 1 еще не записанное здесь
+    assert leaderboards.rank(section.id, "u1") == (1, 6)
+    assert leaderboards.rank(section.id, "u2") == (2, 2)
+
+def review(client, section_id, learner, answers):
+    return client.post(f"/sections/{section_id}/review/", headers={"X-Learner-Id": learner}, json=[
+        {"question_id": question_id, "answer_id": answer_id} for question_id, answer_id in answers
+    ])
+
+def chosen(section, index, correct):
+    question = section.questions[index]
+    return question.id, next(answer.id for answer in question.answers if answer.is_correct == correct)
+
+def test_leaderboard_endpoint(client, section, db_session):
+    review(client, section.id, "other", [chosen(section, 0, True)])
+    response = review(client, section.id, "learner-1", [
+        chosen(section, 0, True), chosen(section, 1, True), chosen(section, 2, False),
+    ])
+    assert response.status_code == 200
+
+    response = client.get(f"/sections/{section.id}/leaderboard/", headers=LEARNER)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == 2
+    assert body["entries"] == [
+        {"rank": 1, "learner": public_id("learner-1"), "score": 2},
+        {"rank": 2, "learner": public_id("other"), "score": 1},
+    ]
+    assert body["me"] == body["entries"][0]
+    assert "learner-1" not in response.text
+
+    empty = client.get("/sections/999999/leaderboard/").json()
+    assert empty == {"section_id": 999999, "total": 0, "entries": [], "me": None}
+
+def test_points_are_checked_and_counted_once(client, section):
+    """Тест: правильность определяет сервер, очко за вопрос - один раз"""
+    assert review(client, section.id, "u1", [chosen(section, 0, False)]).status_code == 200
+    # Повторные и одинаковые ответы в одном запросе не дают новых очков
+    review(client, section.id, "u1", [chosen(section, 1, True), chosen(section, 1, True)])
+    review(client, section.id, "u1", [chosen(section, 1, True)])
+    assert client.get(f"/sections/{section.id}/leaderboard/").json()["entries"][0]["score"] == 1
+
+    # Клиент не может сам объявить ответ верным
+    response = client.post(f"/sections/{section.id}/review/", headers={"X-Learner-Id": "u2"},
+                           json=[{"question_id": section.questions[2].id, "correct": True}])
+    assert response.status_code == 422
+
+def test_points_for_jsonb_answers(client, db_session, monkeypatch):
+    monkeypatch.setattr("app.main.settings", get_settings().model_copy(update={"ANSWER_STORAGE": "jsonb"}))
+    question = client.post("/tests/", json=[
+        {"section": "Json", "question": "2+2?", "answers": ["3", "4"], "correct": 1}
+    ]).json()[0]
+    section_id = db_session.query(Section.id).filter(Section.name == "Json").scalar()
+    wrong, right = [answer["id"] for answer in question["answers"]]
+    review(client, section_id, "u1", [(question["id"], wrong)])
+    review(client, section_id, "u2", [(question["id"], right)])
+    entries = client.get(f"/sections/{section_id}/leaderboard/").json()["entries"]
+    assert [(entry["learner"], entry["score"]) for entry in entries] == [(public_id("u2"), 1)]
@@ -0,0 +1,138 @@
+import io
+import json
+import logging
+import queue
+from logging.handlers import QueueListener
+
+import pytest
+
+from app.logs import (
+    AccessLogMiddleware, ContextQueueHandler, JsonFormatter, RequestLog, SamplingFilter, _request, parse_sampling,
+)
+from app.tracing import SpanExporter, tracer
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+@pytest.fixture
+def access_records(caplog):
+    caplog.set_level(logging.INFO, logger="app.access")
+    return lambda: [record for record in caplog.records if record.name == "app.access"]
+
+def record(name="app.test", level=logging.INFO, msg="hello %s", args=("world",)):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+def test_parse_sampling():
+    assert parse_sampling("") == {}
+    assert parse_sampling("app.access=0.1; uvicorn = 0") == {"app.access": 0.1, "uvicorn": 0.0}
+    for invalid in ("app.access", "=0.5", "app=2", "app=x"):
+        with pytest.raises(ValueError):
+            parse_sampling(invalid)
+
+def test_sampling_filter(monkeypatch):
+    """Тест: доля по самому длинному правилу, предупреждения не сэмплируются"""
+    sampling = SamplingFilter({"app": 0.0, "app.access": 1.0})
+    assert sampling.filter(record("app.access"))
+    assert not sampling.filter(record("app.scheduler"))
+    assert sampling.filter(record("app.scheduler", logging.WARNING))
+    assert sampling.filter(record("uvicorn.error"))
+    assert sampling.sampled_out == 1
+
+    monkeypatch.setattr("app.logs.random.random", lambda: 0.3)
+    half = SamplingFilter({"app": 0.5})
+    assert half.filter(record("app.x"))
+    monkeypatch.setattr("app.logs.random.random", lambda: 0.7)
+    assert not half.filter(record("app.x"))
+
+def test_queue_handler_never_blocks():
+    """Тест: переполненная очередь отбрасывает записи, вызывающий поток не ждет"""
+    handler = ContextQueueHandler(queue.Queue(maxsize=2))
+    logger = logging.getLogger("app.test.queue")
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        for i in range(5):
+            logger.warning("message %d", i)
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = True
+    assert handler.stats() == {"queued": 2, "dropped": 3, "sampled_out": 0}
+    first = handler.queue.get_nowait()
+    assert (first.msg, first.args) == ("message 0", None)
+
+def test_json_lines_through_listener(monkeypatch):
+    """Тест: контекст запроса и трассы снимается в потоке запроса, строка пишется потоком вывода"""
+    stream = io.StringIO()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter())
+    log_queue = queue.Queue()
+    handler = ContextQueueHandler(log_queue)
+    listener = QueueListener(log_queue, output)
+    logger = logging.getLogger("app.test.json")
+    logger.addHandler(handler)
+    logger.propagate = False
+    monkeypatch.setattr(tracer, "exporter", SpanExporter(lambda payload: None, "test", max_queue=10))
+    listener.start()
+    try:
+        request = RequestLog("req-1", "GET", "/sections/1/tests/")
+        request.route = "/sections/{section_id}/tests/"
+        token = _request.set(request)
+        try:
+            with tracer.activate(tracer.start_trace("GET", f"00-{TRACE_ID}-00f067aa0ba902b7-01")):
+                logger.info("loaded %d questions", 3, extra={"section_id": 1})
+        finally:
+            _request.reset(token)
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError:
+            logger.exception("failed")
+    finally:
+        listener.stop()
+        logger.removeHandler(handler)
+        logger.propagate = True
+
+    first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert first["message"] == "loaded 3 questions"
+    assert (first["level"], first["logger"]) == ("INFO", "app.test.json")
+    assert (first["request_id"], first["route"], first["trace_id"]) == ("req-1", "/sections/{section_id}/tests/", TRACE_ID)
+    assert first["section_id"] == 1
+    assert first["ts"].endswith("+00:00")
+    assert "request_id" not in second
+    assert "RuntimeError: boom" in second["exc"]
+
+def test_access_log(client, access_records):
+    """Тест: строка access log с маршрутом, статусом, временем и SQL-запросами"""
+    client.post("/tests/", json=[{"section": "Math", "question": "2+2?", "answers": ["3", "4"], "correct": 1}])
+    section_id = client.get("/sections/").json()[0]["id"]
+    response = client.get(f"/sections/{section_id}/tests/", headers={"X-Request-Id": "abc-123"})
+    assert response.headers["x-request-id"] == "abc-123"
+
+    entry = access_records()[-1]
+    assert entry.getMessage().startswith(f"GET /sections/{section_id}/tests/ 200 ")
+    assert (entry.request_id, entry.route, entry.status) == ("abc-123", "/sections/{section_id}/tests/", 200)
+    assert entry.db_queries >= 2 and entry.db_ms > 0
+    assert entry.latency_ms >= entry.db_ms
+
+    # Некорректный X-Request-Id заменяется своим
+    response = client.get("/health", headers={"X-Request-Id": "bad id\\n"})
+    assert len(response.headers["x-request-id"]) == 32
+    entry = access_records()[-1]
+    assert (entry.db_queries, entry.levelno) == (0, logging.INFO)
+
+@pytest.mark.asyncio
+async def test_slow_and_failed_requests_are_warnings(access_records):
+    async def failing_app(scope, receive, send):
+        raise RuntimeError("boom")
+
+    async def ok_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def noop_send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/x", "headers": []}
+    with pytest.raises(RuntimeError):
+        await AccessLogMiddleware(failing_app, slow_ms=1000)(scope, None, noop_send)
+    await AccessLogMiddleware(ok_app, slow_ms=0)(dict(scope), None, noop_send)
+    failed, slow = access_records()
+    assert (failed.status, failed.levelno, failed.route) == (500, logging.WARNING, None)
+    assert (slow.status, slow.levelno) == (200, logging.WARNING)
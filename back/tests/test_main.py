@@ -13,3 +13,67 @@ def test_health_check(client):
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "healthy"}
+
+def test_ready_after_warmup(client):
+    """Тест: readiness становится готовым после прогрева"""
+    from app.main import leaderboards
+    from app.warmup import run_warmup
+    run_warmup()
+    assert leaderboards.loaded.wait(5)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready"}
+
+def test_warmup_retries_until_database_is_back(monkeypatch):
+    """Тест: прогрев повторяется с ограниченной паузой, пока БД не станет доступной"""
+    import threading
+    from sqlalchemy.exc import OperationalError
+    from app import warmup
+    attempts = []
+
+    def flaky_pool(db_engine):
+        attempts.append(db_engine)
+        if len(attempts) < 4:
+            raise OperationalError("SELECT 1", {}, Exception("connection refused"))
+    monkeypatch.setattr(warmup, "warm_pool", flaky_pool)
+    monkeypatch.setattr(warmup, "readiness", warmup.Readiness())
+    assert warmup.run_warmup(backoff=0.001, max_backoff=0.002, stop=threading.Event())
+    assert len(attempts) == 4 and warmup.readiness.is_ready
+
+    # Остановка воркера прерывает повторы
+    def down_pool(db_engine):
+        raise OperationalError("SELECT 1", {}, Exception("connection refused"))
+    monkeypatch.setattr(warmup, "warm_pool", down_pool)
+    monkeypatch.setattr(warmup, "readiness", warmup.Readiness())
+    stop = threading.Event()
+    results = []
+    thread = threading.Thread(target=lambda: results.append(warmup.run_warmup(backoff=0.01, stop=stop)))
+    thread.start()
+    stop.set()
+    thread.join(5)
+    assert results == [False] and not warmup.readiness.is_ready
+
+def test_not_ready_before_warmup(client, monkeypatch):
+    """Тест: до окончания прогрева readiness возвращает 503, liveness - 200"""
+    from app.warmup import Readiness
+    monkeypatch.setattr("app.main.readiness", Readiness())
+    assert client.get("/api/ready").status_code == 503
+    assert client.get("/health").status_code == 200
+
+def test_not_ready_before_leaderboards_load(client, monkeypatch):
+    """Тест: пока рейтинги не загружены из БД, readiness возвращает 503"""
+    from app.leaderboard import Leaderboards
+    from app.warmup import run_warmup
+    run_warmup()
+    monkeypatch.setattr("app.main.leaderboards", Leaderboards(None))
+    assert client.get("/ready").status_code == 503
+
+def test_metrics(client):
+    """Тест метрик: очереди допуска, пул соединений и кэш"""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data["admission"]) == {"read", "write"}
+    assert data["admission"]["write"]["waiting"] == 0
+    assert "checked_out" in data["db_pool"]
+    assert "hits" in data["section_cache"]
@@ -0,0 +1,73 @@
+import pytest
+from alembic import op
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import inspect
+
+from app import migration_utils
+from app.models import Section, Question
+
+@pytest.fixture
+def migration(engine):
+    """Контекст Alembic поверх тестовой БД, как внутри upgrade()"""
+    with engine.connect() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            yield connection
+
+def index_names(engine, table):
+    return {index["name"] for index in inspect(engine).get_indexes(table)}
+
+def test_create_and_drop_index_concurrently(engine, migration):
+    migration_utils.create_index_concurrently("ix_answers_text_question", "answers", ["text", "question_id"])
+    assert "ix_answers_text_question" in index_names(engine, "answers")
+    # Повторный вызов не падает
+    migration_utils.create_index_concurrently("ix_answers_text_question", "answers", ["text", "question_id"])
+
+    migration_utils.drop_index_concurrently("ix_answers_text_question", "answers")
+    assert "ix_answers_text_question" not in index_names(engine, "answers")
+
+def test_batched_update(db_session, engine, migration):
+    section = Section(name="Backfill")
+    db_session.add(section)
+    db_session.flush()
+    questions = [Question(text=f"Q{i}", section_id=section.id) for i in range(7)]
+    db_session.add_all(questions)
+    db_session.commit()
+
+    updated = migration_utils.batched_update(
+        "questions", "text = text || :suffix", "text NOT LIKE '%!'",
+        batch_size=2, pause=0, params={"suffix": "!"},
+    )
+    assert updated == 7
+    db_session.expire_all()
+    assert all(q.text.endswith("!") for q in db_session.query(Question))
+    # Повторный запуск ничего не меняет
+    assert migration_utils.batched_update("questions", "text = text || '!'", "text NOT LIKE '%!'", pause=0) == 0
+
+def test_batched_update_empty_table(migration):
+    assert migration_utils.batched_update("answers", "text = text", pause=0) == 0
+
+def test_copy_table_online_and_swap(engine, migration):
+    migration.exec_driver_sql("DROP TABLE IF EXISTS scratch_items, scratch_items_new")
+    migration.exec_driver_sql("CREATE TABLE scratch_items (id serial PRIMARY KEY, value text)")
+    migration.exec_driver_sql("INSERT INTO scratch_items (value) SELECT 'v' || n FROM generate_series(1, 5) n")
+    migration.exec_driver_sql("CREATE TABLE scratch_items_new (LIKE scratch_items INCLUDING ALL)")
+    migration.commit()
+
+    # Как в миграции: операции внутри транзакции контекста Alembic
+    with op.get_context().begin_transaction():
+        assert migration_utils.copy_table_online("scratch_items", "scratch_items_new", batch_size=2, pause=0) == 5
+        # Запись во время переноса повторяется в новой таблице
+        migration.exec_driver_sql("INSERT INTO scratch_items (value) VALUES ('late')")
+        migration.exec_driver_sql("UPDATE scratch_items SET value = 'changed' WHERE id = 1")
+        migration.exec_driver_sql("DELETE FROM scratch_items WHERE id = 2")
+        migration_utils.swap_tables("scratch_items", "scratch_items_new", sequence="scratch_items_id_seq")
+
+    rows = migration.exec_driver_sql("SELECT id, value FROM scratch_items ORDER BY id").all()
+    assert rows == [(1, "changed"), (3, "v3"), (4, "v4"), (5, "v5"), (6, "late")]
+    assert "scratch_items_new" not in inspect(engine).get_table_names()
+    # Последовательность пережила удаление исходной таблицы
+    migration.exec_driver_sql("INSERT INTO scratch_items (value) VALUES ('next')")
+    assert not migration_utils.is_partitioned("scratch_items")
+    migration.exec_driver_sql("DROP TABLE scratch_items")
+    migration.commit()
@@ -96,3 +96,38 @@ def test_unique_section_name(db_session):
     # Откатываем изменения
     db_session.rollback()
 
+
+def test_section_question_count_maintained(db_session, sample_section):
+    """Тест: question_count и updated_at секции обновляются триггерами"""
+    created_at = sample_section.updated_at
+    db_session.add_all([Question(text=f"Q{i}", section_id=sample_section.id) for i in range(3)])
+    db_session.commit()
+    db_session.refresh(sample_section)
+    assert sample_section.question_count == 3
+    assert sample_section.updated_at >= created_at
+
+    db_session.query(Question).filter(Question.text == "Q0").delete()
+    db_session.commit()
+    db_session.refresh(sample_section)
+    assert sample_section.question_count == 2
+
+def test_section_stats_ignore_updates_without_section_change(db_session, sample_section):
+    """Тест: UPDATE вопросов без смены секции не трогает статистику, перенос - переносит счетчик"""
+    other = Section(name="Other")
+    db_session.add(other)
+    db_session.add_all([Question(text=f"Q{i}", section_id=sample_section.id) for i in range(2)])
+    db_session.commit()
+    db_session.refresh(sample_section)
+    updated_at = sample_section.updated_at
+
+    db_session.query(Question).update({Question.text: Question.text + "!"})
+    db_session.commit()
+    db_session.refresh(sample_section)
+    assert (sample_section.question_count, sample_section.updated_at) == (2, updated_at)
+
+    db_session.query(Question).filter(Question.text == "Q0!").update({Question.section_id: other.id})
+    db_session.commit()
+    db_session.refresh(sample_section)
+    db_session.refresh(other)
+    assert (sample_section.question_count, other.question_count) == (1, 1)
+    assert sample_section.updated_at > updated_at
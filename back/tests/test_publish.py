@@ -0,0 +1,126 @@
+import gzip
+import json
+import os
+
+import pytest
+from app.core.config import get_settings
+from app.models import Answer, Question, Section
+from app.publish import publish_sections, publisher
+
+def read(path):
+    with open(path, "rb") as published:
+        return published.read()
+
+@pytest.fixture
+def section_with_tests(client):
+    response = client.post("/tests/", json=[
+        {"section": "География", "question": "Столица Франции?", "answers": ["Париж", "Лион"], "correct": 0},
+        {"section": "География", "question": "Самая длинная река?", "answers": ["Нил", "Волга"], "correct": 0},
+    ])
+    assert response.status_code == 200
+    return client.get("/sections/").json()[0]["id"]
+
+def test_published_files_match_api(client, db_session, section_with_tests, tmp_path):
+    section_id = section_with_tests
+    counts = publish_sections(db_session, [section_id], str(tmp_path))
+    assert counts == {"published": 1, "unchanged": 0, "removed": 0}
+
+    tests_index = tmp_path / "sections" / str(section_id) / "tests" / "index.json"
+    assert json.loads(read(tests_index)) == client.get(f"/sections/{section_id}/tests/").json()
+    # Колоночный вариант для TestPage (?format=columnar)
+    columnar_index = tmp_path / "sections" / str(section_id) / "tests" / "index.columnar"
+    assert read(columnar_index) == client.get(f"/sections/{section_id}/tests/?format=columnar").content
+    assert gzip.decompress(read(str(tests_index) + ".gz")) == read(tests_index)
+    assert json.loads(read(tmp_path / "sections" / "index.json")) == client.get("/sections/").json()
+
+    # Неизменяемые имена из манифеста указывают на те же файлы
+    manifest = json.loads(read(tmp_path / "manifest.json"))
+    assert os.path.samefile(tmp_path / manifest[f"sections/{section_id}/tests/"], tests_index)
+    assert os.path.samefile(tmp_path / manifest[f"sections/{section_id}/tests/?format=columnar"], columnar_index)
+    assert os.path.samefile(tmp_path / manifest["sections/"], tmp_path / "sections" / "index.json")
+
+def test_republish_is_incremental(db_session, section_with_tests, tmp_path):
+    section_id = section_with_tests
+    section_dir = tmp_path / "sections" / str(section_id)
+    publish_sections(db_session, [section_id], str(tmp_path), keep_versions=2)
+    assert publish_sections(db_session, [section_id], str(tmp_path))["unchanged"] == 1
+
+    versions = []
+    for text in ("Новый вопрос?", "Еще вопрос?"):
+        db_session.add(Question(text=text, section_id=section_id))
+        db_session.commit()
+        assert publish_sections(db_session, [section_id], str(tmp_path), keep_versions=2)["published"] == 1
+        versions.append(sorted(name for name in os.listdir(section_dir) if name.startswith("tests.") and name.endswith(".json")))
+    # Хранятся две последние версии
+    assert len(versions[0]) == 2 and len(versions[1]) == 2
+    assert versions[0] != versions[1]
+
+def test_empty_section_unpublished(db_session, section_with_tests, tmp_path):
+    section_id = section_with_tests
+    publish_sections(db_session, [section_id], str(tmp_path))
+    question_ids = [q.id for q in db_session.query(Question).filter(Question.section_id == section_id)]
+    db_session.query(Answer).filter(Answer.question_id.in_(question_ids)).delete()
+    db_session.query(Question).filter(Question.id.in_(question_ids)).delete()
+    db_session.commit()
+    assert publish_sections(db_session, [section_id], str(tmp_path))["removed"] == 1
+    assert not (tmp_path / "sections" / str(section_id)).exists()
+    assert f"sections/{section_id}/tests/" not in json.loads(read(tmp_path / "manifest.json"))
+
+def test_create_tests_publishes_changed_sections(client, db_session, monkeypatch, tmp_path):
+    monkeypatch.setattr("app.publish.settings", get_settings().model_copy(update={"PUBLISH_DIR": str(tmp_path)}))
+    other = Section(name="Не менялась")
+    db_session.add(other)
+    db_session.commit()
+
+    response = client.post("/tests/", json=[
+        {"section": "История", "question": "Год основания Москвы?", "answers": ["1147", "1240"], "correct": 0},
+    ])
+    assert response.status_code == 200
+    # Публикует фоновый поток; flush дожидается его и дописывает очередь
+    assert publisher.is_running
+    publisher.flush()
+    section_id = db_session.query(Section.id).filter(Section.name == "История").scalar()
+    assert (tmp_path / "sections" / str(section_id) / "tests" / "index.json").exists()
+    assert not (tmp_path / "sections" / str(other.id)).exists()
+    names = [section["name"] for section in json.loads(read(tmp_path / "sections" / "index.json"))]
+    assert names == ["Не менялась", "История"]
+
+def test_publish_failure_keeps_committed_write(client, db_session, monkeypatch, tmp_path):
+    """Тест: ошибка БД при публикации не превращает закоммиченную запись в 500"""
+    from sqlalchemy.exc import OperationalError
+    monkeypatch.setattr("app.publish.settings", get_settings().model_copy(update={"PUBLISH_DIR": str(tmp_path)}))
+
+    def broken(db, section_ids, root=None):
+        raise OperationalError("SELECT pg_advisory_xact_lock(1)", {}, Exception("lock timeout"))
+    monkeypatch.setattr("app.publish.publish_sections", broken)
+
+    response = client.post("/tests/", json=[
+        {"section": "История", "question": "Год основания Москвы?", "answers": ["1147", "1240"], "correct": 0},
+    ])
+    assert response.status_code == 200
+    publisher.flush()
+    assert db_session.query(Section).filter(Section.name == "История").count() == 1
+    assert not (tmp_path / "sections" / "index.json").exists()
+
+def test_publish_is_off_the_request_path(client, db_session, monkeypatch, tmp_path):
+    """Тест: ответ на запись не ждет публикации, секции из нескольких записей публикуются один раз"""
+    import threading
+    monkeypatch.setattr("app.publish.settings", get_settings().model_copy(update={"PUBLISH_DIR": str(tmp_path)}))
+    release = threading.Event()
+    published = []
+
+    def slow(db, section_ids, root=None):
+        release.wait(5)
+        published.append(sorted(section_ids))
+    monkeypatch.setattr("app.publish.publish_sections", slow)
+
+    for question in ("1?", "2?", "3?"):
+        response = client.post("/tests/", json=[
+            {"section": "История", "question": question, "answers": ["a", "b"], "correct": 0},
+        ])
+        assert response.status_code == 200
+    assert published == []
+    release.set()
+    publisher.flush()
+    section_id = db_session.query(Section.id).filter(Section.name == "История").scalar()
+    assert published and all(ids == [section_id] for ids in published) and len(published) <= 2
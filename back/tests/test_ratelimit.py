@@ -0,0 +1,108 @@
+import pytest
+from app.ratelimit import (
+    MemoryBuckets, PostgresBuckets, RateLimiter, RateLimitMiddleware, parse_rules,
+)
+
+def scope(method="GET", path="/sections/1/tests/", headers=(), client=("10.0.0.1", 1234), root_path=""):
+    return {"type": "http", "method": method, "path": path, "root_path": root_path,
+            "headers": list(headers), "client": client}
+
+def test_parse_rules():
+    rules = parse_rules("POST /tests/=5/s:20; GET /sections/*=20:60 ; *=50/s:100")
+    assert [(r.method, r.rate, r.burst) for r in rules] == [("POST", 5, 20), ("GET", 20, 60), (None, 50, 100)]
+    assert rules[1].matches("GET", "/sections/1/tests/")
+    assert not rules[0].matches("GET", "/tests/")
+    assert parse_rules("") == []
+    with pytest.raises(ValueError):
+        parse_rules("GET /sections/")
+
+def test_memory_bucket_refills():
+    buckets = MemoryBuckets()
+    assert buckets.take("a", rate=1, burst=2, now=0) == (True, 1)
+    assert buckets.take("a", rate=1, burst=2, now=0)[0] is True
+    assert buckets.take("a", rate=1, burst=2, now=0)[0] is False
+    # Через секунду пополнился один токен, но не больше burst
+    assert buckets.take("a", rate=1, burst=2, now=1)[0] is True
+    assert buckets.take("a", rate=1, burst=2, now=100) == (True, 1)
+
+def test_memory_buckets_evict_least_recent():
+    buckets = MemoryBuckets(max_keys=2)
+    for key in ("a", "b", "a", "c"):
+        buckets.take(key, 1, 1, now=0)
+    assert len(buckets) == 2 and buckets.evicted == 1
+    # a недавно использовался и остался, b вытеснен и получает новую полную корзину
+    assert buckets.take("a", 1, 1, now=0)[0] is False
+    assert buckets.take("b", 1, 1, now=0)[0] is True
+
+def test_client_key():
+    limiter = RateLimiter([], MemoryBuckets(), client_header="x-real-ip", api_keys=["k1"],
+                          trusted_proxies=["10.0.0.0/24"])
+    assert limiter.client_key(scope()) == "ip:10.0.0.1"
+    assert limiter.client_key(scope(headers=[(b"x-real-ip", b"1.2.3.4")])) == "ip:1.2.3.4"
+    # Заголовок от клиента не из доверенных прокси не учитывается
+    direct = scope(headers=[(b"x-real-ip", b"1.2.3.4")], client=("203.0.113.7", 1))
+    assert limiter.client_key(direct) == "ip:203.0.113.7"
+    assert limiter.client_key(scope(headers=[(b"x-real-ip", b"1.2.3.4")], client=("testclient", 1))) == "ip:testclient"
+    untrusting = RateLimiter([], MemoryBuckets(), client_header="x-real-ip")
+    assert untrusting.client_key(scope(headers=[(b"x-real-ip", b"1.2.3.4")])) == "ip:10.0.0.1"
+    assert limiter.client_key(scope(headers=[(b"x-api-key", b"k1")])) == "key:k1"
+    # Неизвестный ключ не дает отдельной корзины
+    assert limiter.client_key(scope(headers=[(b"x-api-key", b"other")])) == "ip:10.0.0.1"
+
+@pytest.mark.asyncio
+async def test_middleware_limits_per_route_and_client():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    limiter = RateLimiter(parse_rules("GET /sections/*=0.5/s:2; POST *=100/s:100"), MemoryBuckets())
+    middleware = RateLimitMiddleware(app, limiter)
+
+    async def status(request_scope):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await middleware(request_scope, None, send)
+        return messages[0]
+
+    assert [(await status(scope()))["status"] for _ in range(3)] == [200, 200, 429]
+    limited = await status(scope())
+    assert (b"retry-after", b"2") in limited["headers"]
+    # Другой клиент, другой маршрут и служебные пути не затронуты
+    assert (await status(scope(client=("10.0.0.2", 1))))["status"] == 200
+    assert (await status(scope("POST", "/tests/")))["status"] == 200
+    assert (await status(scope(path="/health")))["status"] == 200
+    assert limiter.stats()["limited"] == 2
+
+@pytest.mark.asyncio
+async def test_rules_match_paths_under_api_prefix():
+    """Тест: пути от nginx приходят с /api (root_path), правила пишутся без префикса"""
+    limiter = RateLimiter(parse_rules("/admin/*=1/s:1; POST /tests/=1/s:1; *=100/s:100"), MemoryBuckets())
+    admin = scope("POST", "/api/admin/import/", root_path="/api")
+    assert await limiter.check(admin) is None
+    rule, _ = await limiter.check(admin)
+    assert rule.spec == "/admin/*=1/s:1"
+    tests = scope("POST", "/api/tests/", root_path="/api")
+    assert await limiter.check(tests) is None
+    assert (await limiter.check(tests))[0].spec == "POST /tests/=1/s:1"
+    assert await limiter.check(scope(path="/api/health", root_path="/api")) is None
+    # Префикс снимается только целым сегментом
+    assert limiter.match("GET", "/apiadmin/x")[1].spec == "*=100/s:100"
+
+def test_app_limits_api_prefixed_paths(client, monkeypatch):
+    from app.main import rate_limiter
+    monkeypatch.setattr(rate_limiter, "rules", parse_rules("/admin/*=0.001/s:1"))
+    monkeypatch.setattr(rate_limiter, "buckets", MemoryBuckets())
+    assert client.post("/api/admin/import/", json=[]).status_code == 403
+    assert client.post("/api/admin/import/", json=[]).status_code == 429
+    assert client.get("/api/sections/").status_code == 200
+
+def test_postgres_buckets(engine, db_session):
+    buckets = PostgresBuckets(engine)
+    assert buckets.take("pg", rate=1, burst=2, now=1000) == (True, 1)
+    assert buckets.take("pg", rate=1, burst=2, now=1000)[0] is True
+    assert buckets.take("pg", rate=1, burst=2, now=1000)[0] is False
+    assert buckets.take("pg", rate=1, burst=2, now=1001.5)[0] is True
+    assert buckets.purge(older_than=0) == 1
@@ -0,0 +1,145 @@
+import json
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Answer, Question, Section, review_states
+from app.scheduler import DAY, ReviewQueue, ReviewState, Scheduler, SectionQuestions, quality_from_answer, sm2
+
+NOW = 1_000_000.0
+LEARNER = {"X-Learner-Id": "learner-1"}
+
+def test_sm2_intervals():
+    state = ReviewState(1)
+    intervals = []
+    for _ in range(3):
+        state = sm2(state, 4, NOW)
+        intervals.append(state.interval_days)
+    assert intervals == [1.0, 6.0, 15.0]
+    assert state.easiness == pytest.approx(2.5)
+    assert state.due_at == NOW + 15 * DAY
+
+    # Ошибка сбрасывает повторения и снижает легкость, но не ниже 1.3
+    failed = sm2(state, quality_from_answer(False), NOW)
+    assert (failed.repetitions, failed.interval_days) == (0, 1.0)
+    assert failed.easiness < state.easiness
+    for _ in range(20):
+        failed = sm2(failed, 0, NOW)
+    assert failed.easiness == 1.3
+
+def test_queue_due_first_then_new():
+    queue = ReviewQueue(SectionQuestions(range(1, 11)), [
+        ReviewState(5, 1, 1.0, 2.5, NOW - 10),
+        ReviewState(3, 1, 1.0, 2.5, NOW - 20),
+        ReviewState(1, 2, 6.0, 2.5, NOW + DAY),
+    ])
+    assert queue.next_batch(5, NOW, new_limit=2) == ([3, 5, 2, 4], 2)
+    # Пачка не убирает вопросы из очереди до ответа
+    assert queue.next_batch(5, NOW, new_limit=2) == ([3, 5, 2, 4], 2)
+
+    queue.record(3, 5, NOW)
+    queue.record(2, 4, NOW)
+    assert queue.next_batch(3, NOW, new_limit=10) == ([5, 4, 6], 1)
+    # Через полтора дня подходят интервалы в 1 день; у вопроса 3 уже 6 дней
+    ids, due = queue.next_batch(10, NOW + 1.5 * DAY, new_limit=0)
+    assert sorted(ids) == [1, 2, 5] and due == 3
+
+def test_queue_compacts_stale_heap_entries():
+    queue = ReviewQueue(SectionQuestions([1]))
+    for _ in range(200):
+        queue.record(1, 4, NOW)
+    assert len(queue.heap) <= 2 * len(queue.states) + 64
+
+@pytest.fixture
+def section_questions(db_session):
+    section = Section(name="Повторение")
+    db_session.add(section)
+    db_session.flush()
+    questions = [
+        Question(text=f"Q{i}?", section_id=section.id,
+                 answers=[Answer(text="yes", is_correct=True), Answer(text="no", is_correct=False)])
+        for i in range(5)
+    ]
+    db_session.add_all(questions)
+    db_session.commit()
+    return section.id, [question.id for question in questions]
+
+@pytest.fixture
+def scheduler(engine):
+    return Scheduler(sessionmaker(bind=engine), new_per_batch=10)
+
+def test_scheduler_persists_in_batches(scheduler, db_session, section_questions):
+    section_id, question_ids = section_questions
+    assert scheduler.next_batch("u1", section_id, 3, now=NOW) == (question_ids[:3], 0)
+    scheduler.record("u1", section_id, [(question_ids[0], 1), (question_ids[1], 5)], now=NOW)
+    assert db_session.execute(select(review_states)).all() == []
+
+    assert scheduler.flush() == 2
+    rows = db_session.execute(
+        select(review_states.c.question_id, review_states.c.repetitions).order_by(review_states.c.question_id)
+    ).all()
+    assert rows == [(question_ids[0], 0), (question_ids[1], 1)]
+
+    # Новый воркер читает состояние из БД
+    fresh = Scheduler(scheduler.session_factory)
+    assert fresh.next_batch("u1", section_id, 10, now=NOW + DAY) == (
+        [question_ids[0], question_ids[1]] + question_ids[2:], 2
+    )
+
+def test_scheduler_keeps_unflushed_changes_on_reload(scheduler, section_questions):
+    section_id, question_ids = section_questions
+    scheduler.record("u1", section_id, [(question_ids[0], 4)], now=NOW)
+    scheduler.clear()
+    ids, due = scheduler.next_batch("u1", section_id, 10, now=NOW)
+    assert question_ids[0] not in ids and due == 0
+
+def test_scheduler_rejects_foreign_question(scheduler, section_questions):
+    section_id, _ = section_questions
+    with pytest.raises(ValueError):
+        scheduler.record("u1", section_id, [(10**9, 4)])
+
+def test_notify_from_other_worker_evicts_learner(scheduler, section_questions):
+    section_id, _ = section_questions
+    scheduler.next_batch("u1", section_id, 1)
+    scheduler.next_batch("u2", section_id, 1)
+    scheduler.handle_notify(json.dumps({"pid": -1, "learners": ["u1"]}))
+    assert scheduler.stats()["queues"] == 1
+
+    scheduler.invalidate_sections([section_id])
+    assert scheduler.stats()["queues"] == 0
+
+def answer_ids(db_session, is_correct):
+    """id вопроса -> id его правильного (или неправильного) ответа"""
+    return dict(db_session.query(Answer.question_id, Answer.id).filter(Answer.is_correct == is_correct))
+
+def test_review_endpoints(client, db_session, section_questions):
+    section_id, question_ids = section_questions
+    right, wrong = answer_ids(db_session, True), answer_ids(db_session, False)
+    response = client.get(f"/sections/{section_id}/review/?limit=2", headers=LEARNER)
+    assert response.status_code == 200
+    assert response.json() == {"question_ids": question_ids[:2], "due": 0}
+
+    response = client.post(f"/sections/{section_id}/review/", headers=LEARNER, json=[
+        {"question_id": question_ids[0], "answer_id": right[question_ids[0]]},
+        {"question_id": question_ids[1], "answer_id": wrong[question_ids[1]], "quality": 2},
+    ])
+    assert response.status_code == 200
+    assert [(s["question_id"], s["interval_days"]) for s in response.json()] == [
+        (question_ids[0], 1.0), (question_ids[1], 1.0)
+    ]
+    assert client.get(f"/sections/{section_id}/review/?limit=2", headers=LEARNER).json()["question_ids"] == question_ids[2:4]
+
+def test_review_endpoint_errors(client, db_session, section_questions):
+    section_id, question_ids = section_questions
+    assert client.get(f"/sections/{section_id}/review/").status_code == 422
+    assert client.get(f"/sections/{section_id}/review/", headers={"X-Learner-Id": "bad id!"}).status_code == 422
+    assert client.get("/sections/999999/review/", headers=LEARNER).status_code == 404
+    response = client.post(f"/sections/{section_id}/review/", headers=LEARNER,
+                           json=[{"question_id": 10**9, "answer_id": 1}])
+    assert response.status_code == 422
+    # Ответ другого вопроса
+    other = answer_ids(db_session, True)[question_ids[1]]
+    response = client.post(f"/sections/{section_id}/review/", headers=LEARNER,
+                           json=[{"question_id": question_ids[0], "answer_id": other}])
+    assert response.status_code == 422
@@ -131,3 +131,18 @@ class TestTestPayloadSchema:
         assert test.question == "What is 2+2?"
         assert test.answers == ["3", "4", "5"]
         assert test.correct == 1
+    
+    @pytest.mark.parametrize("field,value", [
+        ("section", ""),
+        ("question", "x" * 2001),
+        ("answers", []),
+        ("answers", ["a", ""]),
+        ("correct", -1),
+        ("correct", 3),
+    ])
+    def test_test_create_constraints(self, field, value):
+        """Тест ограничений: пустые и слишком длинные тексты, индекс правильного ответа"""
+        data = {"section": "Math", "question": "Q?", "answers": ["a", "b", "c"], "correct": 0, field: value}
+        with pytest.raises(ValidationError) as exc_info:
+            TestPayload(**data)
+        assert exc_info.value.errors()[0]["loc"][0] == field
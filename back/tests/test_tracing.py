@@ -0,0 +1,162 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.core.config import get_settings
+from app.tracing import SERVER, FileSink, SpanExporter, TracedQueuePool, Tracer, parse_traceparent, tracer
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+# Ответ секции больше COMPRESSION_MINIMUM_SIZE: сжатие тоже попадает в трассу
+TESTS = [
+    {"section": "Math", "question": f"What is {i} + {i}?", "answers": [str(i), str(2 * i)], "correct": 1}
+    for i in range(30)
+]
+
+@pytest.fixture
+def spans(monkeypatch):
+    """Законченные span процесса с прошлого вызова; новые трассы сэмплируются всегда"""
+    payloads = []
+    monkeypatch.setattr(tracer, "exporter", SpanExporter(payloads.append, "test", max_queue=10_000))
+    monkeypatch.setattr(tracer, "sample_ratio", 1.0)
+
+    def collect():
+        tracer.exporter.flush()
+        collected = [span for payload in payloads for span in payload["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+        payloads.clear()
+        return collected
+    return collect
+
+def attributes(span):
+    return {item["key"]: next(iter(item["value"].values())) for item in span["attributes"]}
+
+def test_parse_traceparent():
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID, True)
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00") == (TRACE_ID, PARENT_ID, False)
+    # Будущие версии могут добавлять поля после флагов
+    assert parse_traceparent(f"01-{TRACE_ID}-{PARENT_ID}-03-extra") == (TRACE_ID, PARENT_ID, True)
+    for invalid in (None, "", "garbage", f"ff-{TRACE_ID}-{PARENT_ID}-01", f"00-{'0' * 32}-{PARENT_ID}-01",
+                    f"00-{TRACE_ID}-{'0' * 16}-01", f"00-{TRACE_ID.upper()}-{PARENT_ID}-01",
+                    f"00-{TRACE_ID}-{PARENT_ID}-01-extra"):
+        assert parse_traceparent(invalid) is None
+
+def test_sampling_decisions():
+    """Тест: флаг родителя важнее доли, доля решает по trace-id"""
+    sampler = Tracer(sample_ratio=0.0, exporter=None)
+    span = sampler.start_trace("GET /", f"00-{TRACE_ID}-{PARENT_ID}-01")
+    assert (span.trace_id, span.parent_id, span.kind) == (TRACE_ID, PARENT_ID, SERVER)
+    assert sampler.start_trace("GET /") is None
+
+    sampler.sample_ratio = 1.0
+    assert sampler.start_trace("GET /", f"00-{TRACE_ID}-{PARENT_ID}-00") is None
+    # Без traceparent trace-id - X-Request-Id от nginx
+    span = sampler.start_trace("GET /", "invalid", request_id=TRACE_ID)
+    assert (span.trace_id, span.parent_id) == (TRACE_ID, None)
+
+    sampler.sample_ratio = 0.5
+    # Решают младшие 64 бита: меньше половины диапазона - в выборке
+    assert sampler.start_trace("GET /", request_id="f" * 16 + "7" + "f" * 15) is not None
+    assert sampler.start_trace("GET /", request_id="0" * 16 + "8" + "0" * 15) is None
+    assert (sampler.sampled, sampler.not_sampled) == (3, 3)
+
+def test_request_spans(client, spans):
+    """Тест: трасса чтения секции - запрос, загрузка, SQL, сериализация и сжатие"""
+    client.post("/tests/", json=TESTS)
+    section_id = client.get("/sections/").json()[0]["id"]
+    spans()
+
+    response = client.get(
+        f"/sections/{section_id}/tests/",
+        headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01", "Accept-Encoding": "gzip"},
+    )
+    assert response.status_code == 200
+    trace = spans()
+    assert {span["traceId"] for span in trace} == {TRACE_ID}
+    by_name = {span["name"]: span for span in trace}
+
+    server = by_name["GET /sections/{section_id}/tests/"]
+    assert server["parentSpanId"] == PARENT_ID
+    assert attributes(server)["http.route"] == "/sections/{section_id}/tests/"
+    assert attributes(server)["http.response.status_code"] == "200"
+
+    load = by_name["crud.get_questions_by_sections"]
+    assert attributes(load)["questions"] == "30"
+    queries = [span for span in trace if span["name"] == "SELECT"]
+    assert queries and all(span["parentSpanId"] == load["spanId"] for span in queries)
+    assert attributes(queries[0])["db.statement"].lstrip().startswith("SELECT")
+    assert attributes(by_name["serialize"])["format"] == "json"
+    assert by_name["compress"]["parentSpanId"] == server["spanId"]
+    assert all(int(span["startTimeUnixNano"]) <= int(span["endTimeUnixNano"]) for span in trace)
+
+def test_unsampled_requests_have_no_spans(client, spans, monkeypatch):
+    monkeypatch.setattr(tracer, "sample_ratio", 0.0)
+    client.get("/sections/")
+    client.get("/health", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+    assert spans() == []
+
+def test_error_status(client, spans):
+    assert client.get("/sections/999999/tests/").status_code == 404
+    server = [span for span in spans() if span.get("kind") == SERVER][0]
+    assert "status" not in server
+    # Неизвестный путь: маршрута нет, span назван по пути
+    client.get("/missing/")
+    assert [span["name"] for span in spans()] == ["GET /missing/"]
+
+def test_checkout_span(spans):
+    """Тест: выдача соединения из пула - отдельный span с размером пула"""
+    engine = create_engine(get_settings().DATABASE_URL, poolclass=TracedQueuePool)
+    try:
+        with tracer.activate(tracer.start_trace("job")):
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+        by_name = {span["name"]: span for span in spans()}
+        assert by_name["db.checkout"]["parentSpanId"] == by_name["job"]["spanId"]
+        assert "db.pool.size" in attributes(by_name["db.checkout"])
+        assert by_name["SELECT"]["parentSpanId"] == by_name["job"]["spanId"]
+    finally:
+        engine.dispose()
+
+def test_failed_statement_span(spans, db_session):
+    with tracer.activate(tracer.start_trace("job")):
+        with pytest.raises(Exception):
+            db_session.execute(text("SELECT * FROM missing_table"))
+    db_session.rollback()
+    failed = [span for span in spans() if span["name"] == "SELECT"][0]
+    assert "missing_table" in failed["status"]["message"]
+
+def test_exporter_queue_and_file_sink(tmp_path):
+    """Тест: переполнение очереди теряет span, файл - строки OTLP/JSON"""
+    path = tmp_path / "traces.jsonl"
+    exporter = SpanExporter(FileSink(str(path)), "easy-test", max_queue=2, batch_size=1)
+    sampler = Tracer(sample_ratio=1.0, exporter=exporter)
+    for _ in range(3):
+        sampler.end(sampler.start_trace("job", flag=True, ratio=0.5, label="x"))
+    assert exporter.flush() == 2
+    assert exporter.stats() == {"queued": 0, "exported": 2, "dropped": 1, "failed": 0}
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 2
+    resource = lines[0]["resourceSpans"][0]
+    assert resource["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "easy-test"}}]
+    span = resource["scopeSpans"][0]["spans"][0]
+    assert "parentSpanId" not in span
+    assert span["attributes"] == [
+        {"key": "flag", "value": {"boolValue": True}},
+        {"key": "ratio", "value": {"doubleValue": 0.5}},
+        {"key": "label", "value": {"stringValue": "x"}},
+    ]
+
+def test_sink_failure_drops_batch():
+    def broken(payload):
+        raise OSError("collector is down")
+    exporter = SpanExporter(broken, "easy-test", max_queue=10)
+    sampler = Tracer(sample_ratio=1.0, exporter=exporter)
+    sampler.end(sampler.start_trace("job"))
+    assert exporter.flush() == 0
+    assert exporter.stats()["failed"] == 1
+
+def test_tracing_disabled_by_default():
+    assert get_settings().TRACING_EXPORTER == "none"
+    assert not tracer.enabled
@@ -1,8 +1,10 @@
 """
 Централизованная конфигурация базы данных
 """
+import logging
 import os
-from typing import Optional
+from functools import lru_cache
+from typing import Dict, List, Optional
 from urllib.parse import urlparse
 
 try:
@@ -11,19 +13,23 @@ except ImportError:
     # Fallback для случаев, когда validator недоступен
     validator = None
 
+logger = logging.getLogger("config")
+
 
 class DatabaseConfig:
     """Конфигурация базы данных"""
     
-    def __init__(self):
+    def __init__(self, config: Optional[Dict[str, str]] = None):
         if validator:
-            # Используем валидатор
-            config = validator.validate()
+            # Используем уже провалидированную конфигурацию, если она передана
+            if config is None:
+                config = validator.validate()
             self.host = config["DB_HOST"]
             self.port = int(config["DB_PORT"])
             self.name = config["DB_NAME"]
             self.user = config["DB_USER"]
             self.password = config["DB_PASSWORD"]
+            replica_urls = config.get("DB_REPLICA_URLS", "")
         else:
             # Fallback - читаем напрямую из env
             self.host = os.getenv("DB_HOST")
@@ -31,14 +37,24 @@ class DatabaseConfig:
             self.name = os.getenv("DB_NAME")
             self.user = os.getenv("DB_USER")
             self.password = os.getenv("DB_PASSWORD")
+            replica_urls = os.getenv("DB_REPLICA_URLS", "")
             
             # Проверяем обязательные переменные
-            if not all([self.host, self.name, self.user, self.password]):
+            missing = [
+                var for var, value in (("DB_HOST", self.host), ("DB_NAME", self.name),
+                                       ("DB_USER", self.user), ("DB_PASSWORD", self.password))
+                if not value
+            ]
+            if missing:
+                logger.error("Отсутствуют обязательные переменные БД", extra={"missing": missing})
                 raise ValueError(
                     "Отсутствуют обязательные переменные БД: DB_HOST, DB_NAME, DB_USER, DB_PASSWORD\n"
                     "Скопируйте config/env.example в .env и заполните значения"
                 )
         
+        # Реплики только для чтения (необязательно): URL через запятую
+        self.replica_urls: List[str] = [url.strip() for url in replica_urls.split(",") if url.strip()]
+        
     @property
     def url(self) -> str:
         """Получить полный URL базы данных"""
@@ -55,11 +71,11 @@ class DatabaseConfig:
             "password": self.password
         }
     
-    def get_url_for_environment(self, environment: str) -> str:
+    def get_url_for_environment(self, environment: str, config: Optional[Dict[str, str]] = None) -> str:
         """Получить URL для конкретного окружения"""
         if validator:
             # Используем валидатор для получения конфигурации окружения
-            config = validator.get_environment_config(environment)
+            config = validator.get_environment_config(environment, config)
             return config["DATABASE_URL"]
         else:
             # Fallback логика
@@ -77,14 +93,15 @@ class DatabaseConfig:
 
 
 class AppConfig:
-    """Основная конфигурация приложения"""
+    """Основная конфигурация приложения (неизменяемый снимок окружения)"""
     
     def __init__(self):
+        config = None
         if validator:
-            # Используем валидатор
+            # Используем валидатор: окружение сканируется один раз
             config = validator.validate()
             self.environment = config["ENVIRONMENT"]
-            self.database = DatabaseConfig()
+            self.database = DatabaseConfig(config)
             
             # Backend настройки
             self.backend_host = config["BACKEND_HOST"]
@@ -111,15 +128,24 @@ class AppConfig:
             self.frontend_api_base_url = os.getenv("VITE_API_BASE_URL")
             
             # Проверяем обязательные переменные
-            if not self.api_base_url:
-                raise ValueError("Отсутствует обязательная переменная: API_BASE_URL")
-            if not self.frontend_api_base_url:
-                raise ValueError("Отсутствует обязательная переменная: VITE_API_BASE_URL")
+            for var, value in (("API_BASE_URL", self.api_base_url), ("VITE_API_BASE_URL", self.frontend_api_base_url)):
+                if not value:
+                    logger.error("Отсутствует обязательная переменная", extra={"missing": [var]})
+                    raise ValueError(f"Отсутствует обязательная переменная: {var}")
+        
+        # URL БД вычисляем один раз, дальше снимок не меняется
+        self._database_url = self.database.get_url_for_environment(self.environment, config)
+        self._frozen = True
+    
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError("AppConfig неизменяем, используйте get_config()")
+        super().__setattr__(name, value)
     
     @property
     def database_url(self) -> str:
         """Получить URL БД для текущего окружения"""
-        return self.database.get_url_for_environment(self.environment)
+        return self._database_url
     
     @property
     def is_development(self) -> bool:
@@ -137,5 +163,14 @@ class AppConfig:
         return self.environment == "production"
 
 
-# Глобальный экземпляр конфигурации
-config = AppConfig()
+@lru_cache(maxsize=None)
+def get_config() -> AppConfig:
+    """Получить общий снимок конфигурации (создается лениво при первом вызове)"""
+    return AppConfig()
+
+
+def __getattr__(name):
+    # Обратная совместимость: `from config.database import config`
+    if name == "config":
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,9 +1,12 @@
 """
 Валидатор конфигурации окружения
 """
+import logging
 import os
 from typing import Dict, List, Optional
 
+logger = logging.getLogger("config")
+
 
 class ConfigValidator:
     """Валидатор конфигурации"""
@@ -32,6 +35,12 @@ class ConfigValidator:
         }
         
         self.optional_vars = {
+            # Реплики БД только для чтения (URL через запятую)
+            "DB_REPLICA_URLS": "",
+            
+            # Токен админ-эндпоинтов backend (/admin/*); пусто - отключены
+            "ADMIN_API_TOKEN": "",
+            
             # CI/CD
             "CI_DB_PORT": "5433",
             "CI_BACKEND_PORT": "8001",
@@ -39,11 +48,22 @@ class ConfigValidator:
             
             # Nginx
             "NGINX_PORT": "80",
+            
+            # Продакшн-сервер (gunicorn)
+            "WEB_CONCURRENCY": "",  # Пусто - по числу доступных ядер
+            "GUNICORN_MAX_REQUESTS": "10000",
+            "GUNICORN_MAX_WORKER_MEMORY_MB": "512",
+            "GUNICORN_GRACEFUL_TIMEOUT": "30",
+            
+            # Логи backend (JSON в stdout)
+            "LOG_LEVEL": "INFO",
+            "LOG_SAMPLING": "",
         }
     
     def validate(self, strict: bool = True) -> Dict[str, str]:
         """Проверить конфигурацию и вернуть все переменные"""
         missing_vars = []
+        defaulted_vars = []
         config = {}
         
         # Проверяем обязательные переменные
@@ -54,6 +74,7 @@ class ConfigValidator:
                     missing_vars.append(var)
                 else:
                     value = default
+                    defaulted_vars.append(var)
             config[var] = value
         
         # Добавляем опциональные переменные
@@ -61,8 +82,13 @@ class ConfigValidator:
             value = os.getenv(var, default)
             config[var] = value
         
+        if strict and defaulted_vars:
+            logger.info("Переменные окружения не заданы, используются значения по умолчанию",
+                        extra={"variables": defaulted_vars})
+        
         # Проверяем наличие обязательных переменных только в строгом режиме
         if strict and missing_vars:
+            logger.error("Отсутствуют обязательные переменные окружения", extra={"missing": missing_vars})
             raise ValueError(
                 f"Отсутствуют обязательные переменные окружения: {', '.join(missing_vars)}\n"
                 f"Скопируйте config/env.example в .env и заполните значения"
@@ -74,9 +100,10 @@ class ConfigValidator:
         """Проверить и сформировать DATABASE_URL"""
         db_vars = ["DB_USER", "DB_PASSWORD", "DB_HOST", "DB_PORT", "DB_NAME"]
         
-        for var in db_vars:
-            if var not in config or not config[var]:
-                raise ValueError(f"Отсутствует переменная для БД: {var}")
+        missing_vars = [var for var in db_vars if var not in config or not config[var]]
+        if missing_vars:
+            logger.error("Отсутствуют переменные для БД", extra={"missing": missing_vars})
+            raise ValueError(f"Отсутствует переменная для БД: {missing_vars[0]}")
         
         # Формируем URL
         user = config["DB_USER"]
@@ -87,9 +114,13 @@ class ConfigValidator:
         
         return f"postgresql://{user}:{password}@{host}:{port}/{name}"
     
-    def get_environment_config(self, environment: str) -> Dict[str, str]:
+    def get_environment_config(self, environment: str, config: Optional[Dict[str, str]] = None) -> Dict[str, str]:
         """Получить конфигурацию для конкретного окружения"""
-        config = self.validate(strict=False)  # Не строгий режим для внутреннего использования
+        if config is None:
+            config = self.validate(strict=False)  # Не строгий режим для внутреннего использования
+        else:
+            # Не изменяем переданную конфигурацию
+            config = dict(config)
         
         if environment == "ci":
             # Переопределяем порты для CI
@@ -132,12 +163,17 @@ DB_PASSWORD={DB_PASSWORD}
 # Полный URL подключения (автоматически формируется из параметров выше)
 DATABASE_URL=postgresql://${{DB_USER}}:${{DB_PASSWORD}}@${{DB_HOST}}:${{DB_PORT}}/${{DB_NAME}}
 
+# Реплики только для чтения (необязательно), URL через запятую
+DB_REPLICA_URLS={DB_REPLICA_URLS}
+
 # =============================================================================
 # BACKEND
 # =============================================================================
 BACKEND_HOST={BACKEND_HOST}
 BACKEND_PORT={BACKEND_PORT}
 API_BASE_URL={API_BASE_URL}
+# Токен для /admin/* (заголовок X-Admin-Token), пусто - админ-эндпоинты отключены
+ADMIN_API_TOKEN={ADMIN_API_TOKEN}
 
 # =============================================================================
 # FRONTEND
@@ -157,6 +193,24 @@ CI_FRONTEND_PORT={CI_FRONTEND_PORT}
 # NGINX (если используется)
 # =============================================================================
 NGINX_PORT={NGINX_PORT}
+
+# =============================================================================
+# PRODUCTION SERVER (gunicorn + uvicorn workers)
+# =============================================================================
+# Число воркеров (пусто - по числу доступных ядер)
+WEB_CONCURRENCY={WEB_CONCURRENCY}
+# Перезапуск воркера после N запросов и при превышении памяти (0 - отключено)
+GUNICORN_MAX_REQUESTS={GUNICORN_MAX_REQUESTS}
+GUNICORN_MAX_WORKER_MEMORY_MB={GUNICORN_MAX_WORKER_MEMORY_MB}
+# Время на корректное завершение воркера, секунды
+GUNICORN_GRACEFUL_TIMEOUT={GUNICORN_GRACEFUL_TIMEOUT}
+
+# =============================================================================
+# ЛОГИ BACKEND (JSON в stdout, вывод в отдельном потоке)
+# =============================================================================
+LOG_LEVEL={LOG_LEVEL}
+# Доля записей INFO и ниже по логгерам, например app.access=0.1 (пусто - все)
+LOG_SAMPLING={LOG_SAMPLING}
 """
         
         # Используем validate со strict=False, чтобы получить все переменные с дефолтами
@@ -170,6 +224,8 @@ NGINX_PORT={NGINX_PORT}
 validator = ConfigValidator()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     # Определяем корневую директорию проекта
     # (два уровня вверх от текущего файла: config/env -> config -> корень)
     project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
@@ -180,4 +236,4 @@ if __name__ == "__main__":
     with open(output_path, 'w', encoding='utf-8') as f:
         f.write(content)
         
-    print(f"✅ .env.example успешно сгенерирован в: {output_path}")
+    logger.info("✅ .env.example успешно сгенерирован в: %s", output_path)
@@ -1,15 +1,42 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Link } from 'react-router-dom';
 import config from '../config';
+import { EVENTS_PATH, hasFullSections, mergeSections } from '../events';
+
+const fetchSections = () =>
+    fetch(`${config.API_BASE_URL}/api/sections/`).then(response => response.json());
 
 const HomePage = () => {
     const [sections, setSections] = useState([]);
     const [jsonInput, setJsonInput] = useState('');
 
+    // Пока поток событий открыт, список обновляется по событиям, а не перечитывается
+    const eventsOpen = useRef(false);
+
     useEffect(() => {
-        fetch(`${config.API_BASE_URL}/api/sections/`)
-            .then(response => response.json())
-            .then(data => setSections(data));
+        fetchSections().then(data => setSections(data));
+    }, []);
+
+    useEffect(() => {
+        if (typeof EventSource === 'undefined') {
+            return undefined;
+        }
+        const source = new EventSource(`${config.API_BASE_URL}${EVENTS_PATH}`);
+        source.onopen = () => { eventsOpen.current = true; };
+        source.onerror = () => { eventsOpen.current = false; };
+        source.addEventListener('sections', (event) => {
+            const changed = JSON.parse(event.data).sections;
+            if (hasFullSections(changed)) {
+                setSections(current => mergeSections(current, changed));
+            } else {
+                fetchSections().then(data => setSections(data));
+            }
+        });
+        // События могли потеряться - перечитываем список целиком
+        source.addEventListener('reset', () => {
+            fetchSections().then(data => setSections(data));
+        });
+        return () => source.close();
     }, []);
 
     const handleJsonSubmit = () => {
@@ -26,10 +53,10 @@ const HomePage = () => {
             .then(data => {
                 console.log('Success:', data);
                 setJsonInput('');
-                // Refresh sections
-                fetch(`${config.API_BASE_URL}/api/sections/`)
-                    .then(response => response.json())
-                    .then(data => setSections(data));
+                // Без потока событий обновляем список сами
+                if (!eventsOpen.current) {
+                    fetchSections().then(data => setSections(data));
+                }
             });
         } catch (error) {
             console.error('Error parsing JSON:', error);
@@ -58,6 +85,7 @@ const HomePage = () => {
                     {sections.map(section => (
                         <li key={section.id}>
                             <Link to={`/test/${section.id}`}>{section.name}</Link>
+                            {' '}({section.question_count})
                         </li>
                     ))}
                 </ul>
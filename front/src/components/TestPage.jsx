@@ -1,24 +1,69 @@
 import React, { useState, useEffect } from 'react';
-import { useParams, useNavigate } from 'react-router-dom';
+import { useParams, useNavigate, useSearchParams } from 'react-router-dom';
 import config from '../config';
+import { fromColumnar } from '../formats';
+import { getLearnerId, selectQuestions } from '../learner';
+
+const REVIEW_BATCH_SIZE = 20;
 
 const TestPage = () => {
     const { sectionId } = useParams();
     const navigate = useNavigate();
+    // ?mode=all - все вопросы секции вместо пачки повторения
+    const [searchParams, setSearchParams] = useSearchParams();
+    const allQuestions = searchParams.get('mode') === 'all';
     const [questions, setQuestions] = useState([]);
     const [currentQuestionIndex, setCurrentQuestionIndex] = useState(0);
     const [selectedAnswer, setSelectedAnswer] = useState(null);
     const [showResult, setShowResult] = useState(false);
 
+    const [loaded, setLoaded] = useState(false);
+    const [error, setError] = useState(false);
+    const learnerHeaders = { 'X-Learner-Id': getLearnerId() };
+
     useEffect(() => {
-        fetch(`${config.API_BASE_URL}/api/sections/${sectionId}/tests/`)
-            .then(response => response.json())
-            .then(data => setQuestions(data));
-    }, [sectionId]);
+        setLoaded(false);
+        setError(false);
+        setCurrentQuestionIndex(0);
+        setSelectedAnswer(null);
+        setShowResult(false);
+        // Вопросы секции и порядок по расписанию повторений (SM-2) грузятся параллельно.
+        // Ошибка /review/ не прячет тест: показываются все вопросы секции
+        const review = allQuestions
+            ? Promise.resolve(null)
+            : fetch(`${config.API_BASE_URL}/api/sections/${sectionId}/review/?limit=${REVIEW_BATCH_SIZE}`, {
+                headers: learnerHeaders,
+            })
+                .then(response => (response.ok ? response.json() : null))
+                .catch(() => null);
+        Promise.all([
+            fetch(`${config.API_BASE_URL}/api/sections/${sectionId}/tests/?format=columnar`)
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error(`HTTP ${response.status}`);
+                    }
+                    return response.json();
+                }),
+            review,
+        ]).then(([data, batch]) => {
+            setQuestions(selectQuestions(fromColumnar(data), batch));
+            setLoaded(true);
+        }).catch(() => {
+            setError(true);
+            setLoaded(true);
+        });
+    }, [sectionId, allQuestions]);
+
+    const practiceAll = () => setSearchParams({ mode: 'all' });
 
     const handleAnswerClick = (answer) => {
         setSelectedAnswer(answer);
         setShowResult(true);
+        fetch(`${config.API_BASE_URL}/api/sections/${sectionId}/review/`, {
+            method: 'POST',
+            headers: { ...learnerHeaders, 'Content-Type': 'application/json' },
+            body: JSON.stringify([{ question_id: questions[currentQuestionIndex].id, answer_id: answer.id }]),
+        });
     };
 
     const handleNextQuestion = () => {
@@ -31,10 +76,29 @@ const TestPage = () => {
         }
     };
 
-    if (questions.length === 0) {
+    if (!loaded) {
         return <div>Loading...</div>;
     }
 
+    if (error) {
+        return (
+            <div>
+                <p>Could not load the questions. Please try again later.</p>
+                <button onClick={() => navigate('/')}>Back</button>
+            </div>
+        );
+    }
+
+    if (questions.length === 0) {
+        return (
+            <div>
+                <p>{allQuestions ? 'This section has no questions yet.' : 'Nothing to review right now. Come back later!'}</p>
+                {!allQuestions && <button onClick={practiceAll}>Practice all questions</button>}
+                <button onClick={() => navigate('/')}>Back</button>
+            </div>
+        );
+    }
+
     const currentQuestion = questions[currentQuestionIndex];
 
     return (
@@ -68,6 +132,7 @@ const TestPage = () => {
                     {currentQuestionIndex < questions.length - 1 ? 'Next' : 'Finish'}
                 </button>
             )}
+            {!allQuestions && <button onClick={practiceAll}>Practice all questions</button>}
         </div>
     );
 };
@@ -0,0 +1,19 @@
+// Поток /api/events/ (server-sent events): изменения секций приходят сами,
+// список не нужно перечитывать после каждой записи.
+export const EVENTS_PATH = '/api/events/';
+
+// Секция со слишком длинным именем приходит только с id - тогда список перечитывается
+export const hasFullSections = (changed) =>
+    changed.every(section => section.deleted || section.name !== undefined);
+
+// Применить событие sections к списку: обновить измененные секции, новые добавить,
+// удаленные (deleted: true) убрать
+export const mergeSections = (sections, changed) => {
+    const byId = new Map(changed.map(section => [section.id, section]));
+    const merged = sections
+        .filter(section => !byId.get(section.id)?.deleted)
+        .map(section => byId.has(section.id) ? { ...section, ...byId.get(section.id) } : section);
+    const known = new Set(sections.map(section => section.id));
+    const added = changed.filter(section => !known.has(section.id) && !section.deleted);
+    return merged.concat(added).sort((a, b) => a.id - b.id);
+};
@@ -0,0 +1,18 @@
+// Колоночный формат ответа /sections/{id}/tests/?format=columnar:
+// параллельные массивы вместо списка объектов, ключи не повторяются на каждый ответ.
+export const COLUMNAR_MEDIA_TYPE = 'application/vnd.easytest.columnar+json';
+
+export const fromColumnar = (data) => {
+    const correct = new Set(data.correct);
+    return data.question_ids.map((id, i) => {
+        const answers = [];
+        for (let j = data.answer_offsets[i]; j < data.answer_offsets[i + 1]; j++) {
+            answers.push({
+                id: data.answer_ids[j],
+                text: data.answer_texts[j],
+                is_correct: correct.has(j),
+            });
+        }
+        return { id, text: data.question_texts[i], answers };
+    });
+};
@@ -0,0 +1,30 @@
+// Непрозрачный id ученика для расписания повторений (заголовок X-Learner-Id).
+// Хранится в localStorage, отдельного входа в приложении нет.
+const STORAGE_KEY = 'easytest.learnerId';
+
+const randomId = () => {
+    if (typeof crypto !== 'undefined' && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+};
+
+export const getLearnerId = () => {
+    let learnerId = localStorage.getItem(STORAGE_KEY);
+    if (!learnerId) {
+        learnerId = randomId();
+        localStorage.setItem(STORAGE_KEY, learnerId);
+    }
+    return learnerId;
+};
+
+// Вопросы секции в порядке пачки повторения (id из /review/)
+export const orderByReview = (questions, questionIds) => {
+    const byId = new Map(questions.map(question => [question.id, question]));
+    return questionIds.filter(id => byId.has(id)).map(id => byId.get(id));
+};
+
+// Вопросы для страницы теста: пачка повторения, а без нее (режим всей секции
+// или /review/ недоступен) - все вопросы секции по порядку
+export const selectQuestions = (questions, review) =>
+    review ? orderByReview(questions, review.question_ids || []) : questions;
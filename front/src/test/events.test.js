@@ -0,0 +1,34 @@
+import { describe, it, expect } from 'vitest'
+import { hasFullSections, mergeSections } from '../events'
+
+describe('mergeSections', () => {
+  const sections = [
+    { id: 1, name: 'Math', question_count: 2 },
+    { id: 3, name: 'Physics', question_count: 1 },
+  ]
+
+  it('updates changed sections and adds new ones in id order', () => {
+    const changed = [
+      { id: 3, name: 'Physics', question_count: 4 },
+      { id: 2, name: 'Chemistry', question_count: 1 },
+    ]
+    expect(mergeSections(sections, changed)).toEqual([
+      { id: 1, name: 'Math', question_count: 2 },
+      { id: 2, name: 'Chemistry', question_count: 1 },
+      { id: 3, name: 'Physics', question_count: 4 },
+    ])
+  })
+
+  it('removes deleted sections', () => {
+    const changed = [{ id: 1, deleted: true }, { id: 5, deleted: true }]
+    expect(mergeSections(sections, changed)).toEqual([{ id: 3, name: 'Physics', question_count: 1 }])
+  })
+})
+
+describe('hasFullSections', () => {
+  it('detects id-only sections', () => {
+    expect(hasFullSections([{ id: 1, name: 'Math', question_count: 2 }])).toBe(true)
+    expect(hasFullSections([{ id: 1 }])).toBe(false)
+    expect(hasFullSections([{ id: 1, deleted: true }])).toBe(true)
+  })
+})
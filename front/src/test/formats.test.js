@@ -0,0 +1,26 @@
+import { describe, it, expect } from 'vitest'
+import { fromColumnar } from '../formats'
+
+describe('fromColumnar', () => {
+  it('restores questions with answers', () => {
+    const data = {
+      question_ids: [1, 2],
+      question_texts: ['2+2?', 'Color?'],
+      answer_offsets: [0, 2, 3],
+      answer_ids: [10, 11, 12],
+      answer_texts: ['3', '4', 'Red'],
+      correct: [1, 2],
+    }
+    expect(fromColumnar(data)).toEqual([
+      {
+        id: 1,
+        text: '2+2?',
+        answers: [
+          { id: 10, text: '3', is_correct: false },
+          { id: 11, text: '4', is_correct: true },
+        ],
+      },
+      { id: 2, text: 'Color?', answers: [{ id: 12, text: 'Red', is_correct: true }] },
+    ])
+  })
+})
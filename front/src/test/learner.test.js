@@ -0,0 +1,30 @@
+import { describe, it, expect } from 'vitest'
+import { getLearnerId, orderByReview, selectQuestions } from '../learner'
+
+describe('orderByReview', () => {
+  it('orders questions by review ids and skips unknown ids', () => {
+    const questions = [{ id: 1 }, { id: 2 }, { id: 3 }]
+    expect(orderByReview(questions, [3, 1, 99])).toEqual([{ id: 3 }, { id: 1 }])
+  })
+})
+
+describe('selectQuestions', () => {
+  it('uses the review batch when there is one', () => {
+    const questions = [{ id: 1 }, { id: 2 }, { id: 3 }]
+    expect(selectQuestions(questions, { question_ids: [2] })).toEqual([{ id: 2 }])
+    expect(selectQuestions(questions, { question_ids: [] })).toEqual([])
+  })
+
+  it('falls back to all questions without a review batch', () => {
+    const questions = [{ id: 1 }, { id: 2 }]
+    expect(selectQuestions(questions, null)).toEqual(questions)
+  })
+})
+
+describe('getLearnerId', () => {
+  it('keeps the same id between calls', () => {
+    const learnerId = getLearnerId()
+    expect(learnerId).toMatch(/^[A-Za-z0-9_-]{1,64}$/)
+    expect(getLearnerId()).toBe(learnerId)
+  })
+})
@@ -4,5 +4,5 @@ set -e
 # Apply database migrations
 ./migrate.sh
 
-# Start the production server
-cd back && poetry run uvicorn app.main:app --host 0.0.0.0 --port 8000
+# Start the production server (gunicorn master + uvicorn workers, see back/gunicorn.conf.py)
+cd back && exec poetry run gunicorn app.main:app -c gunicorn.conf.py